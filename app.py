@@ -1,12 +1,29 @@
-from flask import Flask, jsonify, render_template, current_app, request, send_from_directory, redirect, url_for
-from wait_time_data import WaitTimeLib, create_database
+from flask import Flask, Response, jsonify, render_template, current_app, request, send_from_directory, redirect, url_for, stream_with_context, make_response
+from wait_time_data import WaitTimeLib, create_database, open_wait_time_lib
+from wait_time_backend import is_sqlite_url
+from db_pool import create_pool, ReplicaSet
+from response_cache import ResponseCache
+from snapshot_stream import SnapshotBroadcaster
+from static_assets import init_static_assets
+import metrics
+from single_flight import SingleFlight, CoalescedReads
 from dotenv import load_dotenv
 import os
 import logging
+import threading
+from collections import OrderedDict
 from contextlib import contextmanager
+from functools import wraps
+import csv
+import io
+import json
+import math
 import time
+from datetime import datetime
+from urllib.parse import urlsplit
+import pytz
 from translations import translations
-from location_service import get_all_office_locations, calculate_travel_times, get_coords_from_postcode
+from location_service import get_all_office_locations, calculate_travel_times, get_coords_from_postcode, get_office_location, get_route_geometry, ROUTE_CACHE_COORD_DECIMALS
 
 # Load environment variables
 load_dotenv()
@@ -22,6 +39,129 @@ logger = logging.getLogger(__name__)
 # Database connection string
 db_url = os.getenv('DATABASE_URL')
 
+# Per-worker connection pool sizing
+DB_POOL_MIN = int(os.getenv('DB_POOL_MIN', 2))
+DB_POOL_MAX = int(os.getenv('DB_POOL_MAX', 10))
+DB_POOL_HEALTH_CHECK_INTERVAL = int(os.getenv('DB_POOL_HEALTH_CHECK_INTERVAL', 30))
+# Seconds a request waits for a free pooled connection before failing
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 10))
+
+# Optional read replicas (comma-separated) for the dashboard queries
+DATABASE_REPLICA_URLS = os.getenv('DATABASE_REPLICA_URLS', '')
+# Replicas further behind the primary than this are skipped
+REPLICA_MAX_LAG_SECONDS = float(os.getenv('REPLICA_MAX_LAG_SECONDS', 30))
+
+# Seconds a worker trusts its snapshot version before checking for a new
+# collector run; also the max-age browsers may reuse a cached response for
+RESPONSE_CACHE_TTL = int(os.getenv('RESPONSE_CACHE_TTL', 30))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', 512))
+# Seconds between SSE keep-alive comments on /api/stream
+STREAM_KEEPALIVE_INTERVAL = int(os.getenv('STREAM_KEEPALIVE_INTERVAL', 15))
+# Open /api/stream connections per worker; each holds a worker thread, so keep
+# this below gunicorn's --threads. Further dashboards poll /api/current instead
+STREAM_MAX_CLIENTS = int(os.getenv('STREAM_MAX_CLIENTS', 50))
+
+# Optional bearer token required to read /metrics
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+
+# Languages / is rendered in, and the one served without ?lang=
+INDEX_LANGUAGES = tuple(translations)
+DEFAULT_LANGUAGE = 'nl'
+# Host names (comma-separated, e.g. apex and www) the homepage is cached and
+# re-rendered eagerly for on each new snapshot; any other Host header gets an
+# uncached page, so a forged one cannot crowd out the real ones
+TRUSTED_HOSTS = {host.strip().lower() for host in os.getenv('TRUSTED_HOSTS', '').split(',') if host.strip()}
+# Cached host URLs (a trusted host over http and https) re-rendered on each new snapshot
+INDEX_PRERENDER_HOSTS = 4
+
+# Rows pulled from the server-side cursor per round trip by /api/export
+EXPORT_FETCH_SIZE = int(os.getenv('EXPORT_FETCH_SIZE', 2000))
+# Rows serialized into one streamed chunk
+EXPORT_CHUNK_ROWS = 500
+
+amsterdam_tz = pytz.timezone('Europe/Amsterdam')
+
+
+def parse_export_time(value):
+    """Parse an ISO date or datetime query parameter; naive values are Amsterdam time"""
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = amsterdam_tz.localize(parsed)
+    return parsed
+
+def resolve_day(day_param):
+    """Day of week (0=Sunday) for /hourly_data; defaults to today, or Monday on weekends"""
+    if day_param is not None:
+        try:
+            day = int(day_param)
+            # Ensure day is in valid range
+            if day < 0 or day > 6:
+                # Default to Monday if invalid
+                day = 1
+        except ValueError:
+            # Default to Monday if invalid
+            day = 1
+    else:
+        # Default to current day of week
+        day = datetime.now().weekday()  # 0=Monday, 1=Tuesday, ..., 6=Sunday
+        # Convert from Python's weekday (0=Monday, 6=Sunday) to
+        # JavaScript/PostgreSQL format (0=Sunday, 1=Monday, ..., 6=Saturday)
+        if day == 6:  # Sunday in Python is 6
+            day = 0
+        else:
+            day += 1
+
+        # If it's a weekend, default to Monday
+        if day == 0 or day == 6:
+            day = 1
+    return day
+
+def index_language():
+    """Language of the / page; unknown values fall back to Dutch"""
+    lang = request.args.get('lang', DEFAULT_LANGUAGE)
+    return lang if lang in INDEX_LANGUAGES else DEFAULT_LANGUAGE
+
+def index_host_is_trusted():
+    """Whether / may be cached and pre-rendered for the Host of this request"""
+    return urlsplit(request.host_url).hostname in TRUSTED_HOSTS
+
+def index_key():
+    """Cache key for /, or None for hosts outside TRUSTED_HOSTS"""
+    if not index_host_is_trusted():
+        return None
+    return ('index', index_language(), request.host_url)
+
+def parse_coordinate(value):
+    """Parse a lat or lon query parameter, rounded like the route cache keys
+
+    Raises ValueError for anything but a finite number; float() alone accepts 'nan' and 'inf'.
+    """
+    coordinate = float(value)
+    if not math.isfinite(coordinate):
+        raise ValueError(f"Coordinate is not a finite number: {value}")
+    return round(coordinate, ROUTE_CACHE_COORD_DECIMALS)
+
+def combined_times_key():
+    """Cache key for /api/combined-times, or None for requests the view rejects"""
+    postcode = request.args.get('postcode')
+    live = request.args.get('live') == '1'
+    if postcode:
+        return ('combined-times', 'postcode', postcode.replace(' ', '').upper(), live)
+    try:
+        return ('combined-times', parse_coordinate(request.args['lat']), parse_coordinate(request.args['lon']), live)
+    except (KeyError, ValueError):
+        return None
+
+def route_key():
+    """Cache key for /api/route, or None for requests the view rejects"""
+    try:
+        return ('route', int(request.args['office_id']),
+                parse_coordinate(request.args['lat']), parse_coordinate(request.args['lon']))
+    except (KeyError, ValueError):
+        return None
+
 def create_app():
     """Flask application factory"""
     app = Flask(__name__, static_folder='static', static_url_path='/static')
@@ -34,21 +174,184 @@ def create_app():
         SESSION_COOKIE_HTTPONLY=True,
         SESSION_COOKIE_SAMESITE='Lax',
     )
+
+    # Fingerprinted, precompressed assets from `python static_assets.py`, if built
+    init_static_assets(app)
     
+    # The pool is created lazily so a worker boots even while the database is down
+    db_pool = None
+    db_ready = False
+    db_replicas = None
+    db_pool_lock = threading.Lock()
+    # In-flight get_* queries shared by concurrent requests of this worker
+    read_flight = SingleFlight()
+
+    def get_pool():
+        """Return the worker's connection pool, creating it and the schema once
+
+        Returns None for an embedded SQLite database, which needs no pool.
+        """
+        nonlocal db_pool, db_ready
+        if not db_ready:
+            with db_pool_lock:
+                if not db_ready:
+                    create_database(db_url)
+                    if is_sqlite_url(db_url):
+                        open_wait_time_lib(db_url).close()
+                    else:
+                        pool = create_pool(db_url,
+                                           minconn=DB_POOL_MIN,
+                                           maxconn=DB_POOL_MAX,
+                                           health_check_interval=DB_POOL_HEALTH_CHECK_INTERVAL,
+                                           checkout_timeout=DB_POOL_TIMEOUT)
+                        # Schema setup runs once per worker, never on the request path
+                        schema_session = WaitTimeLib(pool=pool)
+                        schema_session.close()
+                        db_pool = pool
+                    db_ready = True
+        return db_pool
+
+    def get_replicas():
+        """Return the worker's read replica pools, or None when none are configured"""
+        nonlocal db_replicas
+        if db_replicas is None and DATABASE_REPLICA_URLS:
+            with db_pool_lock:
+                if db_replicas is None:
+                    db_replicas = ReplicaSet.from_urls(
+                        DATABASE_REPLICA_URLS,
+                        max_lag=REPLICA_MAX_LAG_SECONDS,
+                        minconn=DB_POOL_MIN,
+                        maxconn=DB_POOL_MAX,
+                        health_check_interval=DB_POOL_HEALTH_CHECK_INTERVAL)
+        return db_replicas
+
+    def collect_pool_metrics():
+        """Report the usage of this worker's connection pools"""
+        pools = [('primary', db_pool)]
+        if db_replicas is not None:
+            pools += [(f"replica{i}", pool) for i, pool in enumerate(db_replicas.pools)]
+        for name, pool in pools:
+            if pool is not None:
+                in_use, idle = pool.usage()
+                metrics.DB_POOL_CONNECTIONS.set(in_use, pool=name, state='in_use')
+                metrics.DB_POOL_CONNECTIONS.set(idle, pool=name, state='idle')
+                metrics.DB_POOL_MAX_CONNECTIONS.set(pool.maxconn, pool=name)
+
+    metrics.REGISTRY.add_collector(collect_pool_metrics)
+
     @contextmanager
     def get_db():
         """Database connection context manager"""
         wait_time_data = None
         try:
-            create_database(db_url)
-            wait_time_data = WaitTimeLib(db_url)
-            yield wait_time_data
+            pool = get_pool()
+            if pool is None:
+                # SQLite connections are cheap to open per request
+                wait_time_data = open_wait_time_lib(db_url, create_tables=False)
+            else:
+                wait_time_data = WaitTimeLib(pool=pool, create_tables=False,
+                                             replicas=get_replicas())
+            # Times every storage query for /metrics, and lets concurrent
+            # requests share identical reads instead of repeating them
+            yield CoalescedReads(metrics.TimedBackend(wait_time_data), read_flight)
         except Exception as e:
             logger.error(f"Database error: {e}")
             raise
         finally:
             if wait_time_data:
                 wait_time_data.close()
+
+    def load_snapshot_version():
+        with get_db() as wait_time_data:
+            last_update = wait_time_data.get_last_update_time()
+        return last_update.isoformat() if last_update else None
+
+    response_cache = ResponseCache(load_snapshot_version,
+                                   check_interval=RESPONSE_CACHE_TTL,
+                                   max_entries=RESPONSE_CACHE_MAX_ENTRIES)
+
+    def load_current_snapshot():
+        with get_db() as wait_time_data:
+            current_data = wait_time_data.get_current_waiting()
+        return [{'stadsloket_id': sid, 'loket_name': name, 'wait_time': wait_time, 'people_waiting': waiting}
+                for sid, name, wait_time, waiting in current_data]
+
+    # Hosts the homepage was recently rendered for, most recent last
+    index_hosts = OrderedDict()
+    index_hosts_lock = threading.Lock()
+
+    def on_new_snapshot(version):
+        # The listener's first publish is usually the version already cached
+        response_cache.advance(version)
+        prerender_index()
+
+    # One listener per worker pushes new snapshots to every /api/stream client,
+    # and drops cached responses as soon as the collector has stored new data
+    snapshot_broadcaster = SnapshotBroadcaster(
+        load_current_snapshot,
+        load_snapshot_version,
+        dsn=None if is_sqlite_url(db_url) else db_url,
+        poll_interval=RESPONSE_CACHE_TTL,
+        on_snapshot=on_new_snapshot)
+    stream_slots = threading.BoundedSemaphore(STREAM_MAX_CLIENTS)
+
+    # In-flight renders shared by concurrent requests for the same cache key
+    render_flight = SingleFlight()
+
+    def render_into_cache(view, args, kwargs, key, version, compress):
+        """Run a view and cache its response if it may be; returns (body, status, headers)"""
+        response = make_response(view(*args, **kwargs))
+        if response.status_code == 200 and not response.cache_control.no_store:
+            response_cache.set(key, version, response.get_data(), response.mimetype, compress=compress)
+        return response.get_data(), response.status_code, list(response.headers.items())
+
+    def cached_response(key_func, compress=False):
+        """Serve a read endpoint from the snapshot cache with a strong ETag
+
+        key_func returns the cache key for the current request (None skips the
+        cache). Requests whose If-None-Match matches get a 304. Responses that
+        are not 200, or are marked no-store, are never cached. With compress
+        the body is also kept gzipped and sent that way to clients accepting it.
+        """
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                key = key_func()
+                if key is None:
+                    return view(*args, **kwargs)
+                try:
+                    version = response_cache.version()
+                except Exception as e:
+                    logger.error(f"Snapshot version check failed: {e}")
+                    return view(*args, **kwargs)
+
+                entry = response_cache.get(key, version)
+                metrics.RESPONSE_CACHE_LOOKUPS.inc(endpoint=key[0], result='miss' if entry is None else 'hit')
+                if entry is None:
+                    # Concurrent misses for the same key render once and share the result
+                    body, status, headers = render_flight.do(
+                        (key, version), render_into_cache, view, args, kwargs, key, version, compress)
+                    entry = response_cache.get(key, version)
+                    if entry is None:
+                        # Not cacheable, or rendered against a snapshot that was superseded meanwhile
+                        return Response(body, status=status, headers=headers)
+
+                etag, body, mimetype, gzipped = entry
+                if gzipped is not None and request.accept_encodings['gzip']:
+                    response = Response(gzipped, mimetype=mimetype)
+                    response.headers['Content-Encoding'] = 'gzip'
+                    # Each encoding is its own representation with its own strong ETag
+                    etag = f"{etag}-gzip"
+                else:
+                    response = Response(body, mimetype=mimetype)
+                if compress:
+                    response.vary.add('Accept-Encoding')
+
+                response.set_etag(etag)
+                response.headers['Cache-Control'] = f'public, max-age={RESPONSE_CACHE_TTL}'
+                return response.make_conditional(request)
+            return wrapper
+        return decorator
     
     @app.context_processor
     def inject_languages():
@@ -77,6 +380,10 @@ def create_app():
         if hasattr(request, 'start_time'):
             duration = time.time() - request.start_time
             logger.info(f"{request.method} {request.path} {response.status_code} ({duration:.2f}s)")
+            # Label by route pattern, so arbitrary URLs cannot create new series
+            route = request.url_rule.rule if request.url_rule else 'unmatched'
+            metrics.HTTP_REQUEST_DURATION.observe(duration, route=route, method=request.method)
+            metrics.HTTP_REQUESTS.inc(route=route, method=request.method, status=response.status_code)
         
         return response
     
@@ -117,6 +424,7 @@ def create_app():
                                lang=lang)
     
     @app.route('/api/offices', methods=['GET'])
+    @cached_response(lambda: ('offices',))
     def get_offices():
         try:
             offices = get_all_office_locations()
@@ -126,6 +434,7 @@ def create_app():
             return jsonify({"error": "Unable to fetch office locations"}), 500
 
     @app.route('/api/combined-times', methods=['GET'])
+    @cached_response(combined_times_key)
     def get_combined_times():
         user_lat = request.args.get('lat')
         user_lon = request.args.get('lon')
@@ -136,99 +445,172 @@ def create_app():
 
         try:
             if postcode:
-                coords = get_coords_from_postcode(postcode)
+                coords = get_coords_from_postcode(postcode, geocode_store=get_db)
                 if not coords:
                     return jsonify({"error": "Invalid postcode or could not geocode"}), 400
                 user_lat = coords['lat']
                 user_lon = coords['lon']
             else:
-                user_lat = float(user_lat)
-                user_lon = float(user_lon)
+                # Rounded like the cache key, so the cached answer fits every caller
+                user_lat = parse_coordinate(user_lat)
+                user_lon = parse_coordinate(user_lon)
         except ValueError:
             return jsonify({"error": "Invalid latitude or longitude"}), 400
 
         try:
             with get_db() as wait_time_data:
                 current_data = wait_time_data.get_current_waiting()
-                travel_times = calculate_travel_times(user_lat, user_lon)
-                
-                combined_data = []
-                for loket_data in current_data:
-                    loket_id, loket_name, wait_time_str, people_waiting_str = loket_data
-                    
-                    if loket_id in travel_times:
-                        travel_info = travel_times[loket_id]['travel']
-                        travel_duration = travel_info.get('duration_minutes')
-
-                        if travel_duration is not None:
-                            try:
-                                wait_time = int(wait_time_str)
-                                people_waiting = int(people_waiting_str)
-                                total_time = wait_time + travel_duration
-                                
-                                combined_data.append({
-                                    'stadsloket_id': loket_id,
-                                    'loket_name': loket_name,
-                                    'wait_time': wait_time,
-                                    'people_waiting': people_waiting,
-                                    'travel_time': travel_duration,
-                                    'distance_km': travel_info['distance_km'],
-                                    'total_time': total_time,
-                                    'geometry': travel_info.get('geometry', [])
-                                })
-                            except (ValueError, TypeError):
-                                logger.warning(f"Could not parse data for loket_id {loket_id}: wait_time='{wait_time_str}', people_waiting='{people_waiting_str}'")
-                
-                # Sort by total time
-                combined_data.sort(key=lambda x: x['total_time'])
-                
-            return jsonify({
+            # Routing happens after the connection went back to the pool
+            # ?live=1 routes with OpenRouteService even where the precomputed grid has an answer
+            travel_times = calculate_travel_times(user_lat, user_lon,
+                                                  use_grid=request.args.get('live') != '1')
+
+            combined_data = []
+            missing_routes = False
+            for loket_data in current_data:
+                loket_id, loket_name, wait_time, people_waiting = loket_data
+
+                if loket_id in travel_times:
+                    travel_info = travel_times[loket_id]['travel']
+                    travel_duration = travel_info.get('duration_minutes')
+
+                    if travel_duration is None:
+                        missing_routes = missing_routes or 'error' in travel_info
+                    else:
+                        if wait_time is None or people_waiting is None:
+                            logger.warning(f"Incomplete data for loket_id {loket_id}: wait_time={wait_time}, people_waiting={people_waiting}")
+                            continue
+
+                        combined_data.append({
+                            'stadsloket_id': loket_id,
+                            'loket_name': loket_name,
+                            'wait_time': wait_time,
+                            'people_waiting': people_waiting,
+                            'travel_time': travel_duration,
+                            'distance_km': travel_info['distance_km'],
+                            'total_time': wait_time + travel_duration,
+                            'geometry': travel_info.get('geometry', [])
+                        })
+
+            # Sort by total time
+            combined_data.sort(key=lambda x: x['total_time'])
+
+            response = jsonify({
                 'user_location': {'lat': user_lat, 'lon': user_lon},
                 'locations': combined_data
             })
+            if missing_routes:
+                # Partial answer (slow or failing routing); ask again rather than cache it
+                response.cache_control.no_store = True
+            return response
         except Exception as e:
             logger.error(f"Error in get_combined_times route: {e}")
             return jsonify({"error": "Unable to fetch combined times"}), 500
     
+    @app.route('/api/route', methods=['GET'])
+    @cached_response(route_key)
+    def get_route():
+        """Route geometry from a location to one office, fetched when the map shows it"""
+        try:
+            office_id = int(request.args['office_id'])
+            user_lat = parse_coordinate(request.args['lat'])
+            user_lon = parse_coordinate(request.args['lon'])
+        except (KeyError, ValueError):
+            return jsonify({"error": "office_id, lat and lon are required"}), 400
+        if get_office_location(office_id) is None:
+            return jsonify({"error": "Unknown office"}), 404
+
+        geometry = get_route_geometry(user_lat, user_lon, office_id)
+        if geometry is None:
+            return jsonify({"error": "Unable to fetch route"}), 502
+        return jsonify({'stadsloket_id': office_id, 'geometry': geometry})
+
+    def render_index_page(host_url, lang, current_data):
+        """Render / in one language for one host; returns the page as bytes"""
+        best_loket = min((row for row in current_data if row[2] is not None),
+                         key=lambda x: x[2], default=None)
+
+        # URLs for canonical and alternate language links
+        host = host_url.rstrip('/')
+        canonical_url = f"{host}/"
+        lang_urls = {code: f"{host}/?lang={code}" for code in INDEX_LANGUAGES}
+
+        # Rendered as the plain language URL, so og:url never carries another visitor's query string
+        query_string = {'lang': lang} if lang != DEFAULT_LANGUAGE else None
+        with app.test_request_context('/', base_url=host_url, query_string=query_string):
+            return render_template('index.html',
+                                   loket_data=current_data,
+                                   best_loket=best_loket,
+                                   canonical_url=canonical_url,
+                                   lang=lang,
+                                   lang_urls=lang_urls,
+                                   translations=translations).encode('utf-8')
+
+    def render_index_pages(host_url):
+        """Render / in every language for one trusted host against the current snapshot
+
+        The page only varies by language, host and snapshot, so all variants
+        are rendered from a single query and stored, gzipped, in the response
+        cache; the other languages are then served without rendering.
+
+        Returns:
+            dict: lang -> rendered page (bytes)
+        """
+        version = response_cache.version()
+        with get_db() as wait_time_data:
+            current_data = wait_time_data.get_current_waiting()
+
+        pages = {}
+        for lang in INDEX_LANGUAGES:
+            pages[lang] = render_index_page(host_url, lang, current_data)
+            response_cache.set(('index', lang, host_url), version, pages[lang], 'text/html', compress=True)
+
+        with index_hosts_lock:
+            index_hosts[host_url] = True
+            index_hosts.move_to_end(host_url)
+            while len(index_hosts) > INDEX_PRERENDER_HOSTS:
+                index_hosts.popitem(last=False)
+        return pages
+
+    def prerender_index():
+        """Render the homepage for recently served hosts as soon as a new snapshot is in"""
+        with index_hosts_lock:
+            hosts = list(index_hosts)
+        for host_url in hosts:
+            try:
+                render_index_pages(host_url)
+            except Exception as e:
+                logger.warning(f"Pre-rendering / for {host_url} failed: {e}")
+
     # Routes
     @app.route('/', methods=['GET'])
+    @cached_response(index_key, compress=True)
     def index():
-        lang = request.args.get('lang', 'nl')
-        
+        lang = index_language()
+
         try:
+            if index_host_is_trusted():
+                return Response(render_index_pages(request.host_url)[lang], mimetype='text/html')
+            # Any other Host gets just the requested page, rendered per request
             with get_db() as wait_time_data:
                 current_data = wait_time_data.get_current_waiting()
-                best_loket = min(current_data, key=lambda x: x[2]) if current_data else None
-                
-                # URLs for canonical and alternate language links
-                host = request.host_url.rstrip('/')
-                canonical_url = f"{host}{request.path}"
-                lang_urls = {
-                    'nl': f"{host}{request.path}?lang=nl",
-                    'en': f"{host}{request.path}?lang=en",
-                    'tr': f"{host}{request.path}?lang=tr",
-                    'ma': f"{host}{request.path}?lang=ma"
-                }
-                
-            return render_template('index.html', 
-                                  loket_data=current_data, 
-                                  best_loket=best_loket,
-                                  canonical_url=canonical_url,
-                                  lang=lang,
-                                  lang_urls=lang_urls,
-                                  translations=translations)
+            return Response(render_index_page(request.host_url, lang, current_data), mimetype='text/html')
         except Exception as e:
             logger.error(f"Index error: {e}")
-            return render_template('index.html', 
+            response = make_response(render_template('index.html', 
                                   loket_data=[], 
                                   best_loket=None, 
                                   last_update=None,
                                   error="Unable to fetch data",
                                   canonical_url=request.url,
                                   lang=lang,
-                                  translations=translations)
+                                  translations=translations))
+            # Keep the error page out of the response cache
+            response.cache_control.no_store = True
+            return response
 
     @app.route('/mean_wait_times', methods=['GET'])
+    @cached_response(lambda: ('mean_wait_times',))
     def mean_wait_times():
         try:
             with get_db() as wait_time_data:
@@ -238,38 +620,24 @@ def create_app():
             logger.error(f"Error in mean_wait_times route: {e}")
             return jsonify({"error": "Unable to fetch data"}), 500
 
+    @app.route('/api/wait-statistics', methods=['GET'])
+    @cached_response(lambda: ('wait_statistics',))
+    def wait_statistics():
+        try:
+            with get_db() as wait_time_data:
+                statistics = wait_time_data.get_wait_statistics()
+            return jsonify(statistics)
+        except Exception as e:
+            logger.error(f"Error in wait_statistics route: {e}")
+            return jsonify({"error": "Unable to fetch data"}), 500
+
     @app.route('/hourly_data', methods=['GET'])
+    @cached_response(lambda: ('hourly_data', resolve_day(request.args.get('day'))))
     def hourly_data():
         try:
-            # Get the day parameter from the request, defaulting to the current day
             # 0 = Sunday, 1 = Monday, ..., 6 = Saturday
-            day_param = request.args.get('day')
-            
-            if day_param is not None:
-                try:
-                    day = int(day_param)
-                    # Ensure day is in valid range
-                    if day < 0 or day > 6:
-                        # Default to Monday if invalid
-                        day = 1
-                except ValueError:
-                    # Default to Monday if invalid
-                    day = 1
-            else:
-                # Default to current day of week
-                from datetime import datetime
-                day = datetime.now().weekday()  # 0=Monday, 1=Tuesday, ..., 6=Sunday
-                # Convert from Python's weekday (0=Monday, 6=Sunday) to 
-                # JavaScript/PostgreSQL format (0=Sunday, 1=Monday, ..., 6=Saturday)
-                if day == 6:  # Sunday in Python is 6
-                    day = 0
-                else:
-                    day += 1
-                
-                # If it's a weekend, default to Monday
-                if day == 0 or day == 6:
-                    day = 1
-            
+            day = resolve_day(request.args.get('day'))
+
             with get_db() as wait_time_data:
                 data = wait_time_data.get_hourly_averages(day)
                 # Add opening hours info
@@ -281,18 +649,157 @@ def create_app():
             logger.error(f"Error in hourly_data route: {e}")
             return jsonify({"error": "Unable to fetch data"}), 500
     
+    @app.route('/api/hourly-profile', methods=['GET'])
+    @cached_response(lambda: ('hourly_profile',))
+    def hourly_profile():
+        """Hourly averages and opening hours for all days of the week in one payload"""
+        try:
+            with get_db() as wait_time_data:
+                days = wait_time_data.get_weekly_hourly_averages()
+                for day, data in days.items():
+                    data['opening_hours'] = wait_time_data.get_opening_hours(day)
+
+            return jsonify({'days': days})
+        except Exception as e:
+            logger.error(f"Error in hourly_profile route: {e}")
+            return jsonify({"error": "Unable to fetch data"}), 500
+
+    @app.route('/api/export', methods=['GET'])
+    def export_raw_data():
+        """Stream raw samples as CSV or NDJSON, optionally filtered by office and time range"""
+        export_format = request.args.get('format', 'csv')
+        if export_format not in ('csv', 'ndjson'):
+            return jsonify({"error": "format must be 'csv' or 'ndjson'"}), 400
+
+        try:
+            office = request.args.get('office')
+            office = int(office) if office else None
+            start = parse_export_time(request.args.get('start'))
+            end = parse_export_time(request.args.get('end'))
+        except ValueError:
+            return jsonify({"error": "Invalid office, start or end parameter"}), 400
+
+        def serialize_csv(rows):
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            for sid, name, waiting, waittime, ts in rows:
+                writer.writerow([sid, name, waiting, waittime, ts.isoformat()])
+            return buffer.getvalue()
+
+        def serialize_ndjson(rows):
+            return ''.join(
+                json.dumps({
+                    'stadsloket_id': sid,
+                    'loket_name': name,
+                    'waiting': waiting,
+                    'waittime': waittime,
+                    'timestamp': ts.isoformat()
+                }) + '\n'
+                for sid, name, waiting, waittime, ts in rows
+            )
+
+        serialize = serialize_csv if export_format == 'csv' else serialize_ndjson
+
+        def generate():
+            # The pooled connection is held only while the body is streaming
+            try:
+                with get_db() as wait_time_data:
+                    if export_format == 'csv':
+                        yield 'stadsloket_id,loket_name,waiting,waittime,timestamp\r\n'
+                    chunk = []
+                    for row in wait_time_data.iter_raw_data(stadsloket_id=office, start=start, end=end,
+                                                            fetch_size=EXPORT_FETCH_SIZE):
+                        chunk.append(row)
+                        if len(chunk) >= EXPORT_CHUNK_ROWS:
+                            yield serialize(chunk)
+                            chunk = []
+                    if chunk:
+                        yield serialize(chunk)
+            except Exception as e:
+                # Headers are already sent, so the client just sees a truncated body
+                logger.error(f"Error in export_raw_data stream: {e}")
+
+        mimetype = 'text/csv' if export_format == 'csv' else 'application/x-ndjson'
+        response = Response(stream_with_context(generate()), mimetype=mimetype)
+        response.headers['Content-Disposition'] = f'attachment; filename=wait_times.{export_format}'
+        return response
+
+    @app.route('/api/current', methods=['GET'])
+    @cached_response(lambda: ('current',))
+    def get_current():
+        """The current wait times, shaped like an /api/stream snapshot event"""
+        try:
+            return jsonify(snapshot_broadcaster.latest()[1] or [])
+        except Exception as e:
+            logger.error(f"Error in get_current route: {e}")
+            return jsonify({"error": "Unable to fetch current wait times"}), 500
+
+    @app.route('/api/stream', methods=['GET'])
+    def stream_snapshots():
+        """Server-Sent Events: the current wait times, then every new collector snapshot"""
+        if not stream_slots.acquire(blocking=False):
+            # EventSource does not retry an error status; the page polls /api/current instead
+            return Response("Too many open streams, poll /api/current\n", status=503, mimetype='text/plain')
+        last_event_id = request.headers.get('Last-Event-ID')
+
+        def event(version, snapshot):
+            return f"id: {version}\nevent: snapshot\ndata: {json.dumps(snapshot)}\n\n"
+
+        def generate():
+            # Clients reconnect on their own after an error
+            yield f"retry: {STREAM_KEEPALIVE_INTERVAL * 1000}\n\n"
+            try:
+                version, snapshot = snapshot_broadcaster.latest()
+            except Exception as e:
+                logger.error(f"Error in stream_snapshots route: {e}")
+                return
+            if version is not None and version != last_event_id:
+                yield event(version, snapshot)
+            while True:
+                update = snapshot_broadcaster.wait_for_update(version, timeout=STREAM_KEEPALIVE_INTERVAL)
+                if update is None:
+                    # Keeps proxies from closing an idle connection
+                    yield ": keep-alive\n\n"
+                    continue
+                version, snapshot = update
+                yield event(version, snapshot)
+
+        response = Response(generate(), mimetype='text/event-stream')
+        # Runs when the client disconnects, whether or not the stream got going
+        response.call_on_close(stream_slots.release)
+        response.headers['Cache-Control'] = 'no-cache'
+        # Stop nginx-style proxies from buffering the stream
+        response.headers['X-Accel-Buffering'] = 'no'
+        return response
+
+    @app.route('/metrics', methods=['GET'])
+    def metrics_endpoint():
+        """Prometheus metrics, of all workers when PROMETHEUS_MULTIPROC_DIR is set"""
+        if METRICS_TOKEN and request.headers.get('Authorization') != f"Bearer {METRICS_TOKEN}":
+            return Response("Unauthorized\n", status=401, mimetype='text/plain')
+        return Response(metrics.REGISTRY.expose(), content_type=metrics.CONTENT_TYPE)
+
     # Health check endpoint for monitoring
     @app.route('/health', methods=['GET'])
     def health_check():
         try:
             with get_db() as wait_time_data:
-                # Simple DB connectivity check
-                pass
+                # Simple DB connectivity check against the primary
+                wait_time_data.cursor.execute("SELECT 1")
             return jsonify({"status": "ok"}), 200
         except Exception as e:
             logger.error(f"Health check failed: {e}")
             return jsonify({"status": "error", "message": str(e)}), 500
-    
+
+    # Listen from the start so cached responses are dropped and / is
+    # re-rendered on new snapshots even while no dashboard streams
+    snapshot_broadcaster.start()
+    # With gunicorn --preload the listener thread does not survive the fork into the workers
+    os.register_at_fork(after_in_child=snapshot_broadcaster.start)
+    # Share this worker's samples with the one that answers the next scrape
+    metrics.REGISTRY.start_writer()
+    os.register_at_fork(after_in_child=metrics.REGISTRY.start_writer)
+
     return app
 
 # For local development
@@ -0,0 +1,381 @@
+"""HTTP load benchmark for the web app.
+
+Seeds a scratch database with synthetic months of wait_times, starts local
+stand-ins for OpenRouteService, Nominatim and wachttijdenamsterdam.nl, boots
+create_app() in a separate server process pointed at both, and drives each
+endpoint at a fixed concurrency. Requests/s and p50/p95/p99 latency per
+endpoint are printed and written to a JSON results file that a later run can
+be compared against:
+
+    BENCH_DATABASE_URL=postgresql://localhost/wachtwijzer_bench python benchmarks/bench_http.py
+    BENCH_DATABASE_URL=... python benchmarks/bench_http.py --compare benchmarks/results/<earlier>.json
+
+Seeding only happens while wait_times is empty, so the database is reused
+across runs; point BENCH_DATABASE_URL at a database you can throw away.
+"""
+import argparse
+import json
+import math
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytz
+import requests
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+from fake_upstreams import OFFICES, WAITTIMES, start_fake_upstreams  # noqa: E402
+
+amsterdam_tz = pytz.timezone('Europe/Amsterdam')
+RESULTS_DIR = os.path.join(REPO_ROOT, 'benchmarks', 'results')
+
+# Rough bounding box of Amsterdam for random user locations
+AMSTERDAM_BOUNDS = ((52.30, 52.42), (4.76, 4.98))
+
+
+def random_location(rng):
+    (lat_min, lat_max), (lon_min, lon_max) = AMSTERDAM_BOUNDS
+    return round(rng.uniform(lat_min, lat_max), 4), round(rng.uniform(lon_min, lon_max), 4)
+
+
+def random_postcode(rng):
+    return f"{rng.randint(1011, 1109)}{rng.choice('ABCDEFGHJKLMNPRSTVWXZ')}{rng.choice('ABCDEFGHJKLMNPRSTVWXZ')}"
+
+
+def endpoint_paths(location_pool):
+    """Endpoint name -> function(rng) returning the next request path
+
+    User locations and postcodes are drawn from a fixed pool, so the
+    combined-times caches see a realistic mix of hits and misses.
+    """
+    setup_rng = random.Random(42)
+    locations = [random_location(setup_rng) for _ in range(location_pool)]
+    postcodes = [random_postcode(setup_rng) for _ in range(location_pool)]
+    export_start = (datetime.now(amsterdam_tz) - timedelta(days=1)).strftime('%Y-%m-%dT%H:%M')
+
+    return {
+        'index': lambda rng: '/',
+        'index_en': lambda rng: '/?lang=en',
+        'mean_wait_times': lambda rng: '/mean_wait_times',
+        'wait_statistics': lambda rng: '/api/wait-statistics',
+        'hourly_data': lambda rng: f"/hourly_data?day={rng.randint(0, 6)}",
+        'hourly_profile': lambda rng: '/api/hourly-profile',
+        'offices': lambda rng: '/api/offices',
+        'combined_times': lambda rng: '/api/combined-times?lat={}&lon={}'.format(*rng.choice(locations)),
+        'combined_postcode': lambda rng: f"/api/combined-times?postcode={rng.choice(postcodes)}",
+        'export': lambda rng: f"/api/export?format=ndjson&start={export_start}",
+        'health': lambda rng: '/health',
+    }
+
+
+# ---------------------------------------------------------------------------
+# Setup
+# ---------------------------------------------------------------------------
+
+def synthetic_snapshot(rng, snapshot_time):
+    # Busier during opening hours, like the real feed
+    open_now = snapshot_time.weekday() < 5 and 9 <= snapshot_time.hour < 17
+    return [{'id': office_id,
+             'waiting': rng.randint(0, 25) if open_now else 0,
+             'waittime': rng.choice(WAITTIMES) if open_now else 'geen'} for office_id in OFFICES]
+
+
+def seed_database(db_url, months, page_size=5000):
+    """Fill an empty wait_times with 15-minute snapshots covering the last months"""
+    from wait_time_data import open_wait_time_lib
+
+    wait_time = open_wait_time_lib(db_url)
+    try:
+        wait_time.fetch_loket_names()
+        if wait_time.get_last_update_time() is not None:
+            print("wait_times already holds data, skipping seeding")
+            return 0
+        rng = random.Random(1)
+        end = datetime.now(amsterdam_tz).replace(second=0, microsecond=0)
+        count = months * 30 * 24 * 4
+        times = [end - timedelta(minutes=15 * i) for i in reversed(range(count))]
+        snapshots = [(ts, synthetic_snapshot(rng, ts)) for ts in times]
+        wait_time.ensure_partitions(since=snapshots[0][0])
+        start = time.perf_counter()
+        rows = wait_time.store_snapshots(snapshots, page_size=page_size)
+        print(f"Seeded {rows} rows ({months} months) in {time.perf_counter() - start:.1f}s")
+        return rows
+    finally:
+        wait_time.close()
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(args, environment, port):
+    """Start the app in its own process, so the load generator does not share its GIL"""
+    if args.server == 'gunicorn':
+        if not shutil.which('gunicorn'):
+            raise RuntimeError("gunicorn is not installed: pip install gunicorn")
+        command = ['gunicorn', '--workers', str(args.workers), '--threads', str(args.threads),
+                   '--worker-class', 'gthread', '--bind', f"127.0.0.1:{port}", 'app:app']
+    else:
+        command = [sys.executable, os.path.abspath(__file__), '--serve-port', str(port)]
+    log = open(args.server_log, 'ab') if args.server_log else subprocess.DEVNULL
+    process = subprocess.Popen(command, cwd=REPO_ROOT, env=environment, stdout=log, stderr=log)
+
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"App server exited with code {process.returncode}")
+        try:
+            if requests.get(f"{base_url}/health", timeout=5).status_code == 200:
+                return process, base_url
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("App server did not become healthy within 60s")
+
+
+def serve(port):
+    """--serve-port mode: run create_app() on a threaded werkzeug server"""
+    from werkzeug.serving import make_server
+
+    from app import app
+    make_server('127.0.0.1', port, app, threaded=True).serve_forever()
+
+
+class Collector(threading.Thread):
+    """Stores a snapshot from the fake feed every interval, like the collector does"""
+
+    def __init__(self, db_url, interval):
+        super().__init__(name='bench-collector', daemon=True)
+        self.db_url = db_url
+        self.interval = interval
+        self.snapshots = 0
+        self.stopped = threading.Event()
+
+    def run(self):
+        from wait_time_data import open_wait_time_lib
+        while not self.stopped.wait(self.interval):
+            wait_time = open_wait_time_lib(self.db_url, create_tables=False)
+            try:
+                wait_time.store_data(wait_time.fetch_data())
+                self.snapshots += 1
+            finally:
+                wait_time.close()
+
+
+# ---------------------------------------------------------------------------
+# Load generation
+# ---------------------------------------------------------------------------
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an ascending list"""
+    if not sorted_values:
+        return None
+    return sorted_values[max(0, math.ceil(p / 100 * len(sorted_values)) - 1)]
+
+
+def drive(base_url, next_path, concurrency, duration):
+    """Closed-loop load: each worker sends its next request as soon as the last returned
+
+    Returns:
+        tuple: (latencies in seconds of successful requests, error count, elapsed seconds)
+    """
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    start_barrier = threading.Barrier(concurrency + 1)
+    stop_at = [0.0]
+
+    def worker(seed):
+        rng = random.Random(seed)
+        session = requests.Session()
+        own_latencies, own_errors = [], 0
+        start_barrier.wait()
+        while time.perf_counter() < stop_at[0]:
+            path = next_path(rng)
+            start = time.perf_counter()
+            try:
+                response = session.get(f"{base_url}{path}", timeout=30)
+                response.content
+                ok = response.status_code < 400
+            except requests.RequestException:
+                ok = False
+            if ok:
+                own_latencies.append(time.perf_counter() - start)
+            else:
+                own_errors += 1
+        with lock:
+            latencies.extend(own_latencies)
+            errors[0] += own_errors
+
+    threads = [threading.Thread(target=worker, args=(seed,), daemon=True) for seed in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    began = time.perf_counter()
+    stop_at[0] = began + duration
+    start_barrier.wait()
+    for thread in threads:
+        thread.join()
+    return latencies, errors[0], time.perf_counter() - began
+
+
+def summarize(latencies, errors, elapsed):
+    latencies = sorted(latencies)
+
+    def ms(value):
+        return round(value * 1000, 2) if value is not None else None
+
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'rps': round(len(latencies) / elapsed, 1),
+        'mean_ms': ms(sum(latencies) / len(latencies)) if latencies else None,
+        'p50_ms': ms(percentile(latencies, 50)),
+        'p95_ms': ms(percentile(latencies, 95)),
+        'p99_ms': ms(percentile(latencies, 99)),
+        'max_ms': ms(latencies[-1]) if latencies else None,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Reporting
+# ---------------------------------------------------------------------------
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def format_number(value, digits=1):
+    return '-' if value is None else f"{value:,.{digits}f}"
+
+
+def print_results(results, baseline=None):
+    header = f"{'endpoint':<20}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}"
+    if baseline:
+        header += f"{'req/s vs base':>15}{'p99 vs base':>13}"
+    print(header)
+    for name, result in results.items():
+        line = (f"{name:<20}{format_number(result['rps']):>10}{format_number(result['p50_ms']):>10}"
+                f"{format_number(result['p95_ms']):>10}{format_number(result['p99_ms']):>10}{result['errors']:>8}")
+        base = (baseline or {}).get(name)
+        if base:
+            line += f"{relative_change(result['rps'], base['rps']):>15}"
+            line += f"{relative_change(result['p99_ms'], base['p99_ms']):>13}"
+        print(line)
+
+
+def relative_change(value, base):
+    if not value or not base:
+        return '-'
+    return f"{(value - base) / base * 100:+.0f}%"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the web app against local stand-ins for its upstreams")
+    parser.add_argument("--endpoints", help="Comma-separated subset of endpoints to drive (default: all)")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent clients per endpoint")
+    parser.add_argument("--duration", type=float, default=10, help="Measured seconds per endpoint")
+    parser.add_argument("--warmup", type=float, default=2, help="Unmeasured seconds per endpoint first")
+    parser.add_argument("--seed-months", type=int, default=3, help="Months of history to seed an empty database with")
+    parser.add_argument("--location-pool", type=int, default=50,
+                        help="Distinct user locations and postcodes for combined-times")
+    parser.add_argument("--ors-latency", type=float, default=0.15, help="Seconds per fake routing request")
+    parser.add_argument("--nominatim-latency", type=float, default=0.3, help="Seconds per fake geocoding request")
+    parser.add_argument("--wait-times-latency", type=float, default=0.1, help="Seconds per fake wait time page")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Random +/- seconds on every fake latency")
+    parser.add_argument("--collect-interval", type=float, default=0,
+                        help="Store a new snapshot every N seconds during the run (0: never)")
+    parser.add_argument("--server", choices=['werkzeug', 'gunicorn'], default='werkzeug')
+    parser.add_argument("--workers", type=int, default=2, help="gunicorn worker processes")
+    parser.add_argument("--threads", type=int, default=16, help="gunicorn threads per worker")
+    parser.add_argument("--server-log", help="Append the app server's output to this file")
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/http-<revision>-<time>.json)")
+    parser.add_argument("--compare", help="Earlier results file to show changes against")
+    parser.add_argument("--serve-port", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve_port:
+        serve(args.serve_port)
+        return
+
+    db_url = os.getenv('BENCH_DATABASE_URL')
+    if not db_url:
+        raise RuntimeError("BENCH_DATABASE_URL environment variable is not set")
+
+    paths = endpoint_paths(args.location_pool)
+    selected = args.endpoints.split(',') if args.endpoints else list(paths)
+    unknown = [name for name in selected if name not in paths]
+    if unknown:
+        parser.error(f"Unknown endpoints: {', '.join(unknown)} (choose from {', '.join(paths)})")
+
+    upstreams = start_fake_upstreams(args.ors_latency, args.nominatim_latency, args.wait_times_latency, args.jitter)
+    # Before the first import of the app modules, which read these at import time
+    os.environ.update(upstreams.environment())
+    os.environ['DATABASE_URL'] = db_url
+    seed_database(db_url, args.seed_months)
+
+    environment = dict(os.environ)
+    process, base_url = start_server(args, environment, free_port())
+    collector = Collector(db_url, args.collect_interval) if args.collect_interval else None
+    if collector:
+        collector.start()
+
+    results = {}
+    try:
+        for name in selected:
+            if args.warmup:
+                drive(base_url, paths[name], args.concurrency, args.warmup)
+            results[name] = summarize(*drive(base_url, paths[name], args.concurrency, args.duration))
+            print(f"{name}: {results[name]['rps']} req/s, p99 {results[name]['p99_ms']} ms")
+    finally:
+        if collector:
+            collector.stopped.set()
+        process.terminate()
+        process.wait(timeout=30)
+        upstreams_requests = upstreams.request_counts()
+        upstreams.shutdown()
+
+    revision = git_revision()
+    report = {
+        'benchmark': 'http',
+        'timestamp': datetime.now(amsterdam_tz).isoformat(),
+        'git_revision': revision,
+        'config': {key: value for key, value in vars(args).items()
+                   if key not in ('output', 'compare', 'serve_port', 'server_log')},
+        'database': 'sqlite' if db_url.startswith('sqlite:') else 'postgresql',
+        'upstream_requests': upstreams_requests,
+        'collector_snapshots': collector.snapshots if collector else 0,
+        'results': results,
+    }
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"http-{revision or 'unknown'}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+    print()
+    print_results(results, baseline)
+    print(f"\nUpstream requests: {upstreams_requests}")
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""Ingest benchmark for WaitTimeLib.
+
+Compares the old per-office INSERT loop with the batched store_data() path and
+measures backfill throughput of store_snapshots().
+
+Writes synthetic rows, so point BENCH_DATABASE_URL at an empty scratch database:
+
+    BENCH_DATABASE_URL=postgresql://localhost/wachtwijzer_bench python benchmarks/bench_ingest.py
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+import pytz
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from wait_time_data import WaitTimeLib  # noqa: E402
+
+OFFICE_IDS = [5, 6, 7, 8, 9, 10, 11]
+WAITTIMES = ['geen', '5 minuten', '15 minuten', '35 minuten', 'meer dan een uur']
+amsterdam_tz = pytz.timezone('Europe/Amsterdam')
+
+
+class RoundTripCounter:
+    """Proxy around a cursor or connection that counts calls hitting the server."""
+
+    COUNTED = {'execute', 'executemany', 'commit', 'rollback'}
+
+    def __init__(self, target, counts):
+        self._target = target
+        self._counts = counts
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if name in self.COUNTED:
+            def counted(*args, **kwargs):
+                self._counts['round_trips'] += 1
+                return attr(*args, **kwargs)
+            return counted
+        return attr
+
+
+def synthetic_snapshot():
+    return [{'id': office_id,
+             'waiting': random.randint(0, 25),
+             'waittime': random.choice(WAITTIMES)} for office_id in OFFICE_IDS]
+
+
+def legacy_store_data(wait_time, data):
+    """The pre-batching ingest path: three statements per office, one timestamp per row."""
+    for entry in data:
+        parsed_waittime = wait_time.parse_waittime(entry['waittime'])
+        current_time = datetime.now(wait_time.timezone)
+        wait_time.cursor.execute("""
+        INSERT INTO wait_times (stadsloket_id, waiting, waittime, timestamp)
+        VALUES (%s, %s, %s, %s)
+        """, (entry['id'], entry['waiting'], parsed_waittime, current_time))
+        wait_time.cursor.execute("""
+        INSERT INTO hourly_wait_stats (stadsloket_id, day_of_week, hour, waittime_sum, sample_count)
+        VALUES (%s, %s, %s, %s, 1)
+        ON CONFLICT (stadsloket_id, day_of_week, hour)
+        DO UPDATE SET waittime_sum = hourly_wait_stats.waittime_sum + EXCLUDED.waittime_sum,
+                      sample_count = hourly_wait_stats.sample_count + 1
+        """, (entry['id'], (current_time.weekday() + 1) % 7, current_time.hour, parsed_waittime))
+        wait_time.cursor.execute("""
+        INSERT INTO current_wait_times (stadsloket_id, waiting, waittime, timestamp)
+        VALUES (%s, %s, %s, %s)
+        ON CONFLICT (stadsloket_id)
+        DO UPDATE SET waiting = EXCLUDED.waiting,
+                      waittime = EXCLUDED.waittime,
+                      timestamp = EXCLUDED.timestamp
+        WHERE current_wait_times.timestamp <= EXCLUDED.timestamp
+        """, (entry['id'], entry['waiting'], parsed_waittime, current_time))
+    wait_time.db.commit()
+
+
+def measure_snapshot(wait_time, store, repeats):
+    counts = {'round_trips': 0}
+    cursor, db = wait_time.cursor, wait_time.db
+    wait_time.cursor = RoundTripCounter(cursor, counts)
+    wait_time.db = RoundTripCounter(db, counts)
+    try:
+        start = time.perf_counter()
+        for _ in range(repeats):
+            store(wait_time, synthetic_snapshot())
+        elapsed = time.perf_counter() - start
+    finally:
+        wait_time.cursor, wait_time.db = cursor, db
+    return counts['round_trips'] / repeats, elapsed / repeats * 1000
+
+
+def measure_backfill(wait_time, days, page_size):
+    # One snapshot every 15 minutes, ending yesterday
+    end = datetime.now(amsterdam_tz).replace(second=0, microsecond=0) - timedelta(days=1)
+    count = days * 24 * 4
+    snapshots = [(end - timedelta(minutes=15 * i), synthetic_snapshot()) for i in range(count)]
+    wait_time.ensure_partitions(since=snapshots[-1][0])
+    start = time.perf_counter()
+    rows = wait_time.store_snapshots(snapshots, page_size=page_size)
+    elapsed = time.perf_counter() - start
+    return rows, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the wait time ingest path")
+    parser.add_argument("--snapshots", type=int, default=200,
+                        help="Single snapshots to store per method")
+    parser.add_argument("--backfill-days", type=int, default=30,
+                        help="Days of 15-minute snapshots to bulk load")
+    parser.add_argument("--page-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    db_url = os.getenv('BENCH_DATABASE_URL')
+    if not db_url:
+        raise RuntimeError("BENCH_DATABASE_URL environment variable is not set")
+
+    wait_time = WaitTimeLib(db_url)
+    try:
+        legacy_trips, legacy_ms = measure_snapshot(wait_time, legacy_store_data, args.snapshots)
+        batched_trips, batched_ms = measure_snapshot(
+            wait_time, lambda lib, data: lib.store_data(data), args.snapshots)
+        rows, elapsed = measure_backfill(wait_time, args.backfill_days, args.page_size)
+    finally:
+        wait_time.close()
+
+    print(f"{'method':<22}{'round trips/snapshot':>22}{'ms/snapshot':>14}")
+    print(f"{'per-row INSERT loop':<22}{legacy_trips:>22.1f}{legacy_ms:>14.2f}")
+    print(f"{'store_data (batched)':<22}{batched_trips:>22.1f}{batched_ms:>14.2f}")
+    print()
+    print(f"Backfill: {rows} rows in {elapsed:.2f}s ({rows / elapsed:,.0f} rows/s, page size {args.page_size})")
+
+
+if __name__ == "__main__":
+    main()
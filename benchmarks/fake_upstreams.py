@@ -0,0 +1,207 @@
+"""Local stand-ins for the external services the app and the collector call.
+
+Each server answers with plausible data after a configurable delay, so
+benchmarks measure the app rather than OpenRouteService, Nominatim or
+wachttijdenamsterdam.nl (and do not hammer their rate limits):
+
+    servers = start_fake_upstreams(ors_latency=0.2)
+    os.environ.update(servers.environment())
+
+Run directly to keep them up for manual testing:
+
+    python benchmarks/fake_upstreams.py --ors-latency 0.2
+"""
+import argparse
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import polyline
+
+OFFICES = {
+    5: 'Centrum', 6: 'Nieuw-West', 7: 'Noord', 8: 'Oost',
+    9: 'West', 10: 'Zuid', 11: 'Zuidoost',
+}
+WAITTIMES = ['geen', '5 minuten', '15 minuten', '35 minuten', 'meer dan een uur']
+# Average cycling speed the fake router assumes, in m/s (15 km/h)
+CYCLING_SPEED = 15 / 3.6
+
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * 6371000 * math.asin(math.sqrt(a))
+
+
+class FakeHandler(BaseHTTPRequestHandler):
+    """Base handler: sleeps for the server's latency, then dispatches"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def delay(self):
+        latency, jitter = self.server.latency, self.server.jitter
+        if latency or jitter:
+            time.sleep(max(0.0, latency + random.uniform(-jitter, jitter)))
+        self.server.count()
+
+    def send_body(self, body, content_type='application/json', status=200):
+        if not isinstance(body, bytes):
+            body = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def read_json(self):
+        return json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+
+
+class FakeORSHandler(FakeHandler):
+    """OpenRouteService directions and matrix: straight lines at cycling speed"""
+
+    def do_POST(self):
+        body = self.read_json()
+        self.delay()
+        if '/matrix/' in self.path:
+            self.send_matrix(body)
+            return
+        (from_lon, from_lat), (to_lon, to_lat) = body['coordinates'][:2]
+        distance = haversine_m(from_lat, from_lon, to_lat, to_lon) * 1.3
+        route = {'summary': {'duration': distance / CYCLING_SPEED, 'distance': distance}}
+        if body.get('geometry', True):
+            route['geometry'] = polyline.encode([(from_lat, from_lon), (to_lat, to_lon)])
+        self.send_body({'routes': [route]})
+
+    def send_matrix(self, body):
+        locations = body['locations']
+        sources = body.get('sources', range(len(locations)))
+        destinations = body.get('destinations', range(len(locations)))
+        distances = [[haversine_m(locations[source][1], locations[source][0],
+                                  locations[destination][1], locations[destination][0]) * 1.3
+                      for destination in destinations] for source in sources]
+        self.send_body({'durations': [[distance / CYCLING_SPEED for distance in row] for row in distances],
+                        'distances': distances})
+
+
+class FakeNominatimHandler(FakeHandler):
+    """Nominatim search: every well-formed postcode maps to a stable point in Amsterdam"""
+
+    def do_GET(self):
+        query = parse_qs(urlparse(self.path).query)
+        self.delay()
+        postcode = query.get('postalcode', [''])[0]
+        if not re.match(r'^[1-9][0-9]{3}[A-Z]{2}$', postcode):
+            self.send_body([])
+            return
+        digest = hashlib.sha256(postcode.encode()).digest()
+        lat = 52.30 + digest[0] / 255 * 0.12
+        lon = 4.76 + digest[1] / 255 * 0.22
+        self.send_body([{'lat': f"{lat:.7f}", 'lon': f"{lon:.7f}"}])
+
+
+class FakeWaitTimesHandler(FakeHandler):
+    """wachttijdenamsterdam.nl: the /data/ feed and the office table on the home page"""
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        self.delay()
+        if path.rstrip('/') == '/data':
+            self.send_body([{'id': office_id,
+                             'waiting': random.randint(0, 25),
+                             'waittime': random.choice(WAITTIMES)} for office_id in OFFICES])
+        else:
+            rows = ''.join(f'<tr><td data-title="Stadsloket">\n{name}</td>'
+                           f'<td id="nfwrt{office_id}"></td></tr>' for office_id, name in OFFICES.items())
+            self.send_body(f"<html><body><table>{rows}</table></body></html>".encode(), 'text/html')
+
+
+class FakeServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, handler, latency=0.0, jitter=0.0):
+        super().__init__(('127.0.0.1', 0), handler)
+        self.latency = latency
+        self.jitter = jitter
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def count(self):
+        with self._lock:
+            self.requests += 1
+
+
+class FakeUpstreams:
+    def __init__(self, ors, nominatim, wait_times):
+        self.ors = ors
+        self.nominatim = nominatim
+        self.wait_times = wait_times
+
+    @property
+    def servers(self):
+        return {'ors': self.ors, 'nominatim': self.nominatim, 'wait_times': self.wait_times}
+
+    def environment(self):
+        """Environment variables pointing the app and the collector at the stand-ins"""
+        return {
+            'ORS_API_KEY': 'benchmark',
+            'ORS_BASE_URL': f"{self.ors.url}/v2/directions/cycling-regular",
+            'ORS_MATRIX_URL': f"{self.ors.url}/v2/matrix/cycling-regular",
+            'NOMINATIM_URL': f"{self.nominatim.url}/search",
+            'WAIT_TIMES_SITE_URL': self.wait_times.url,
+        }
+
+    def request_counts(self):
+        return {name: server.requests for name, server in self.servers.items()}
+
+    def shutdown(self):
+        for server in self.servers.values():
+            server.shutdown()
+            server.server_close()
+
+
+def start_fake_upstreams(ors_latency=0.0, nominatim_latency=0.0, wait_times_latency=0.0, jitter=0.0):
+    """Start the three stand-ins on free local ports, each in a daemon thread"""
+    upstreams = FakeUpstreams(
+        FakeServer(FakeORSHandler, ors_latency, jitter),
+        FakeServer(FakeNominatimHandler, nominatim_latency, jitter),
+        FakeServer(FakeWaitTimesHandler, wait_times_latency, jitter),
+    )
+    for name, server in upstreams.servers.items():
+        threading.Thread(target=server.serve_forever, name=f"fake-{name}", daemon=True).start()
+    return upstreams
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run local stand-ins for ORS, Nominatim and wachttijdenamsterdam.nl")
+    parser.add_argument("--ors-latency", type=float, default=0.0, help="Seconds per routing request")
+    parser.add_argument("--nominatim-latency", type=float, default=0.0, help="Seconds per geocoding request")
+    parser.add_argument("--wait-times-latency", type=float, default=0.0, help="Seconds per wait time page")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Random +/- seconds added to every latency")
+    args = parser.parse_args()
+
+    upstreams = start_fake_upstreams(args.ors_latency, args.nominatim_latency, args.wait_times_latency, args.jitter)
+    for name, value in upstreams.environment().items():
+        print(f"{name}={value}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        upstreams.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -6,7 +6,7 @@ from contextlib import contextmanager
 import pytz
 from dotenv import load_dotenv
 
-from wait_time_data import WaitTimeLib, create_database
+from wait_time_data import create_database, open_wait_time_lib
 
 # ---------------------------------------------------------------------------
 # Logging configuration with explicit Amsterdam timezone
@@ -37,7 +37,10 @@ def wait_time_session():
     """Provide a WaitTimeLib instance with automatic cleanup."""
     wait_time = None
     try:
-        wait_time = WaitTimeLib(DB_URL)
+        # The schema is set up by `maintenance.py migrate`; each run only
+        # makes sure the partition its samples go into exists
+        wait_time = open_wait_time_lib(DB_URL, create_tables=False)
+        wait_time.ensure_partitions()
         yield wait_time
     finally:
         if wait_time:
@@ -3,7 +3,7 @@ import time
 import logging
 from datetime import datetime
 import pytz
-from wait_time_data import WaitTimeLib, create_database
+from wait_time_data import create_database, open_wait_time_lib
 from dotenv import load_dotenv
 import os
 import requests
@@ -45,7 +45,10 @@ def wait_time_session():
     """Safe database connection context manager"""
     wait_time = None
     try:
-        wait_time = WaitTimeLib(db_url)
+        # The schema is set up by `maintenance.py migrate`; each run only
+        # makes sure the partition its samples go into exists
+        wait_time = open_wait_time_lib(db_url, create_tables=False)
+        wait_time.ensure_partitions()
         yield wait_time
     except Exception as e:
         logger.error(f"DB connection error: {e}")
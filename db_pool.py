@@ -0,0 +1,183 @@
+import logging
+import random
+import threading
+import time
+
+import psycopg2
+from psycopg2.pool import PoolError, ThreadedConnectionPool
+
+logger = logging.getLogger(__name__)
+
+# Session timezone applied once to every physical connection the pool opens
+SESSION_TIMEZONE = 'Europe/Amsterdam'
+
+
+class WaitTimePool(ThreadedConnectionPool):
+    """Thread-safe PostgreSQL connection pool for WaitTimeLib.
+
+    Each physical connection gets its session timezone set exactly once when it
+    is opened. Connections that sat idle for longer than ``health_check_interval``
+    seconds are pinged with ``SELECT 1`` before being handed out, and replaced
+    transparently when the server dropped them.
+
+    ``minconn`` connections are opened up front; every connection opened after
+    that stays open for reuse, up to ``maxconn``. When all ``maxconn`` are in
+    use, ``getconn`` waits up to ``checkout_timeout`` seconds for one to be
+    handed back instead of failing right away.
+    """
+
+    def __init__(self, minconn, maxconn, dsn, health_check_interval=30, checkout_timeout=10, **kwargs):
+        self.health_check_interval = health_check_interval
+        self.checkout_timeout = checkout_timeout
+        self._last_used = {}
+        self._health_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(maxconn)
+        super().__init__(minconn, maxconn, dsn, **kwargs)
+        # psycopg2 closes a handed-back connection once minconn are idle, so a
+        # burst above minconn would reconnect on every request
+        self.minconn = maxconn
+
+    def _connect(self, key=None):
+        conn = super()._connect(key)
+        with conn.cursor() as cursor:
+            cursor.execute(f"SET timezone = '{SESSION_TIMEZONE}';")
+        conn.commit()
+        with self._health_lock:
+            self._last_used[id(conn)] = time.monotonic()
+        return conn
+
+    def _is_healthy(self, conn):
+        if conn.closed:
+            return False
+        with self._health_lock:
+            last_used = self._last_used.get(id(conn), 0)
+        if time.monotonic() - last_used < self.health_check_interval:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error as e:
+            logger.warning(f"Discarding broken pooled connection: {e}")
+            return False
+
+    def getconn(self, key=None, timeout=None):
+        """Borrow a connection, waiting up to timeout seconds (default checkout_timeout) for a free one"""
+        if timeout is None:
+            timeout = self.checkout_timeout
+        if not self._slots.acquire(timeout=timeout):
+            raise PoolError(f"No database connection became free within {timeout}s")
+        try:
+            # One attempt per slot plus one for a freshly opened connection
+            for _ in range(self.maxconn + 1):
+                conn = super().getconn(key)
+                if self._is_healthy(conn):
+                    return conn
+                self._discard(conn, key)
+            raise psycopg2.OperationalError("No healthy database connection available")
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def putconn(self, conn, key=None, close=False):
+        self._discard(conn, key, close=close)
+        self._slots.release()
+
+    def _discard(self, conn, key=None, close=True):
+        """Return conn to psycopg2's pool without freeing its checkout slot"""
+        super().putconn(conn, key, close=close)
+        with self._health_lock:
+            if conn.closed:
+                self._last_used.pop(id(conn), None)
+            else:
+                self._last_used[id(conn)] = time.monotonic()
+
+    def usage(self):
+        """Return (in_use, idle) counts of the pool's open connections."""
+        with self._lock:
+            return len(self._used), len(self._pool)
+
+def create_pool(dsn, minconn=1, maxconn=10, health_check_interval=30, checkout_timeout=10):
+    """Create a WaitTimePool for the given connection string."""
+    if not dsn:
+        raise ValueError("A database connection string is required to create a pool")
+    logger.info(f"Creating database pool (min={minconn}, max={maxconn})")
+    return WaitTimePool(minconn, maxconn, dsn, health_check_interval=health_check_interval,
+                        checkout_timeout=checkout_timeout)
+
+
+class ReplicaSet:
+    """Read replicas that WaitTimeLib routes get_* queries to.
+
+    A replica is only used while its replication lag is within ``max_lag``
+    seconds. Lag is measured at most once per ``lag_check_interval`` seconds per
+    replica; callers fall back to the primary when no replica qualifies.
+    """
+
+    # Zero when the server is not a standby (e.g. a plain second instance in
+    # development) or has replayed everything it received
+    LAG_SQL = """
+        SELECT CASE
+            WHEN NOT pg_is_in_recovery() THEN 0
+            WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+            ELSE COALESCE(EXTRACT(EPOCH FROM NOW() - pg_last_xact_replay_timestamp()), 0)
+        END
+    """
+
+    def __init__(self, pools, max_lag=30, lag_check_interval=10):
+        self.pools = list(pools)
+        self.max_lag = max_lag
+        self.lag_check_interval = lag_check_interval
+        self._lag = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_urls(cls, urls, max_lag=30, lag_check_interval=10, minconn=1, maxconn=10,
+                  health_check_interval=30):
+        """Create a ReplicaSet with one pool per replica connection string."""
+        if isinstance(urls, str):
+            urls = [url.strip() for url in urls.split(',') if url.strip()]
+        pools = [create_pool(url, minconn=minconn, maxconn=maxconn,
+                             health_check_interval=health_check_interval) for url in urls]
+        return cls(pools, max_lag=max_lag, lag_check_interval=lag_check_interval)
+
+    def _within_lag(self, pool, conn):
+        with self._lock:
+            checked_at, lag = self._lag.get(id(pool), (0, None))
+        if time.monotonic() - checked_at >= self.lag_check_interval:
+            with conn.cursor() as cursor:
+                cursor.execute(self.LAG_SQL)
+                lag = float(cursor.fetchone()[0])
+            conn.rollback()
+            with self._lock:
+                self._lag[id(pool)] = (time.monotonic(), lag)
+            if lag > self.max_lag:
+                logger.warning(f"Replica lag {lag:.0f}s exceeds {self.max_lag}s, skipping replica")
+        return lag <= self.max_lag
+
+    def getconn(self):
+        """Borrow a connection from a sufficiently fresh replica.
+
+        Returns:
+            tuple: (pool, connection), or (None, None) when no replica is usable
+        """
+        for pool in random.sample(self.pools, len(self.pools)):
+            try:
+                # A busy replica is skipped rather than waited for; the primary takes over
+                conn = pool.getconn(timeout=0)
+            except psycopg2.Error as e:
+                logger.warning(f"Replica unavailable: {e}")
+                continue
+            try:
+                if self._within_lag(pool, conn):
+                    return pool, conn
+                pool.putconn(conn)
+            except psycopg2.Error as e:
+                logger.warning(f"Replica lag check failed: {e}")
+                pool.putconn(conn, close=True)
+        return None, None
+
+    def closeall(self):
+        for pool in self.pools:
+            pool.closeall()
@@ -1,6 +1,6 @@
 #%%
 import os
-from wait_time_data import create_database, WaitTimeLib
+from wait_time_data import create_database, open_wait_time_lib
 
 # Use connection string
 db_url = os.getenv('DATABASE_URL')
@@ -8,7 +8,7 @@ db_url = os.getenv('DATABASE_URL')
 create_database(db_url)
 #%%
 # Initialize with connection string
-wait_time_data = WaitTimeLib(db_url)
+wait_time_data = open_wait_time_lib(db_url)
 
 #%%
 wait_time_data.create_loket_names_table()
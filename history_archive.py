@@ -0,0 +1,246 @@
+import os
+from datetime import datetime, timedelta
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+    from pyarrow.fs import LocalFileSystem
+except ImportError:  # Optional: only the archive commands need it
+    pa = None
+
+from wait_time_backend import WaitTimeBackend
+
+TIMEZONE = 'Europe/Amsterdam'
+
+# Layout: <root>/month=YYYY-MM/stadsloket_id=N/part-0.parquet
+PARTITIONING = 'hive'
+FILE_NAME = 'part-0.parquet'
+
+
+def require_pyarrow():
+    if pa is None:
+        raise RuntimeError("The history archive needs pyarrow: pip install -r requirements_archive.txt")
+
+
+def archive_schema():
+    return pa.schema([
+        ('timestamp', pa.timestamp('us', tz=TIMEZONE)),
+        ('loket_name', pa.dictionary(pa.int8(), pa.string())),
+        ('waiting', pa.int32()),
+        ('waittime', pa.int16()),
+    ])
+
+
+def write_month(root, month, rows):
+    """Write one month of (stadsloket_id, loket_name, waiting, waittime, timestamp) rows, one file per office
+
+    Existing files for the same month and office are replaced, so exporting a
+    month again is idempotent.
+    """
+    by_office = {}
+    for sid, name, waiting, waittime, ts in rows:
+        columns = by_office.setdefault(sid, ([], [], [], []))
+        columns[0].append(ts)
+        columns[1].append(name)
+        columns[2].append(waiting)
+        columns[3].append(waittime)
+
+    schema = archive_schema()
+    for sid, (timestamps, names, waiting, waittime) in by_office.items():
+        table = pa.table([
+            pa.array(timestamps, schema.field('timestamp').type),
+            pa.array(names, pa.string()).dictionary_encode(),
+            pa.array(waiting, pa.int32()),
+            pa.array(waittime, pa.int16()),
+        ], schema=schema)
+        directory = os.path.join(root, f"month={month}", f"stadsloket_id={sid}")
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, FILE_NAME)
+        # Readers never see a half-written file
+        pq.write_table(table, path + '.tmp', compression='zstd')
+        os.replace(path + '.tmp', path)
+
+
+def export_history(wait_time, root, start=None, end=None, fetch_size=5000):
+    """Archive raw samples from a WaitTimeLib (or SQLiteWaitTimeLib) as Parquet
+
+    Streams iter_raw_data() oldest first and writes each month once it is
+    complete, so at most one month of samples is held in memory.
+
+    Args:
+        wait_time: Backend to read wait_times from
+        root (str): Archive directory
+        start (datetime, optional): Inclusive lower bound on the timestamp
+        end (datetime, optional): Exclusive upper bound on the timestamp
+        fetch_size (int): Rows fetched from the database per round trip
+
+    Returns:
+        list: Months (YYYY-MM) that were written
+    """
+    require_pyarrow()
+    months = []
+    rows = []
+    current_month = None
+    for row in wait_time.iter_raw_data(start=start, end=end, fetch_size=fetch_size):
+        month = row[4].astimezone(wait_time.timezone).strftime('%Y-%m')
+        if month != current_month:
+            if rows:
+                write_month(root, current_month, rows)
+                months.append(current_month)
+            rows = []
+            current_month = month
+        rows.append(row)
+    if rows:
+        write_month(root, current_month, rows)
+        months.append(current_month)
+    return months
+
+
+class HistoryArchive(WaitTimeBackend):
+    """Read-only analytics over a Parquet archive written by export_history()
+
+    Files are memory-mapped and scanned with vectorized Arrow kernels; filters
+    on office and time prune whole partition directories and row groups.
+    Implements the statistics methods of WaitTimeLib with the same return
+    values, computed from the archived raw samples only.
+    """
+
+    def __init__(self, root):
+        require_pyarrow()
+        self.root = root
+        self.dataset = ds.dataset(
+            root,
+            format='parquet',
+            partitioning=PARTITIONING,
+            filesystem=LocalFileSystem(use_mmap=True),
+        )
+
+    def months(self):
+        """Archived months (YYYY-MM), oldest first"""
+        found = set()
+        for fragment in self.dataset.get_fragments():
+            found.add(ds.get_partition_keys(fragment.partition_expression)['month'])
+        return sorted(found)
+
+    def _table(self, columns, filter=None):
+        return self.dataset.to_table(columns=columns, filter=filter)
+
+    def _with_local_parts(self, table):
+        """Add Amsterdam day_of_week (0=Sunday), hour and day columns"""
+        ts = table['timestamp']
+        return (table
+                .append_column('day_of_week', pc.day_of_week(ts, count_from_zero=True, week_start=7))
+                .append_column('hour', pc.hour(ts))
+                .append_column('day', pc.cast(pc.local_timestamp(ts), pa.date32())))
+
+    def get_mean_wait_times(self):
+        table = self._table(['stadsloket_id', 'loket_name', 'waiting'],
+                            filter=ds.field('waiting').is_valid() & ds.field('waittime').is_valid())
+        table = table.set_column(1, 'loket_name', pc.cast(table['loket_name'], pa.string()))
+        result = table.group_by(['stadsloket_id', 'loket_name']).aggregate([('waiting', 'mean')])
+        return [(row['stadsloket_id'], row['loket_name'] or 'Unknown', int(row['waiting_mean'] or 0))
+                for row in result.to_pylist()]
+
+    def get_wait_statistics(self):
+        """Get mean and standard deviation of people waiting and wait time per stadsloket
+
+        Returns:
+            list: Same structure as WaitTimeLib.get_wait_statistics()
+        """
+        table = self._table(['stadsloket_id', 'loket_name', 'timestamp', 'waiting', 'waittime'],
+                            filter=ds.field('waiting').is_valid() & ds.field('waittime').is_valid())
+        waiting = pc.cast(table['waiting'], pa.int64())
+        waittime = pc.cast(table['waittime'], pa.int64())
+        table = pa.table({
+            'stadsloket_id': table['stadsloket_id'],
+            'loket_name': pc.cast(table['loket_name'], pa.string()),
+            'day': pc.cast(pc.local_timestamp(table['timestamp']), pa.date32()),
+            'waiting': waiting,
+            'waiting_sq': pc.multiply(waiting, waiting),
+            'waittime': waittime,
+            'waittime_sq': pc.multiply(waittime, waittime),
+        })
+
+        today = datetime.now(self.timezone).date()
+        windows = [('all_time', None), ('last_30_days', 30), ('last_7_days', 7)]
+        rows = []
+        for window, days in windows:
+            subset = table
+            if days is not None:
+                subset = table.filter(pc.greater(table['day'], pa.scalar(today - timedelta(days=days), pa.date32())))
+            grouped = subset.group_by(['stadsloket_id', 'loket_name']).aggregate([
+                ('waiting', 'count'), ('waiting', 'sum'), ('waiting_sq', 'sum'),
+                ('waittime', 'sum'), ('waittime_sq', 'sum'),
+            ])
+            for row in grouped.to_pylist():
+                rows.append((row['stadsloket_id'], row['loket_name'], window, row['waiting_count'],
+                             row['waiting_sum'], row['waiting_sq_sum'],
+                             row['waittime_sum'], row['waittime_sq_sum']))
+        return self.format_wait_statistics(rows)
+
+    def get_hourly_averages(self, day_of_week=None):
+        """Get average wait times in minutes by hour of day for each stadsloket
+
+        Args:
+            day_of_week (int, optional): Day of week (0=Sunday, 6=Saturday)
+                                        If None, returns data for all days
+        """
+        table = self._table(['stadsloket_id', 'loket_name', 'timestamp', 'waittime'],
+                            filter=ds.field('waittime').is_valid())
+        table = self._with_local_parts(table)
+        mask = pc.and_(pc.greater_equal(table['hour'], 8), pc.less_equal(table['hour'], 20))
+        if day_of_week is not None:
+            mask = pc.and_(mask, pc.equal(table['day_of_week'], day_of_week))
+        table = table.filter(mask)
+        table = table.set_column(1, 'loket_name', pc.cast(table['loket_name'], pa.string()))
+        result = (table.group_by(['stadsloket_id', 'loket_name', 'hour'])
+                  .aggregate([('waittime', 'mean')])
+                  .sort_by([('stadsloket_id', 'ascending'), ('hour', 'ascending')]))
+        rows = [(row['stadsloket_id'], row['loket_name'], row['hour'], row['waittime_mean'])
+                for row in result.to_pylist()]
+        return self.format_hourly_averages(rows, day_of_week)
+
+    def get_weekly_hourly_averages(self):
+        """Hourly averages for every day of the week from one grouped scan"""
+        table = self._table(['stadsloket_id', 'loket_name', 'timestamp', 'waittime'],
+                            filter=ds.field('waittime').is_valid())
+        table = self._with_local_parts(table)
+        table = table.filter(pc.and_(pc.greater_equal(table['hour'], 8), pc.less_equal(table['hour'], 20)))
+        table = table.set_column(1, 'loket_name', pc.cast(table['loket_name'], pa.string()))
+        result = (table.group_by(['day_of_week', 'stadsloket_id', 'loket_name', 'hour'])
+                  .aggregate([('waittime', 'mean')])
+                  .sort_by([('stadsloket_id', 'ascending'), ('hour', 'ascending')]))
+        rows = [(row['day_of_week'], row['stadsloket_id'], row['loket_name'], row['hour'], row['waittime_mean'])
+                for row in result.to_pylist()]
+        return self.format_weekly_hourly_averages(rows)
+
+    def iter_raw_data(self, stadsloket_id=None, start=None, end=None, fetch_size=2000):
+        """Stream archived samples oldest first, one month in memory at a time
+
+        Yields:
+            tuple: (stadsloket_id, loket_name, waiting, waittime, timestamp)
+        """
+        condition = None
+        for expression in (
+            ds.field('stadsloket_id') == stadsloket_id if stadsloket_id is not None else None,
+            ds.field('timestamp') >= pa.scalar(start, pa.timestamp('us', tz=TIMEZONE)) if start else None,
+            ds.field('timestamp') < pa.scalar(end, pa.timestamp('us', tz=TIMEZONE)) if end else None,
+        ):
+            if expression is not None:
+                condition = expression if condition is None else condition & expression
+
+        for month in self.months():
+            month_filter = ds.field('month') == month
+            table = self._table(['stadsloket_id', 'loket_name', 'waiting', 'waittime', 'timestamp'],
+                                filter=month_filter if condition is None else month_filter & condition)
+            table = table.sort_by([('timestamp', 'ascending'), ('stadsloket_id', 'ascending')])
+            for batch in table.to_batches(max_chunksize=fetch_size):
+                for row in batch.to_pylist():
+                    yield (row['stadsloket_id'], row['loket_name'] or 'Unknown', row['waiting'],
+                           row['waittime'], row['timestamp'].astimezone(self.timezone))
+
+    def close(self):
+        # Memory maps are released with the dataset
+        self.dataset = None
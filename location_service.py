@@ -1,12 +1,21 @@
 import requests
 import logging
-from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor, wait
+from functools import lru_cache, wraps
+from requests.adapters import HTTPAdapter
 import os
 from dotenv import load_dotenv
-import time
 import json
+from datetime import datetime, timedelta, timezone
 import re
 import polyline
+from math import radians, cos, sin, asin, sqrt
+
+import metrics
+from postcode_index import open_postcode_index
+from travel_time_grid import open_travel_time_grid
+from single_flight import coalesced
+from ttl_cache import ttl_cache
 
 # Load environment variables
 load_dotenv()
@@ -16,7 +25,50 @@ logger = logging.getLogger(__name__)
 
 # OpenRouteService API key (get one from https://openrouteservice.org/dev/#/signup)
 ORS_API_KEY = os.getenv('ORS_API_KEY')
-ORS_BASE_URL = "https://api.openrouteservice.org/v2/directions/cycling-regular"
+ORS_BASE_URL = os.getenv('ORS_BASE_URL', "https://api.openrouteservice.org/v2/directions/cycling-regular")
+ORS_MATRIX_URL = os.getenv('ORS_MATRIX_URL', "https://api.openrouteservice.org/v2/matrix/cycling-regular")
+NOMINATIM_URL = os.getenv('NOMINATIM_URL', "https://nominatim.openstreetmap.org/search")
+
+# Seconds calculate_travel_times() waits for routes; slower offices are returned without one
+TRAVEL_TIME_DEADLINE = float(os.getenv('TRAVEL_TIME_DEADLINE', 6))
+# 'matrix': one ORS matrix request per user for all offices, route geometry fetched on demand;
+# 'directions': one ORS directions request per office, geometry included
+TRAVEL_TIME_MODE = os.getenv('TRAVEL_TIME_MODE', 'matrix')
+# Precomputed travel times built by `python travel_time_grid.py`, used instead of live routing
+TRAVEL_TIME_GRID_PATH = os.getenv('TRAVEL_TIME_GRID_PATH',
+                                  os.path.join(os.path.dirname(os.path.abspath(__file__)), 'traveltimes.grid'))
+# Routes are cached per worker for this many seconds; cycling routes do not depend on traffic
+ROUTE_CACHE_TTL = int(os.getenv('ROUTE_CACHE_TTL', 3600))
+ROUTE_CACHE_MAX_ENTRIES = int(os.getenv('ROUTE_CACHE_MAX_ENTRIES', 4096))
+# Upper bound on the memory of each route cache, mostly route geometries
+ROUTE_CACHE_MAX_BYTES = int(os.getenv('ROUTE_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+# Starting points are rounded to this many decimals (3: ~100 m) before routing and caching
+ROUTE_CACHE_COORD_DECIMALS = int(os.getenv('ROUTE_CACHE_COORD_DECIMALS', 3))
+# Route lookups running at once per worker, shared by all requests
+ROUTE_LOOKUP_WORKERS = int(os.getenv('ROUTE_LOOKUP_WORKERS', 14))
+
+# Geocodes each worker keeps in memory, in front of the shared postcode_coordinates table
+GEOCODE_MEMORY_ENTRIES = int(os.getenv('GEOCODE_MEMORY_ENTRIES', 4096))
+# Seconds a worker reuses a geocode before reading the shared table again
+GEOCODE_MEMORY_TTL = int(os.getenv('GEOCODE_MEMORY_TTL', 3600))
+# Days before a postcode Nominatim did not know is asked about again
+GEOCODE_NEGATIVE_TTL_DAYS = float(os.getenv('GEOCODE_NEGATIVE_TTL_DAYS', 7))
+
+# Offline postcode index built by `python postcode_index.py`, asked before any online lookup
+POSTCODE_INDEX_PATH = os.getenv('POSTCODE_INDEX_PATH',
+                                os.path.join(os.path.dirname(os.path.abspath(__file__)), 'postcodes.idx'))
+
+POSTCODE_PATTERN = re.compile(r'^[1-9][0-9]{3}[A-Z]{2}$')
+# PC4 areas of the municipality, for pre-warming the geocode store
+AMSTERDAM_PC4_RANGE = (1011, 1109)
+# Letters PostNL uses in postcodes, and the pairs it never assigns
+POSTCODE_LETTERS = 'ABCDEGHJKLMNPRSTVWXZ'
+UNUSED_POSTCODE_LETTERS = {'SA', 'SD', 'SS'}
+
+# One keep-alive session for the upstream APIs, with a connection per concurrent lookup
+http_session = requests.Session()
+http_session.mount('https://', HTTPAdapter(pool_maxsize=ROUTE_LOOKUP_WORKERS))
+route_executor = ThreadPoolExecutor(max_workers=ROUTE_LOOKUP_WORKERS, thread_name_prefix='route-lookup')
 
 # Amsterdam city office locations (id: [lat, lon, address])
 AMSTERDAM_OFFICES = {
@@ -36,24 +88,35 @@ AMSTERDAM_OFFICES = {
     11: [52.3162788, 4.9538333, "Anton de Komplein 150, 1102 CW Amsterdam"],
 }
 
-@lru_cache(maxsize=128)
-def get_coords_from_postcode(postcode):
-    """
-    Geocode a Dutch postcode to latitude and longitude using Nominatim API.
-    Includes smart text processing for different formats.
+class GeocodingError(Exception):
+    """Nominatim could not be asked; unlike an unknown postcode, this is never cached"""
+
+
+def normalize_postcode(postcode):
+    """'1011 pn' -> '1011PN'; None when it is not a Dutch PC6 postcode"""
+    processed_postcode = re.sub(r'\s+', '', postcode or '').upper()
+    return processed_postcode if POSTCODE_PATTERN.match(processed_postcode) else None
+
+def amsterdam_postcode_candidates():
+    """Every PC6 postcode that can exist in the Amsterdam PC4 areas, in order"""
+    for pc4 in range(AMSTERDAM_PC4_RANGE[0], AMSTERDAM_PC4_RANGE[1] + 1):
+        for first in POSTCODE_LETTERS:
+            for second in POSTCODE_LETTERS:
+                if first + second not in UNUSED_POSTCODE_LETTERS:
+                    yield f"{pc4}{first}{second}"
+
+def query_nominatim(postcode):
     """
-    # Normalize postcode: remove spaces and convert to uppercase
-    processed_postcode = re.sub(r'\s+', '', postcode).upper()
-    
-    # Basic validation for Dutch postcode format (e.g., 1234AB)
-    if not re.match(r'^[1-9][0-9]{3}[A-Z]{2}$', processed_postcode):
-        logger.error(f"Invalid postcode format: {postcode}")
-        return None
+    Geocode a normalized postcode with the Nominatim API.
+
+    Returns:
+        dict: {'lat', 'lon'}, or None when Nominatim does not know the postcode
 
-    # Use Nominatim for geocoding
-    url = "https://nominatim.openstreetmap.org/search"
+    Raises:
+        GeocodingError: Nominatim could not be reached or answered with an error
+    """
     params = {
-        'postalcode': processed_postcode,
+        'postalcode': postcode,
         'country': 'NL',
         'format': 'json',
         'limit': 1
@@ -64,34 +127,156 @@ def get_coords_from_postcode(postcode):
     }
     
     try:
-        response = requests.get(url, params=params, headers=headers, timeout=5)
+        with metrics.EXTERNAL_REQUEST_DURATION.time(service='nominatim'):
+            response = http_session.get(NOMINATIM_URL, params=params, headers=headers, timeout=5)
+        if not response.ok:
+            metrics.record_error('nominatim', response.status_code)
         response.raise_for_status()  # Raise an exception for bad status codes
         data = response.json()
-        
-        if data:
-            lat = float(data[0]['lat'])
-            lon = float(data[0]['lon'])
-            return {'lat': lat, 'lon': lon}
-        else:
-            logger.warning(f"Could not geocode postcode: {postcode}")
-            return None
-            
     except requests.exceptions.RequestException as e:
+        if not isinstance(e, requests.exceptions.HTTPError):
+            metrics.record_error('nominatim', e)
+        raise GeocodingError(str(e)) from e
+
+    if data:
+        return {'lat': float(data[0]['lat']), 'lon': float(data[0]['lon'])}
+    logger.warning(f"Could not geocode postcode: {postcode}")
+    return None
+
+@coalesced
+# Unknown postcodes and failed lookups are not kept, so they are re-checked
+# against the table (and GEOCODE_NEGATIVE_TTL_DAYS) on every request
+@ttl_cache(GEOCODE_MEMORY_TTL, GEOCODE_MEMORY_ENTRIES, should_cache=lambda coords: coords is not None)
+def lookup_postcode(postcode, geocode_store=None):
+    """
+    Geocode a normalized postcode, preferring the shared postcode_coordinates table.
+
+    Postcodes missing from the table, or recorded as unknown longer than
+    GEOCODE_NEGATIVE_TTL_DAYS ago, are asked from Nominatim and the answer is
+    stored for every worker. Without a geocode_store only Nominatim is asked.
+    """
+    if geocode_store is not None:
+        try:
+            with geocode_store() as store:
+                stored = store.get_postcode_coordinates(postcode)
+        except Exception as e:
+            logger.warning(f"Geocode store unavailable, asking Nominatim for {postcode}: {e}")
+            stored = None
+            geocode_store = None
+
+        if stored is not None:
+            lat, lon, looked_up_at = stored
+            if lat is not None:
+                metrics.GEOCODE_STORE_LOOKUPS.inc(result='hit')
+                return {'lat': lat, 'lon': lon}
+            if datetime.now(timezone.utc) - looked_up_at < timedelta(days=GEOCODE_NEGATIVE_TTL_DAYS):
+                metrics.GEOCODE_STORE_LOOKUPS.inc(result='negative_hit')
+                return None
+        metrics.GEOCODE_STORE_LOOKUPS.inc(result='miss')
+
+    coords = query_nominatim(postcode)
+
+    if geocode_store is not None:
+        try:
+            with geocode_store() as store:
+                store.store_postcode_coordinates([
+                    (postcode, coords['lat'], coords['lon']) if coords else (postcode, None, None)
+                ])
+        except Exception as e:
+            logger.warning(f"Could not store the geocode of {postcode}: {e}")
+    return coords
+
+@lru_cache(maxsize=None)
+def get_postcode_index():
+    """The worker's memory-mapped postcode index, or None when none was built"""
+    return open_postcode_index(POSTCODE_INDEX_PATH)
+
+def get_coords_from_postcode(postcode, geocode_store=None):
+    """
+    Geocode a Dutch postcode to latitude and longitude.
+    Includes smart text processing for different formats.
+
+    The offline postcode index answers without any network call; postcodes
+    it does not have fall back to lookup_postcode() (stored geocodes, then
+    Nominatim).
+
+    Args:
+        postcode: Postcode as typed, e.g. '1011 pn'
+        geocode_store: Optional callable returning a context manager that yields
+            a storage backend (like the app's get_db), whose postcode_coordinates
+            table caches lookups for all workers and restarts
+    """
+    processed_postcode = normalize_postcode(postcode)
+    if processed_postcode is None:
+        logger.error(f"Invalid postcode format: {postcode}")
+        return None
+
+    index = get_postcode_index()
+    if index is not None:
+        coords = index.lookup(processed_postcode)
+        metrics.POSTCODE_INDEX_LOOKUPS.inc(result='hit' if coords else 'miss')
+        if coords:
+            return coords
+
+    try:
+        return lookup_postcode(processed_postcode, geocode_store)
+    except GeocodingError as e:
         logger.error(f"Error geocoding postcode {postcode}: {e}")
         return None
 
-@lru_cache(maxsize=32)
-def get_cycling_time(from_lat, from_lon, to_lat, to_lon, valid_for=300):
+def haversine(lon1, lat1, lon2, lat2):
+    """Calculate the great circle distance between two points in kilometers"""
+    # Convert decimal degrees to radians
+    lon1, lat1, lon2, lat2 = map(radians, [lon1, lat1, lon2, lat2])
+    # Haversine formula
+    dlon = lon2 - lon1
+    dlat = lat2 - lat1
+    a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
+    c = 2 * asin(sqrt(a))
+    r = 6371  # Radius of earth in kilometers
+    return c * r
+
+def estimate_cycling_time(from_lat, from_lon, to_lat, to_lon):
+    """Fallback without ORS: straight-line distance at an average 15 km/h"""
+    distance = haversine(from_lon, from_lat, to_lon, to_lat)
+    duration_minutes = (distance / 15) * 60
+    
+    return {
+        'duration_minutes': round(duration_minutes),
+        'distance_km': round(distance, 1)
+    }
+
+def quantized_origin(func):
+    """Decorator rounding the (from_lat, from_lon) arguments to ROUTE_CACHE_COORD_DECIMALS
+
+    Callers a few metres apart then share cached and in-flight lookups; the
+    route is computed from the rounded point.
+    """
+    @wraps(func)
+    def wrapper(from_lat, from_lon, *args, **kwargs):
+        return func(round(from_lat, ROUTE_CACHE_COORD_DECIMALS), round(from_lon, ROUTE_CACHE_COORD_DECIMALS),
+                    *args, **kwargs)
+
+    for name in ('cache_info', 'cache_clear'):
+        if hasattr(func, name):
+            setattr(wrapper, name, getattr(func, name))
+    return wrapper
+
+@quantized_origin
+@coalesced
+@ttl_cache(ROUTE_CACHE_TTL, ROUTE_CACHE_MAX_ENTRIES, ROUTE_CACHE_MAX_BYTES,
+           should_cache=lambda travel_info: 'error' not in travel_info)
+def get_cycling_time(from_lat, from_lon, to_lat, to_lon):
     """
     Calculate cycling time between two points using OpenRouteService API.
-    Results are cached for 5 minutes (300 seconds).
+    Results are cached for ROUTE_CACHE_TTL seconds per rounded starting
+    point (see quantized_origin); failed lookups are not cached.
     
     Args:
         from_lat: Starting point latitude
         from_lon: Starting point longitude
         to_lat: Destination latitude
         to_lon: Destination longitude
-        valid_for: Cache validity time in seconds
     
     Returns:
         dict: {
@@ -99,35 +284,9 @@ def get_cycling_time(from_lat, from_lon, to_lat, to_lon, valid_for=300):
             'distance_km': distance in kilometers
         }
     """
-    # Add timestamp to cache key for time-based invalidation
-    cache_timestamp = int(time.time() / valid_for)
-    get_cycling_time.cache_info()  # Update timestamp
-    
     if not ORS_API_KEY:
         logger.warning("ORS_API_KEY not set. Using distance approximation.")
-        # Fallback: Simple approximation based on distance (15 km/h average speed)
-        from math import radians, cos, sin, asin, sqrt
-        
-        def haversine(lon1, lat1, lon2, lat2):
-            """Calculate the great circle distance between two points in kilometers"""
-            # Convert decimal degrees to radians
-            lon1, lat1, lon2, lat2 = map(radians, [lon1, lat1, lon2, lat2])
-            # Haversine formula
-            dlon = lon2 - lon1
-            dlat = lat2 - lat1
-            a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
-            c = 2 * asin(sqrt(a))
-            r = 6371  # Radius of earth in kilometers
-            return c * r
-            
-        distance = haversine(from_lon, from_lat, to_lon, to_lat)
-        # Assume average cycling speed of 15 km/h
-        duration_minutes = (distance / 15) * 60
-        
-        return {
-            'duration_minutes': round(duration_minutes),
-            'distance_km': round(distance, 1)
-        }
+        return estimate_cycling_time(from_lat, from_lon, to_lat, to_lon)
     
     try:
         # OpenRouteService API request
@@ -142,12 +301,13 @@ def get_cycling_time(from_lat, from_lon, to_lat, to_lon, valid_for=300):
             'geometry': True
         }
         
-        response = requests.post(
-            ORS_BASE_URL,
-            headers=headers,
-            data=json.dumps(body),
-            timeout=5
-        )
+        with metrics.EXTERNAL_REQUEST_DURATION.time(service='ors'):
+            response = http_session.post(
+                ORS_BASE_URL,
+                headers=headers,
+                data=json.dumps(body),
+                timeout=5
+            )
         
         if response.status_code == 200:
             data = response.json()
@@ -168,6 +328,7 @@ def get_cycling_time(from_lat, from_lon, to_lat, to_lon, valid_for=300):
                 'geometry': geometry
             }
         else:
+            metrics.record_error('ors', response.status_code)
             logger.error(f"API error: {response.status_code} - {response.text}")
             return {
                 'duration_minutes': None,
@@ -176,6 +337,7 @@ def get_cycling_time(from_lat, from_lon, to_lat, to_lon, valid_for=300):
             }
             
     except Exception as e:
+        metrics.record_error('ors', e)
         logger.error(f"Error calculating cycling time: {e}")
         return {
             'duration_minutes': None,
@@ -183,6 +345,127 @@ def get_cycling_time(from_lat, from_lon, to_lat, to_lon, valid_for=300):
             'error': str(e)
         }
 
+class RoutingError(Exception):
+    """OpenRouteService could not be reached or answered with an error"""
+
+
+def request_cycling_matrix(origins):
+    """
+    Cycling durations and distances from each (lat, lon) origin to every
+    office, in one OpenRouteService matrix request.
+
+    Returns:
+        list: Per origin, a dict office_id -> (duration_seconds, distance_meters),
+        with None values for offices ORS found no route to
+
+    Raises:
+        RoutingError: The request failed
+    """
+    office_ids = list(AMSTERDAM_OFFICES)
+    headers = {
+        'Authorization': ORS_API_KEY,
+        'Content-Type': 'application/json'
+    }
+    locations = [[lon, lat] for lat, lon in origins]
+    locations += [[AMSTERDAM_OFFICES[office_id][1], AMSTERDAM_OFFICES[office_id][0]] for office_id in office_ids]
+    body = {
+        'locations': locations,
+        'sources': list(range(len(origins))),
+        'destinations': list(range(len(origins), len(locations))),
+        'metrics': ['duration', 'distance'],
+        'units': 'm'
+    }
+
+    try:
+        with metrics.EXTERNAL_REQUEST_DURATION.time(service='ors_matrix'):
+            response = http_session.post(
+                ORS_MATRIX_URL,
+                headers=headers,
+                data=json.dumps(body),
+                timeout=5 + len(origins) // 10
+            )
+    except requests.exceptions.RequestException as e:
+        metrics.record_error('ors_matrix', e)
+        raise RoutingError(str(e)) from e
+
+    if response.status_code != 200:
+        metrics.record_error('ors_matrix', response.status_code)
+        logger.error(f"Matrix API error: {response.status_code} - {response.text}")
+        raise RoutingError(f"API error: {response.status_code}")
+
+    data = response.json()
+    return [dict(zip(office_ids, zip(durations, distances)))
+            for durations, distances in zip(data['durations'], data['distances'])]
+
+def format_route(duration_seconds, distance_meters):
+    """Travel info of a route in ORS units, as returned by get_cycling_time()"""
+    if duration_seconds is None or distance_meters is None:
+        return {'duration_minutes': None, 'distance_km': None, 'error': 'No route found'}
+    return {
+        'duration_minutes': round(duration_seconds / 60),
+        'distance_km': round(distance_meters / 1000, 1)
+    }
+
+@quantized_origin
+@coalesced
+@ttl_cache(ROUTE_CACHE_TTL, ROUTE_CACHE_MAX_ENTRIES, ROUTE_CACHE_MAX_BYTES,
+           should_cache=lambda routes: not any('error' in travel_info for travel_info in routes.values()))
+def get_cycling_matrix(from_lat, from_lon):
+    """
+    Cycling time and distance from one point to every office in a single
+    OpenRouteService matrix request.
+
+    Returns:
+        dict: office_id -> {'duration_minutes', 'distance_km'} like
+        get_cycling_time(), without geometry (see get_route_geometry());
+        offices ORS found no route to, or all offices when the request
+        failed, get None values and an 'error'; such answers are not cached
+    """
+    if not ORS_API_KEY:
+        logger.warning("ORS_API_KEY not set. Using distance approximation.")
+        return {office_id: estimate_cycling_time(from_lat, from_lon, office_lat, office_lon)
+                for office_id, (office_lat, office_lon, _) in AMSTERDAM_OFFICES.items()}
+
+    try:
+        routes = request_cycling_matrix([(from_lat, from_lon)])[0]
+    except Exception as e:
+        logger.error(f"Error calculating cycling times: {e}")
+        return {office_id: {'duration_minutes': None, 'distance_km': None, 'error': str(e)}
+                for office_id in AMSTERDAM_OFFICES}
+    return {office_id: format_route(*route) for office_id, route in routes.items()}
+
+@lru_cache(maxsize=None)
+def get_travel_time_grid():
+    """The worker's memory-mapped travel time grid, or None when none was built"""
+    return open_travel_time_grid(TRAVEL_TIME_GRID_PATH, AMSTERDAM_OFFICES)
+
+def get_route_geometry(from_lat, from_lon, office_id):
+    """Cycling route to one office as [lat, lon] points, for drawing on the map
+
+    Returns:
+        list: The route, empty without ORS_API_KEY, or None when the lookup
+        failed or office_id is unknown
+    """
+    office = AMSTERDAM_OFFICES.get(office_id)
+    if office is None:
+        return None
+    travel_info = get_cycling_time(from_lat, from_lon, office[0], office[1])
+    if travel_info.get('error'):
+        return None
+    return travel_info.get('geometry', [])
+
+def collect_cache_metrics():
+    """Report the hit and miss totals and sizes of the upstream lookup caches"""
+    for function in (lookup_postcode, get_cycling_time, get_cycling_matrix):
+        info = function.cache_info()
+        metrics.FUNCTION_CACHE_LOOKUPS.set_total(info.hits, function=function.__name__, result='hit')
+        metrics.FUNCTION_CACHE_LOOKUPS.set_total(info.misses, function=function.__name__, result='miss')
+        metrics.FUNCTION_CACHE_ENTRIES.set(info.currsize, function=function.__name__)
+        if hasattr(info, 'bytes'):
+            metrics.FUNCTION_CACHE_BYTES.set(info.bytes, function=function.__name__)
+
+metrics.REGISTRY.add_collector(collect_cache_metrics)
+
 def get_office_location(stadsloket_id):
     """Get the location of a city office by ID"""
     office_id = int(stadsloket_id)
@@ -200,13 +483,54 @@ def get_all_office_locations():
     return {id: {'lat': data[0], 'lon': data[1], 'address': data[2]} 
             for id, data in AMSTERDAM_OFFICES.items()}
 
-def calculate_travel_times(user_lat, user_lon):
-    """Calculate travel times to all city offices from user's location"""
+def calculate_travel_times(user_lat, user_lon, deadline=TRAVEL_TIME_DEADLINE, mode=TRAVEL_TIME_MODE,
+                           use_grid=True):
+    """Calculate travel times to all city offices from user's location
+
+    With use_grid and a travel time grid in place, locations inside it are
+    answered from their grid cell without any routing call. Otherwise, in
+    'matrix' mode one ORS matrix request covers every office and no route
+    geometry is returned; in 'directions' mode the routes, with geometry, are
+    looked up concurrently. Offices whose travel time is not in after deadline
+    seconds get travel info without a duration and error 'timeout'; their
+    lookups finish in the background and are cached for the next call.
+    """
+    grid_travel = None
+    grid = get_travel_time_grid() if use_grid else None
+    if grid is not None:
+        grid_travel = grid.lookup(user_lat, user_lon)
+        metrics.TRAVEL_TIME_GRID_LOOKUPS.inc(result='hit' if grid_travel else 'miss')
+
+    if grid_travel is not None:
+        futures = {}
+    elif mode == 'matrix':
+        matrix = route_executor.submit(get_cycling_matrix, user_lat, user_lon)
+        futures = {office_id: matrix for office_id in AMSTERDAM_OFFICES}
+    else:
+        futures = {
+            office_id: route_executor.submit(get_cycling_time, user_lat, user_lon, office_lat, office_lon)
+            for office_id, (office_lat, office_lon, _) in AMSTERDAM_OFFICES.items()
+        }
+    if futures:
+        wait(set(futures.values()), timeout=deadline)
+
     result = {}
-    
     for office_id, location in AMSTERDAM_OFFICES.items():
         office_lat, office_lon, address = location
-        travel_info = get_cycling_time(user_lat, user_lon, office_lat, office_lon)
+        future = futures.get(office_id)
+        if grid_travel is not None:
+            travel_info = grid_travel[office_id]
+        elif future.done():
+            travel_info = future.result()
+            if mode == 'matrix':
+                travel_info = travel_info[office_id]
+        else:
+            logger.warning(f"No route to office {office_id} within {deadline}s")
+            travel_info = {
+                'duration_minutes': None,
+                'distance_km': None,
+                'error': 'timeout'
+            }
         
         result[office_id] = {
             'location': {
@@ -0,0 +1,227 @@
+import argparse
+import logging
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import pytz
+from dotenv import load_dotenv
+
+from history_archive import export_history
+from location_service import (GEOCODE_NEGATIVE_TTL_DAYS, GeocodingError, amsterdam_postcode_candidates,
+                              normalize_postcode, query_nominatim)
+from wait_time_data import create_database, open_wait_time_lib
+
+# ---------------------------------------------------------------------------
+# Logging configuration with explicit Amsterdam timezone
+# ---------------------------------------------------------------------------
+amsterdam_tz = pytz.timezone("Europe/Amsterdam")
+logging.Formatter.converter = lambda *args: datetime.now(amsterdam_tz).timetuple()
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s [%(levelname)s] %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S %Z",
+    handlers=[logging.StreamHandler()],
+)
+logger = logging.getLogger("maintenance")
+
+load_dotenv()
+DB_URL = os.getenv("DATABASE_URL")
+
+# Raw 15-minute samples older than this many whole months are downsampled to hourly rows
+RAW_RETENTION_MONTHS = int(os.getenv("RAW_RETENTION_MONTHS", 12))
+
+# Nominatim's usage policy allows at most one request per second
+GEOCODE_PREWARM_RATE = 1.0
+# Geocodes written to postcode_coordinates per commit while pre-warming
+GEOCODE_PREWARM_BATCH = 100
+
+
+@contextmanager
+def wait_time_session():
+    """Provide a WaitTimeLib instance with automatic cleanup."""
+    wait_time = None
+    try:
+        wait_time = open_wait_time_lib(DB_URL, create_tables=False)
+        yield wait_time
+    finally:
+        if wait_time:
+            wait_time.close()
+
+
+# ---------------------------------------------------------------------------
+# Commands
+# ---------------------------------------------------------------------------
+
+def migrate(args):
+    """Create missing tables and columns and seed empty rollups, e.g. when deploying a new version."""
+    with wait_time_session() as wait_time:
+        wait_time.upgrade_schema()
+    logger.info("Database schema is up to date")
+
+
+def rebuild_hourly_stats(args):
+    """Recompute the hourly profile rollup, e.g. after a backfill."""
+    with wait_time_session() as wait_time:
+        rows = wait_time.rebuild_hourly_stats()
+    logger.info(f"Rebuilt hourly_wait_stats ({rows} rows)")
+
+
+def rebuild_current_snapshot(args):
+    """Recompute the latest-snapshot table from the wait_times history."""
+    with wait_time_session() as wait_time:
+        rows = wait_time.rebuild_current_wait_times()
+    logger.info(f"Rebuilt current_wait_times ({rows} offices)")
+
+
+def rebuild_statistics(args):
+    """Recompute the running mean/variance statistics, e.g. after a backfill."""
+    with wait_time_session() as wait_time:
+        rows = wait_time.rebuild_wait_statistics()
+    logger.info(f"Rebuilt wait_stats_totals and wait_stats_daily ({rows} daily buckets)")
+
+
+def ensure_partitions(args):
+    """Create upcoming monthly wait_times partitions."""
+    with wait_time_session() as wait_time:
+        since = amsterdam_tz.localize(datetime.strptime(args.since, "%Y-%m")) if args.since else None
+        created = wait_time.ensure_partitions(months_ahead=args.months_ahead, since=since)
+    logger.info(f"Created partitions: {', '.join(created) or 'none needed'}")
+
+
+def compact_history(args):
+    """Downsample and drop raw partitions that fell out of the retention window."""
+    with wait_time_session() as wait_time:
+        compacted = wait_time.compact_history(args.older_than_months)
+    logger.info(f"Compacted partitions: {', '.join(compacted) or 'none due'}")
+
+
+def archive_history(args):
+    """Write raw samples to a Parquet archive partitioned by month and office."""
+    start = amsterdam_tz.localize(datetime.strptime(args.since, "%Y-%m")) if args.since else None
+    end = amsterdam_tz.localize(datetime.strptime(args.until, "%Y-%m")) if args.until else None
+    with wait_time_session() as wait_time:
+        months = export_history(wait_time, args.output, start=start, end=end)
+    logger.info(f"Archived months to {args.output}: {', '.join(months) or 'none'}")
+
+
+def prewarm_geocodes(args):
+    """Geocode Amsterdam postcodes into postcode_coordinates ahead of the first user asking."""
+    if args.postcodes:
+        # One postcode per line; extra CSV columns and header lines are ignored
+        with open(args.postcodes) as f:
+            candidates = sorted({postcode for postcode in
+                                 (normalize_postcode(line.split(",")[0]) for line in f) if postcode})
+    else:
+        candidates = list(amsterdam_postcode_candidates())
+
+    negative_since = datetime.now(pytz.utc) - timedelta(days=GEOCODE_NEGATIVE_TTL_DAYS)
+    with wait_time_session() as wait_time:
+        known = wait_time.get_geocoded_postcodes(negative_since)
+        pending = [postcode for postcode in candidates if postcode not in known]
+        if args.limit:
+            pending = pending[:args.limit]
+        logger.info(f"Geocoding {len(pending)} of {len(candidates)} postcodes "
+                    f"at {args.rate} per second ({len(pending) / args.rate / 3600:.1f} hours)")
+
+        found = unknown = failed = 0
+        batch = []
+        for position, postcode in enumerate(pending, 1):
+            started = time.monotonic()
+            try:
+                coords = query_nominatim(postcode)
+            except GeocodingError as e:
+                # Not recorded, so the next run tries again
+                logger.warning(f"Could not geocode {postcode}: {e}")
+                failed += 1
+            else:
+                if coords:
+                    batch.append((postcode, coords["lat"], coords["lon"]))
+                    found += 1
+                else:
+                    batch.append((postcode, None, None))
+                    unknown += 1
+
+            if batch and (len(batch) >= GEOCODE_PREWARM_BATCH or position == len(pending)):
+                wait_time.store_postcode_coordinates(batch)
+                batch = []
+                logger.info(f"{position}/{len(pending)} looked up: {found} found, "
+                            f"{unknown} unknown, {failed} failed")
+            time.sleep(max(0.0, 1 / args.rate - (time.monotonic() - started)))
+
+    logger.info(f"Stored {found} geocodes and {unknown} unknown postcodes, {failed} lookups failed")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="WachtWijzer database maintenance tasks")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    subparsers.add_parser(
+        "migrate",
+        help="Create missing tables and columns and seed empty rollup tables",
+    ).set_defaults(func=migrate)
+
+    subparsers.add_parser(
+        "rebuild-hourly-stats",
+        help="Recompute the hourly profile rollup from the full wait_times history",
+    ).set_defaults(func=rebuild_hourly_stats)
+
+    subparsers.add_parser(
+        "rebuild-current-snapshot",
+        help="Recompute the latest wait time per office from the wait_times history",
+    ).set_defaults(func=rebuild_current_snapshot)
+
+    subparsers.add_parser(
+        "rebuild-statistics",
+        help="Recompute the running per-office mean and variance statistics",
+    ).set_defaults(func=rebuild_statistics)
+
+    partitions_parser = subparsers.add_parser(
+        "ensure-partitions",
+        help="Create monthly wait_times partitions ahead of time",
+    )
+    partitions_parser.add_argument("--months-ahead", type=int, default=2)
+    partitions_parser.add_argument("--since", metavar="YYYY-MM",
+                                   help="Also create partitions back to this month, e.g. before a backfill")
+    partitions_parser.set_defaults(func=ensure_partitions)
+
+    compact_parser = subparsers.add_parser(
+        "compact-history",
+        help="Downsample raw samples outside the retention window to hourly aggregates and drop them",
+    )
+    compact_parser.add_argument("--older-than-months", type=int, default=RAW_RETENTION_MONTHS)
+    compact_parser.set_defaults(func=compact_history)
+
+    archive_parser = subparsers.add_parser(
+        "archive-history",
+        help="Export raw samples to Parquet files by month and office for off-database analytics",
+    )
+    archive_parser.add_argument("--output", required=True, help="Archive directory")
+    archive_parser.add_argument("--since", metavar="YYYY-MM", help="First month to export")
+    archive_parser.add_argument("--until", metavar="YYYY-MM", help="Export months before this one")
+    archive_parser.set_defaults(func=archive_history)
+
+    prewarm_parser = subparsers.add_parser(
+        "prewarm-geocodes",
+        help="Geocode Amsterdam postcodes that are not in postcode_coordinates yet",
+    )
+    prewarm_parser.add_argument("--postcodes", metavar="FILE",
+                                help="Postcode list (first CSV column); by default every possible "
+                                     "PC6 in the Amsterdam PC4 areas is tried")
+    prewarm_parser.add_argument("--rate", type=float, default=GEOCODE_PREWARM_RATE,
+                                help="Nominatim requests per second")
+    prewarm_parser.add_argument("--limit", type=int, help="Stop after this many lookups")
+    prewarm_parser.set_defaults(func=prewarm_geocodes)
+
+    args = parser.parse_args()
+
+    if not DB_URL:
+        raise RuntimeError("DATABASE_URL environment variable is not set")
+    create_database(DB_URL)
+
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,413 @@
+import atexit
+import bisect
+import glob
+import inspect
+import json
+import logging
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from wait_time_backend import WaitTimeBackend
+
+logger = logging.getLogger(__name__)
+
+# Latency buckets in seconds, from cached responses up to the 5 s upstream timeouts
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# Directory the worker processes share their samples through, so /metrics
+# reports every gunicorn worker rather than the one that served the scrape.
+# Same variable as prometheus_client's multiprocess mode; empty it before
+# starting the server
+MULTIPROC_DIR = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+# Seconds between writes of a worker's samples to MULTIPROC_DIR
+MULTIPROC_WRITE_INTERVAL = float(os.getenv('METRICS_WRITE_INTERVAL', 5))
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+               for value in labels.values())
+    return '{' + ','.join(f'{name}="{value}"' for name, value in zip(labels, escaped)) + '}'
+
+
+class Metric:
+    """A named family of samples, one per combination of label values"""
+
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels(self, key, **extra):
+        return {**dict(zip(self.labelnames, key)), **extra}
+
+    def values(self):
+        """Copy of the current value per label key"""
+        with self._lock:
+            return dict(self._values)
+
+    def merge(self, values, other):
+        """Add the values of another process into values"""
+        for key, value in other.items():
+            values[key] = values.get(key, 0) + value
+
+    def samples(self, values=None):
+        """Yield (name, labels, value) for the exposition format"""
+        if values is None:
+            values = self.values()
+        for key, value in sorted(values.items()):
+            yield self.name, self._labels(key), value
+
+    def expose(self, values=None):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for name, labels, value in self.samples(values):
+            lines.append(f"{name}{format_labels(labels)} {format_value(value)}")
+        return '\n'.join(lines)
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def set_total(self, value, **labels):
+        """Report a total that is counted elsewhere, e.g. functools.lru_cache statistics"""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._values[key] = (counts, total + value)
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of a with block, also when it raises"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def values(self):
+        with self._lock:
+            return {key: (list(counts), total) for key, (counts, total) in self._values.items()}
+
+    def merge(self, values, other):
+        for key, (counts, total) in other.items():
+            if key in values:
+                merged_counts, merged_total = values[key]
+                counts = [a + b for a, b in zip(merged_counts, counts)]
+                total += merged_total
+            values[key] = (list(counts), total)
+
+    def samples(self, values=None):
+        if values is None:
+            values = self.values()
+        for key, (counts, total) in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                yield f"{self.name}_bucket", self._labels(key, le=format_value(bound)), cumulative
+            yield f"{self.name}_sum", self._labels(key), total
+            yield f"{self.name}_count", self._labels(key), cumulative
+
+
+def process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class Registry:
+    """The metrics of one process, rendered in the Prometheus text format
+
+    Collectors are called right before rendering, to refresh values that are
+    read from elsewhere (pool usage, cache statistics) rather than counted.
+
+    With a multiprocess_dir every process also writes its samples to
+    <pid>.json there, and expose() renders the sum over all files: counters
+    and histograms of every process that ever ran, so totals survive worker
+    restarts, and gauges of the processes still alive.
+    """
+
+    def __init__(self, multiprocess_dir=None, write_interval=MULTIPROC_WRITE_INTERVAL):
+        self.multiprocess_dir = multiprocess_dir
+        self.write_interval = write_interval
+        self._metrics = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+        self._writer = None
+        self._writer_lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def add_collector(self, collector):
+        with self._lock:
+            self._collectors.append(collector)
+
+    def collect(self):
+        with self._lock:
+            collectors = list(self._collectors)
+            metrics = list(self._metrics.values())
+        for collector in collectors:
+            collector()
+        return metrics
+
+    def expose(self):
+        metrics = self.collect()
+        if not self.multiprocess_dir:
+            return '\n'.join(metric.expose() for metric in metrics) + '\n'
+        self.write(metrics)
+        merged = self.read_processes()
+        return '\n'.join(metric.expose(merged.get(metric.name, {})) for metric in metrics) + '\n'
+
+    def write(self, metrics=None):
+        """Replace this process's file with its current samples"""
+        if metrics is None:
+            metrics = self.collect()
+        samples = {metric.name: [[list(key), value] for key, value in metric.values().items()]
+                   for metric in metrics}
+        path = os.path.join(self.multiprocess_dir, f"{os.getpid()}.json")
+        with open(path + '.tmp', 'w') as f:
+            json.dump(samples, f)
+        os.replace(path + '.tmp', path)
+
+    def read_processes(self):
+        """Metric name -> values summed over the process files in multiprocess_dir"""
+        with self._lock:
+            metrics = dict(self._metrics)
+        merged = {}
+        for path in glob.glob(os.path.join(self.multiprocess_dir, '*.json')):
+            pid = int(os.path.basename(path)[:-len('.json')])
+            try:
+                with open(path) as f:
+                    samples = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Skipping unreadable metrics file {path}: {e}")
+                continue
+            alive = process_alive(pid)
+            for name, values in samples.items():
+                metric = metrics.get(name)
+                if metric is None or (metric.kind == 'gauge' and not alive):
+                    continue
+                other = {tuple(key): tuple(value) if metric.kind == 'histogram' else value
+                         for key, value in values}
+                metric.merge(merged.setdefault(name, {}), other)
+        return merged
+
+    def start_writer(self):
+        """Write this process's samples every write_interval seconds, and at exit
+
+        Does nothing without a multiprocess_dir. Safe to call again, e.g. in a
+        forked worker, where the parent's writer thread does not exist.
+        """
+        if not self.multiprocess_dir:
+            return
+        with self._writer_lock:
+            if self._writer is None or not self._writer.is_alive():
+                self._writer = threading.Thread(target=self._run_writer, name='metrics-writer', daemon=True)
+                self._writer.start()
+
+    def _run_writer(self):
+        while True:
+            time.sleep(self.write_interval)
+            try:
+                self.write()
+            except Exception as e:
+                logger.warning(f"Writing metrics to {self.multiprocess_dir} failed: {e}")
+
+
+REGISTRY = Registry(MULTIPROC_DIR)
+if MULTIPROC_DIR:
+    atexit.register(REGISTRY.write)
+
+
+def counter(name, documentation, labelnames=()):
+    return REGISTRY.register(Counter(name, documentation, labelnames))
+
+
+def gauge(name, documentation, labelnames=()):
+    return REGISTRY.register(Gauge(name, documentation, labelnames))
+
+
+def histogram(name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+    return REGISTRY.register(Histogram(name, documentation, labelnames, buckets))
+
+
+# ---------------------------------------------------------------------------
+# Metrics shared by the app, the storage backends and the location service
+# ---------------------------------------------------------------------------
+
+HTTP_REQUEST_DURATION = histogram(
+    'wachtwijzer_http_request_duration_seconds',
+    'Time until the response headers are ready, per route',
+    ['route', 'method'])
+HTTP_REQUESTS = counter(
+    'wachtwijzer_http_requests_total',
+    'Responses sent, per route and status code',
+    ['route', 'method', 'status'])
+
+DB_QUERY_DURATION = histogram(
+    'wachtwijzer_db_query_duration_seconds',
+    'Time spent in a storage backend method, including fetching its rows',
+    ['method'])
+DB_QUERY_ERRORS = counter(
+    'wachtwijzer_db_query_errors_total',
+    'Storage backend method calls that raised',
+    ['method'])
+
+DB_POOL_CONNECTIONS = gauge(
+    'wachtwijzer_db_pool_connections',
+    'Open pooled database connections by state (in_use or idle)',
+    ['pool', 'state'])
+DB_POOL_MAX_CONNECTIONS = gauge(
+    'wachtwijzer_db_pool_max_connections',
+    'Upper bound on the connections of a pool',
+    ['pool'])
+
+EXTERNAL_REQUEST_DURATION = histogram(
+    'wachtwijzer_external_request_duration_seconds',
+    'Latency of calls to external services (ors, nominatim)',
+    ['service'])
+EXTERNAL_REQUEST_ERRORS = counter(
+    'wachtwijzer_external_request_errors_total',
+    'Failed calls to external services by reason (timeout, http_<status>, error)',
+    ['service', 'reason'])
+
+RESPONSE_CACHE_LOOKUPS = counter(
+    'wachtwijzer_response_cache_lookups_total',
+    'Snapshot response cache lookups by endpoint and result (hit or miss)',
+    ['endpoint', 'result'])
+FUNCTION_CACHE_LOOKUPS = counter(
+    'wachtwijzer_function_cache_lookups_total',
+    'In-process memoization lookups by function and result (hit or miss)',
+    ['function', 'result'])
+FUNCTION_CACHE_ENTRIES = gauge(
+    'wachtwijzer_function_cache_entries',
+    'Entries held by in-process memoization caches',
+    ['function'])
+FUNCTION_CACHE_BYTES = gauge(
+    'wachtwijzer_function_cache_bytes',
+    'Approximate memory held by the time-bounded route caches',
+    ['function'])
+POSTCODE_INDEX_LOOKUPS = counter(
+    'wachtwijzer_postcode_index_lookups_total',
+    'Postcode lookups in the offline postcode index by result (hit or miss)',
+    ['result'])
+TRAVEL_TIME_GRID_LOOKUPS = counter(
+    'wachtwijzer_travel_time_grid_lookups_total',
+    'Travel time lookups in the precomputed grid by result (hit, or miss for locations routed live)',
+    ['result'])
+GEOCODE_STORE_LOOKUPS = counter(
+    'wachtwijzer_geocode_store_lookups_total',
+    'Postcode lookups in the shared postcode_coordinates table by result (hit, negative_hit or miss)',
+    ['result'])
+
+
+def record_error(service, error):
+    """Count a failed external call, classified from the exception or status code"""
+    if isinstance(error, int):
+        reason = f"http_{error}"
+    elif 'timeout' in type(error).__name__.lower():
+        reason = 'timeout'
+    else:
+        reason = 'error'
+    EXTERNAL_REQUEST_ERRORS.inc(service=service, reason=reason)
+
+
+class TimedBackend:
+    """Proxy around a storage backend that times the methods querying storage
+
+    Only methods the backend class implements itself are timed; the shared
+    helpers inherited from WaitTimeBackend unchanged (formatting, opening hours)
+    pass straight through. Generators such as iter_raw_data() are timed until
+    they are exhausted or closed.
+    """
+
+    def __init__(self, backend):
+        self._backend = backend
+
+    def __getattr__(self, name):
+        attribute = getattr(self._backend, name)
+        if name.startswith('_') or name == 'close' or not callable(attribute):
+            return attribute
+        if getattr(type(self._backend), name, None) is getattr(WaitTimeBackend, name, None):
+            return attribute
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                result = attribute(*args, **kwargs)
+            except Exception:
+                DB_QUERY_ERRORS.inc(method=name)
+                DB_QUERY_DURATION.observe(time.perf_counter() - start, method=name)
+                raise
+            if inspect.isgenerator(result):
+                return self._timed_generator(name, result, start)
+            DB_QUERY_DURATION.observe(time.perf_counter() - start, method=name)
+            return result
+
+        return timed
+
+    def _timed_generator(self, name, generator, start):
+        try:
+            yield from generator
+        except Exception:
+            DB_QUERY_ERRORS.inc(method=name)
+            raise
+        finally:
+            DB_QUERY_DURATION.observe(time.perf_counter() - start, method=name)
@@ -0,0 +1,167 @@
+import os
+import logging
+import argparse
+
+import psycopg2
+from dotenv import load_dotenv
+
+# ----------------------------------------------------------------------------
+# Logging setup
+# ----------------------------------------------------------------------------
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s [%(levelname)s] %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+logger = logging.getLogger("convert_waittime_to_smallint")
+
+# ----------------------------------------------------------------------------
+# Environment vars
+# ----------------------------------------------------------------------------
+load_dotenv()
+DB_URL = os.getenv("DATABASE_URL")
+
+if not DB_URL:
+    raise RuntimeError("DATABASE_URL environment variable not set – cannot find target DB")
+
+# ----------------------------------------------------------------------------
+# SQL helpers
+# ----------------------------------------------------------------------------
+# Historical rows hold the minutes as text; anything without digits becomes NULL
+WAITTIME_TO_SMALLINT = "NULLIF(regexp_replace(waittime, '[^0-9]', '', 'g'), '')::integer::smallint"
+
+# Widest columns first so the 8-byte timestamp needs no alignment padding
+CREATE_NEW_TABLE_SQL = """
+DROP TABLE IF EXISTS wait_times_new;
+CREATE TABLE wait_times_new (
+    timestamp TIMESTAMP WITH TIME ZONE,
+    id INTEGER NOT NULL DEFAULT nextval('wait_times_id_seq'),
+    stadsloket_id INTEGER NOT NULL,
+    waiting INTEGER,
+    waittime SMALLINT
+);
+"""
+
+COPY_BATCH_SQL = f"""
+INSERT INTO wait_times_new (timestamp, id, stadsloket_id, waiting, waittime)
+SELECT timestamp, id, stadsloket_id, waiting, {WAITTIME_TO_SMALLINT}
+FROM wait_times
+WHERE id > %s AND id <= %s
+"""
+
+# Picks up rows committed while the batches were running
+COPY_MISSING_SQL = f"""
+INSERT INTO wait_times_new (timestamp, id, stadsloket_id, waiting, waittime)
+SELECT w.timestamp, w.id, w.stadsloket_id, w.waiting, {WAITTIME_TO_SMALLINT}
+FROM wait_times w
+WHERE NOT EXISTS (SELECT 1 FROM wait_times_new n WHERE n.id = w.id)
+"""
+
+CREATE_INDEXES_SQL = """
+ALTER TABLE wait_times_new ADD CONSTRAINT wait_times_new_pkey PRIMARY KEY (id);
+CREATE INDEX idx_stadsloket_id_new ON wait_times_new(stadsloket_id);
+"""
+
+SWAP_SQL = """
+ALTER TABLE wait_times RENAME CONSTRAINT wait_times_pkey TO wait_times_old_pkey;
+ALTER INDEX idx_stadsloket_id RENAME TO idx_stadsloket_id_old;
+ALTER TABLE wait_times RENAME TO wait_times_old;
+
+ALTER TABLE wait_times_new RENAME TO wait_times;
+ALTER TABLE wait_times RENAME CONSTRAINT wait_times_new_pkey TO wait_times_pkey;
+ALTER INDEX idx_stadsloket_id_new RENAME TO idx_stadsloket_id;
+
+-- Keep the id sequence alive when the old table is dropped
+ALTER SEQUENCE wait_times_id_seq OWNED BY wait_times.id;
+"""
+
+CONVERT_CURRENT_SQL = f"""
+ALTER TABLE current_wait_times
+    ALTER COLUMN waittime TYPE SMALLINT USING {WAITTIME_TO_SMALLINT};
+"""
+
+BATCH_SIZE = 50000
+
+# ----------------------------------------------------------------------------
+# Main routine
+# ----------------------------------------------------------------------------
+
+def column_type(cursor, table, column):
+    cursor.execute(
+        "SELECT data_type FROM information_schema.columns "
+        "WHERE table_schema = current_schema() AND table_name = %s AND column_name = %s",
+        (table, column),
+    )
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def migrate(drop_old=False):
+    """
+    Rewrites wait_times with a SMALLINT waittime column while the collector keeps
+    running. Rows are copied in id batches into a new table, then a short
+    EXCLUSIVE lock (reads continue, writes wait) copies the stragglers and swaps
+    the tables.
+    """
+    logger.info("Connecting to database")
+    conn = psycopg2.connect(DB_URL)
+    cursor = conn.cursor()
+
+    try:
+        if column_type(cursor, "wait_times", "waittime") == "smallint":
+            logger.info("wait_times.waittime is already SMALLINT – nothing to do")
+        else:
+            logger.info("Creating wait_times_new")
+            cursor.execute(CREATE_NEW_TABLE_SQL)
+            conn.commit()
+
+            cursor.execute("SELECT COALESCE(MAX(id), 0) FROM wait_times")
+            max_id = cursor.fetchone()[0]
+            logger.info(f"Copying rows up to id {max_id} in batches of {BATCH_SIZE}")
+            for lower in range(0, max_id, BATCH_SIZE):
+                cursor.execute(COPY_BATCH_SQL, (lower, lower + BATCH_SIZE))
+                conn.commit()
+                logger.info(f"Copied ids {lower + 1}-{min(lower + BATCH_SIZE, max_id)}")
+
+            logger.info("Building indexes on wait_times_new")
+            cursor.execute(CREATE_INDEXES_SQL)
+            conn.commit()
+
+            logger.info("Locking wait_times for the final catch-up and swap")
+            cursor.execute("LOCK TABLE wait_times IN EXCLUSIVE MODE")
+            cursor.execute(COPY_MISSING_SQL)
+            logger.info(f"Copied {cursor.rowcount} rows written during the backfill")
+            cursor.execute(SWAP_SQL)
+            conn.commit()
+            logger.info("wait_times now stores waittime as SMALLINT")
+
+            cursor.execute("ANALYZE wait_times")
+            conn.commit()
+
+        if column_type(cursor, "current_wait_times", "waittime") not in (None, "smallint"):
+            logger.info("Converting current_wait_times.waittime")
+            cursor.execute(CONVERT_CURRENT_SQL)
+            conn.commit()
+
+        if drop_old:
+            logger.info("Dropping wait_times_old")
+            cursor.execute("DROP TABLE IF EXISTS wait_times_old")
+            conn.commit()
+        else:
+            logger.info("Kept the previous table as wait_times_old – drop it once verified")
+
+        logger.info("Migration finished successfully ✅")
+    except Exception as exc:
+        logger.error("Migration failed – rolling back: %s", exc)
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert wait_times.waittime to SMALLINT")
+    parser.add_argument("--drop-old", action="store_true",
+                        help="Drop the original table after the swap")
+    migrate(drop_old=parser.parse_args().drop_old)
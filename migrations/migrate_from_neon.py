@@ -33,11 +33,11 @@ if not NEW_DB_URL:
 # ----------------------------------------------------------------------------
 CREATE_TABLES_SQL = """
 CREATE TABLE IF NOT EXISTS wait_times (
+    timestamp TIMESTAMP WITH TIME ZONE,
     id SERIAL PRIMARY KEY,
     stadsloket_id INTEGER NOT NULL,
     waiting INTEGER,
-    waittime VARCHAR(255),
-    timestamp TIMESTAMP WITH TIME ZONE
+    waittime SMALLINT
 );
 CREATE INDEX IF NOT EXISTS idx_stadsloket_id ON wait_times(stadsloket_id);
 
@@ -0,0 +1,183 @@
+import os
+import logging
+import argparse
+
+import psycopg2
+from psycopg2 import sql
+from dotenv import load_dotenv
+
+# ----------------------------------------------------------------------------
+# Logging setup
+# ----------------------------------------------------------------------------
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s [%(levelname)s] %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+logger = logging.getLogger("partition_wait_times")
+
+# ----------------------------------------------------------------------------
+# Environment vars
+# ----------------------------------------------------------------------------
+load_dotenv()
+DB_URL = os.getenv("DATABASE_URL")
+
+if not DB_URL:
+    raise RuntimeError("DATABASE_URL environment variable not set – cannot find target DB")
+
+# ----------------------------------------------------------------------------
+# SQL helpers
+# ----------------------------------------------------------------------------
+CREATE_PARTITIONED_SQL = """
+DROP TABLE IF EXISTS wait_times_partitioned;
+CREATE TABLE wait_times_partitioned (
+    timestamp TIMESTAMP WITH TIME ZONE NOT NULL,
+    id INTEGER NOT NULL DEFAULT nextval('wait_times_id_seq'),
+    stadsloket_id INTEGER NOT NULL,
+    waiting INTEGER,
+    waittime SMALLINT
+) PARTITION BY RANGE (timestamp);
+"""
+
+# Every month from the oldest sample up to MONTHS_AHEAD months from now
+MONTHS_SQL = """
+SELECT month_start, month_start + INTERVAL '1 month'
+FROM generate_series(
+    date_trunc('month', COALESCE((SELECT MIN(timestamp) FROM wait_times), NOW())),
+    date_trunc('month', NOW()) + %s * INTERVAL '1 month',
+    INTERVAL '1 month'
+) AS month_start
+"""
+
+COPY_BATCH_SQL = """
+INSERT INTO wait_times_partitioned (timestamp, id, stadsloket_id, waiting, waittime)
+SELECT timestamp, id, stadsloket_id, waiting, waittime
+FROM wait_times
+WHERE id > %s AND id <= %s AND timestamp IS NOT NULL
+"""
+
+# Picks up rows committed while the batches were running
+COPY_MISSING_SQL = """
+INSERT INTO wait_times_partitioned (timestamp, id, stadsloket_id, waiting, waittime)
+SELECT w.timestamp, w.id, w.stadsloket_id, w.waiting, w.waittime
+FROM wait_times w
+WHERE w.timestamp IS NOT NULL
+  AND NOT EXISTS (SELECT 1 FROM wait_times_partitioned p
+                  WHERE p.id = w.id AND p.timestamp = w.timestamp)
+"""
+
+CREATE_INDEXES_SQL = """
+ALTER TABLE wait_times_partitioned ADD CONSTRAINT wait_times_partitioned_pkey PRIMARY KEY (id, timestamp);
+CREATE INDEX idx_stadsloket_id_partitioned ON wait_times_partitioned(stadsloket_id, timestamp);
+"""
+
+SWAP_SQL = """
+ALTER TABLE wait_times RENAME CONSTRAINT wait_times_pkey TO wait_times_unpartitioned_pkey;
+ALTER INDEX idx_stadsloket_id RENAME TO idx_stadsloket_id_unpartitioned;
+ALTER TABLE wait_times RENAME TO wait_times_unpartitioned;
+
+ALTER TABLE wait_times_partitioned RENAME TO wait_times;
+ALTER TABLE wait_times RENAME CONSTRAINT wait_times_partitioned_pkey TO wait_times_pkey;
+ALTER INDEX idx_stadsloket_id_partitioned RENAME TO idx_stadsloket_id;
+
+-- Keep the id sequence alive when the old table is dropped
+ALTER SEQUENCE wait_times_id_seq OWNED BY wait_times.id;
+"""
+
+MONTHS_AHEAD = 2
+BATCH_SIZE = 50000
+
+# ----------------------------------------------------------------------------
+# Main routine
+# ----------------------------------------------------------------------------
+
+def is_partitioned(cursor, table):
+    cursor.execute(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s))",
+        (table,),
+    )
+    return cursor.fetchone()[0]
+
+
+def migrate(drop_old=False):
+    """
+    Moves wait_times into a table range-partitioned by month, while the
+    collector keeps running. Uses the same batch copy, short EXCLUSIVE lock and
+    rename swap as convert_waittime_to_smallint.py, which must have run first.
+    """
+    logger.info("Connecting to database")
+    conn = psycopg2.connect(DB_URL)
+    cursor = conn.cursor()
+    # Month boundaries follow Amsterdam local time, like the application
+    cursor.execute("SET timezone = 'Europe/Amsterdam';")
+
+    try:
+        if is_partitioned(cursor, "wait_times"):
+            logger.info("wait_times is already partitioned – nothing to do")
+        else:
+            cursor.execute("SELECT to_regclass('wait_times_unpartitioned')")
+            if cursor.fetchone()[0] is not None:
+                raise RuntimeError("wait_times_unpartitioned exists from an earlier run – drop it first")
+
+            logger.info("Creating wait_times_partitioned")
+            cursor.execute(CREATE_PARTITIONED_SQL)
+            cursor.execute(MONTHS_SQL, (MONTHS_AHEAD,))
+            months = cursor.fetchall()
+            for month_start, month_end in months:
+                cursor.execute(
+                    sql.SQL("CREATE TABLE {} PARTITION OF wait_times_partitioned FOR VALUES FROM (%s) TO (%s)")
+                    .format(sql.Identifier(f"wait_times_{month_start:%Y_%m}")),
+                    (month_start, month_end))
+            conn.commit()
+            logger.info(f"Created {len(months)} monthly partitions")
+
+            cursor.execute("SELECT COUNT(*) FROM wait_times WHERE timestamp IS NULL")
+            skipped = cursor.fetchone()[0]
+            if skipped:
+                logger.warning(f"{skipped} rows without a timestamp stay behind in wait_times_unpartitioned")
+
+            cursor.execute("SELECT COALESCE(MAX(id), 0) FROM wait_times")
+            max_id = cursor.fetchone()[0]
+            logger.info(f"Copying rows up to id {max_id} in batches of {BATCH_SIZE}")
+            for lower in range(0, max_id, BATCH_SIZE):
+                cursor.execute(COPY_BATCH_SQL, (lower, lower + BATCH_SIZE))
+                conn.commit()
+                logger.info(f"Copied ids {lower + 1}-{min(lower + BATCH_SIZE, max_id)}")
+
+            logger.info("Building indexes on wait_times_partitioned")
+            cursor.execute(CREATE_INDEXES_SQL)
+            conn.commit()
+
+            logger.info("Locking wait_times for the final catch-up and swap")
+            cursor.execute("LOCK TABLE wait_times IN EXCLUSIVE MODE")
+            cursor.execute(COPY_MISSING_SQL)
+            logger.info(f"Copied {cursor.rowcount} rows written during the backfill")
+            cursor.execute(SWAP_SQL)
+            conn.commit()
+            logger.info("wait_times is now partitioned by month")
+
+            cursor.execute("ANALYZE wait_times")
+            conn.commit()
+
+        if drop_old:
+            logger.info("Dropping wait_times_unpartitioned")
+            cursor.execute("DROP TABLE IF EXISTS wait_times_unpartitioned")
+            conn.commit()
+        else:
+            logger.info("Kept the previous table as wait_times_unpartitioned – drop it once verified")
+
+        logger.info("Migration finished successfully ✅")
+    except Exception as exc:
+        logger.error("Migration failed – rolling back: %s", exc)
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Range-partition wait_times by month")
+    parser.add_argument("--drop-old", action="store_true",
+                        help="Drop the unpartitioned table after the swap")
+    migrate(drop_old=parser.parse_args().drop_old)
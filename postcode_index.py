@@ -0,0 +1,192 @@
+"""Offline PC6 postcode -> coordinate index in a compact, memory-mapped file.
+
+The file holds one record per postcode, sorted, as three little-endian
+arrays after a 12-byte header, so a lookup is a binary search over the
+mapped key array and touches a handful of pages:
+
+    magic 'PC6I' | version u16 | reserved u16 | count u32
+    keys  u32[count]   postcode packed as pc4 * 676 + letter1 * 26 + letter2
+    lats  i32[count]   latitude in 1e-7 degrees
+    lons  i32[count]   longitude in 1e-7 degrees
+
+Build it from a CSV of postcode centroids, or from the postcodes the app
+already geocoded into postcode_coordinates:
+
+    python postcode_index.py --csv amsterdam_pc6.csv
+    python postcode_index.py --from-database
+"""
+import argparse
+import bisect
+import csv
+import logging
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+from dotenv import load_dotenv
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'PC6I'
+VERSION = 1
+HEADER = struct.Struct('<4sHHI')
+# Fixed-point scale of the stored coordinates (1e-7 degrees, about 1 cm)
+COORDINATE_SCALE = 10_000_000
+ITEM_SIZE = 4
+
+
+def pack_postcode(postcode):
+    """'1011PN' -> integer key; keys sort like the postcodes"""
+    return int(postcode[:4]) * 676 + (ord(postcode[4]) - 65) * 26 + (ord(postcode[5]) - 65)
+
+
+def little_endian(values):
+    if sys.byteorder != 'little':
+        values.byteswap()
+    return values.tobytes()
+
+
+def build_index(rows, path):
+    """Write an index file from (postcode, lat, lon) rows with normalized PC6 postcodes
+
+    A postcode listed more than once keeps its last coordinates. The file is
+    replaced atomically, so running workers keep reading the old one until
+    they reopen it.
+
+    Returns:
+        int: Number of postcodes written
+    """
+    records = {}
+    for postcode, lat, lon in rows:
+        records[pack_postcode(postcode)] = (round(float(lat) * COORDINATE_SCALE),
+                                            round(float(lon) * COORDINATE_SCALE))
+    keys = sorted(records)
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path + '.tmp', 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, 0, len(keys)))
+        f.write(little_endian(array('I', keys)))
+        f.write(little_endian(array('i', (records[key][0] for key in keys))))
+        f.write(little_endian(array('i', (records[key][1] for key in keys))))
+    os.replace(path + '.tmp', path)
+    return len(keys)
+
+
+class PostcodeIndex:
+    """Read-only view of an index file written by build_index()
+
+    The file is memory-mapped, so worker processes share its pages through
+    the OS page cache and opening it costs nothing up front.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, version, _, count = HEADER.unpack_from(self._mmap)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"{path} is not a version {VERSION} postcode index")
+            if len(self._mmap) != HEADER.size + 3 * ITEM_SIZE * count:
+                raise ValueError(f"{path} is truncated")
+        except (ValueError, struct.error):
+            self._mmap.close()
+            raise
+        self._count = count
+        self._keys = self._column(0, 'I')
+        self._lats = self._column(1, 'i')
+        self._lons = self._column(2, 'i')
+
+    def _column(self, number, typecode):
+        start = HEADER.size + number * ITEM_SIZE * self._count
+        view = memoryview(self._mmap)[start:start + ITEM_SIZE * self._count]
+        if sys.byteorder == 'little':
+            return view.cast(typecode)
+        values = array(typecode, view)
+        values.byteswap()
+        return values
+
+    def __len__(self):
+        return self._count
+
+    def lookup(self, postcode):
+        """Coordinates of a normalized PC6 postcode, or None when it is not in the index"""
+        key = pack_postcode(postcode)
+        position = bisect.bisect_left(self._keys, key)
+        if position == self._count or self._keys[position] != key:
+            return None
+        return {'lat': self._lats[position] / COORDINATE_SCALE,
+                'lon': self._lons[position] / COORDINATE_SCALE}
+
+    def close(self):
+        for column in (self._keys, self._lats, self._lons):
+            if isinstance(column, memoryview):
+                column.release()
+        self._mmap.close()
+
+
+def open_postcode_index(path):
+    """Open the index at path, or return None when it was never built or is unreadable"""
+    if not os.path.exists(path):
+        logger.info(f"No postcode index at {path}, geocoding postcodes online")
+        return None
+    try:
+        index = PostcodeIndex(path)
+    except (OSError, ValueError, struct.error) as e:
+        logger.error(f"Could not open postcode index {path}: {e}")
+        return None
+    logger.info(f"Loaded postcode index with {len(index)} postcodes from {path}")
+    return index
+
+
+def read_csv_rows(path, postcode_column, lat_column, lon_column):
+    """(postcode, lat, lon) rows from a CSV of centroids, skipping malformed postcodes"""
+    from location_service import normalize_postcode
+
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        for row in csv.DictReader(f):
+            postcode = normalize_postcode(row.get(postcode_column))
+            if postcode is None:
+                logger.warning(f"Skipping row without a valid postcode: {row}")
+                continue
+            try:
+                yield postcode, float(row[lat_column]), float(row[lon_column])
+            except (KeyError, TypeError, ValueError):
+                logger.warning(f"Skipping {postcode} without valid coordinates")
+
+
+def read_database_rows(database_url):
+    """(postcode, lat, lon) rows of every postcode geocoded into postcode_coordinates"""
+    from wait_time_data import open_wait_time_lib
+
+    wait_time = open_wait_time_lib(database_url)
+    try:
+        return wait_time.get_stored_postcode_coordinates()
+    finally:
+        wait_time.close()
+
+
+if __name__ == '__main__':
+    from location_service import POSTCODE_INDEX_PATH
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Compile postcode centroids into the offline postcode index")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--csv', metavar='FILE', help="CSV with a postcode and WGS84 latitude/longitude per row")
+    source.add_argument('--from-database', action='store_true',
+                        help="Use the postcodes geocoded into postcode_coordinates (DATABASE_URL)")
+    parser.add_argument('--postcode-column', default='postcode')
+    parser.add_argument('--lat-column', default='lat')
+    parser.add_argument('--lon-column', default='lon')
+    parser.add_argument('--output', default=POSTCODE_INDEX_PATH)
+    args = parser.parse_args()
+
+    if args.csv:
+        rows = read_csv_rows(args.csv, args.postcode_column, args.lat_column, args.lon_column)
+    else:
+        rows = read_database_rows(os.getenv('DATABASE_URL'))
+    count = build_index(rows, args.output)
+    logger.info(f"Wrote {count} postcodes to {args.output} ({os.path.getsize(args.output)} bytes)")
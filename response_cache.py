@@ -0,0 +1,73 @@
+import gzip
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+class ResponseCache:
+    """Rendered responses keyed by request, valid for one ingest snapshot
+
+    The snapshot version is the latest collector timestamp, read through
+    ``version_loader`` at most once per ``check_interval`` seconds per worker.
+    All entries are dropped when the version changes, so between collector
+    runs repeat requests are answered from memory.
+    """
+
+    def __init__(self, version_loader, check_interval=30, max_entries=512):
+        self.version_loader = version_loader
+        self.check_interval = check_interval
+        self.max_entries = max_entries
+        self._version = None
+        self._checked_at = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def version(self):
+        """Current snapshot version, refreshed when the check interval has passed"""
+        if time.monotonic() - self._checked_at < self.check_interval:
+            return self._version
+        with self._lock:
+            # Another thread may have refreshed it while we waited
+            if time.monotonic() - self._checked_at >= self.check_interval:
+                self._adopt(self.version_loader())
+            return self._version
+
+    def advance(self, version):
+        """Adopt a version learned elsewhere, e.g. from the snapshot listener"""
+        with self._lock:
+            self._adopt(version)
+
+    def _adopt(self, version):
+        if version != self._version:
+            logger.debug(f"Snapshot version changed to {version}, dropping cached responses")
+            self._entries.clear()
+            self._version = version
+        self._checked_at = time.monotonic()
+
+    def get(self, key, version):
+        """Return the (etag, body, mimetype, gzipped) entry for key, or None
+
+        gzipped is the gzip-compressed body, or None if it was stored uncompressed.
+        """
+        with self._lock:
+            if version != self._version or key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def set(self, key, version, body, mimetype, compress=False):
+        """Store a rendered body, gzipped once up front if compress, and return its strong ETag"""
+        etag = hashlib.sha1(body).hexdigest()
+        gzipped = gzip.compress(body, compresslevel=6) if compress else None
+        with self._lock:
+            # A response rendered against an older snapshot is not stored
+            if version == self._version:
+                self._entries[key] = (etag, body, mimetype, gzipped)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return etag
@@ -0,0 +1,91 @@
+import copy
+import functools
+import threading
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Runs a computation once for all concurrent callers asking for the same key
+
+    The first caller for a key runs it; callers arriving while it is in flight
+    wait and receive a deep copy of its result (or its exception), so a caller
+    may modify what it got. Nothing is kept once the computation finishes:
+    this only collapses simultaneous work, caching is left to the caller.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, func, *args, **kwargs):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return copy.deepcopy(call.result)
+
+        try:
+            call.result = func(*args, **kwargs)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+
+def coalesced(func):
+    """Decorator sharing one in-flight call among concurrent calls with equal arguments
+
+    Arguments must be hashable. cache_info()/cache_clear() of a wrapped
+    functools.lru_cache stay available.
+    """
+    flight = SingleFlight()
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        return flight.do((args, tuple(sorted(kwargs.items()))), func, *args, **kwargs)
+
+    for name in ('cache_info', 'cache_clear'):
+        if hasattr(func, name):
+            setattr(wrapper, name, getattr(func, name))
+    return wrapper
+
+
+class CoalescedReads:
+    """Proxy around a storage backend that shares concurrent identical get_* calls
+
+    Meant for one SingleFlight per process shared by every request's backend:
+    while one request runs a query, others asking for the same method and
+    arguments wait for its rows instead of running it again. Since backends
+    open their connection lazily, the waiting requests never take one from
+    the pool.
+    """
+
+    def __init__(self, backend, flight):
+        self._backend = backend
+        self._flight = flight
+
+    def __getattr__(self, name):
+        attribute = getattr(self._backend, name)
+        if not name.startswith('get_') or not callable(attribute):
+            return attribute
+
+        def shared(*args, **kwargs):
+            return self._flight.do((name, args, tuple(sorted(kwargs.items()))), attribute, *args, **kwargs)
+
+        return shared
@@ -0,0 +1,120 @@
+import logging
+import select
+import threading
+import time
+
+import psycopg2
+
+logger = logging.getLogger(__name__)
+
+# Channel WaitTimeLib.store_snapshots() notifies on after each commit
+SNAPSHOT_CHANNEL = 'wait_times_snapshot'
+
+
+class SnapshotBroadcaster:
+    """Fans new collector snapshots out to any number of waiting clients
+
+    One daemon thread per worker holds a dedicated connection that LISTENs on
+    SNAPSHOT_CHANNEL. On each notification it loads the snapshot once through
+    ``load_snapshot`` and wakes every subscriber, so open dashboards cost no
+    queries of their own. Without a PostgreSQL ``dsn`` (e.g. SQLite) the thread
+    polls ``load_version`` every ``poll_interval`` seconds instead.
+    """
+
+    def __init__(self, load_snapshot, load_version, dsn=None, poll_interval=30,
+                 reconnect_delay=5, on_snapshot=None):
+        self.load_snapshot = load_snapshot
+        self.load_version = load_version
+        self.dsn = dsn
+        self.poll_interval = poll_interval
+        self.reconnect_delay = reconnect_delay
+        self.on_snapshot = on_snapshot
+        self._version = None
+        self._snapshot = None
+        self._condition = threading.Condition()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def start(self):
+        """Start the listener thread once per process"""
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='snapshot-listener', daemon=True)
+                self._thread.start()
+
+    def latest(self):
+        """Return (version, snapshot), loading it on first use"""
+        with self._condition:
+            if self._version is not None:
+                return self._version, self._snapshot
+        self._publish(self.load_version())
+        with self._condition:
+            return self._version, self._snapshot
+
+    def wait_for_update(self, version, timeout):
+        """Block until a snapshot newer than version is published
+
+        Returns:
+            tuple: (version, snapshot), or None when the timeout passed first
+        """
+        with self._condition:
+            if self._condition.wait_for(lambda: self._version is not None and self._version != version,
+                                        timeout=timeout):
+                return self._version, self._snapshot
+        return None
+
+    def _publish(self, version):
+        if version is None:
+            return
+        with self._condition:
+            if version == self._version:
+                return
+        snapshot = self.load_snapshot()
+        with self._condition:
+            self._version = version
+            self._snapshot = snapshot
+            self._condition.notify_all()
+        if self.on_snapshot:
+            self.on_snapshot(version)
+
+    def _run(self):
+        while True:
+            try:
+                if self.dsn:
+                    self._listen()
+                else:
+                    self._poll()
+            except Exception as e:
+                logger.warning(f"Snapshot listener failed, retrying in {self.reconnect_delay}s: {e}")
+                time.sleep(self.reconnect_delay)
+
+    def _poll(self):
+        while True:
+            self._publish(self.load_version())
+            time.sleep(self.poll_interval)
+
+    def _listen(self):
+        conn = psycopg2.connect(self.dsn)
+        try:
+            conn.autocommit = True
+            with conn.cursor() as cursor:
+                cursor.execute(f"LISTEN {SNAPSHOT_CHANNEL}")
+            logger.info(f"Listening for new snapshots on {SNAPSHOT_CHANNEL}")
+            # Catch up on anything stored while we were not listening
+            self._publish(self.load_version())
+            while True:
+                # Wake up now and then so a dead connection is noticed, and a
+                # snapshot a lagging read replica hid at notify time is picked up
+                if select.select([conn], [], [], self.poll_interval) == ([], [], []):
+                    with conn.cursor() as cursor:
+                        cursor.execute("SELECT 1")
+                    self._publish(self.load_version())
+                    continue
+                conn.poll()
+                if conn.notifies:
+                    # Collapse a burst (e.g. a backfill) into a single reload; the
+                    # version is re-read so it always matches load_version()
+                    conn.notifies.clear()
+                    self._publish(self.load_version())
+        finally:
+            conn.close()
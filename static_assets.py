@@ -0,0 +1,200 @@
+import argparse
+import gzip
+import hashlib
+import io
+import json
+import logging
+import mimetypes
+import os
+
+from flask import request, send_from_directory
+
+try:
+    import brotli
+except ImportError:  # Optional: without it only gzip variants are built
+    brotli = None
+
+try:
+    from PIL import Image
+except ImportError:  # Optional: without it no WebP variants are built
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+# Built assets live in <static>/dist, next to the sources they were made from
+BUILD_DIR = 'dist'
+MANIFEST_NAME = 'manifest.json'
+
+# Fingerprinted URLs never change content, so browsers may keep them for a year
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+COMPRESSIBLE_EXTENSIONS = {'.css', '.js', '.json', '.svg', '.ico', '.txt', '.xml', '.webmanifest'}
+WEBP_EXTENSIONS = {'.png', '.jpg', '.jpeg'}
+# Text assets whose /static/... references are rewritten to the fingerprinted URLs
+REWRITE_EXTENSIONS = {'.css', '.webmanifest'}
+WEBP_QUALITY = 85
+# File suffix of each precompressed variant, in order of preference
+ENCODING_SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+
+mimetypes.add_type('application/manifest+json', '.webmanifest')
+
+
+def fingerprinted_name(logical_path, content):
+    """style.css -> style.<hash>.css, with a hash of the file content"""
+    root, ext = os.path.splitext(logical_path)
+    return f"{root}.{hashlib.sha256(content).hexdigest()[:12]}{ext}"
+
+
+def write_file(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + '.tmp', 'wb') as f:
+        f.write(content)
+    os.replace(path + '.tmp', path)
+
+
+def compress_variants(content):
+    """Precompressed variants that are smaller than the original, by encoding"""
+    variants = {}
+    if brotli is not None:
+        variants['br'] = brotli.compress(content, quality=11)
+    variants['gzip'] = gzip.compress(content, compresslevel=9, mtime=0)
+    return {encoding: data for encoding, data in variants.items() if len(data) < len(content)}
+
+
+def webp_variant(source_path):
+    """Lossy WebP encoding of an image, or None when it would not be smaller"""
+    if Image is None:
+        return None
+    with Image.open(source_path) as image:
+        buffer = io.BytesIO()
+        image.save(buffer, 'WEBP', quality=WEBP_QUALITY, method=6)
+    data = buffer.getvalue()
+    return data if len(data) < os.path.getsize(source_path) else None
+
+
+def build_assets(static_dir, url_prefix='/static'):
+    """Fingerprint every file under static_dir and pregenerate its variants
+
+    Writes <name>.<hash>.<ext> copies to <static_dir>/dist together with
+    .br/.gz variants for text assets and a .webp variant for images, plus a
+    manifest mapping each source path to its built files. Earlier builds are
+    left in place, so pages still cached by browsers keep finding their assets.
+
+    Returns:
+        dict: The manifest that was written
+    """
+    output_dir = os.path.join(static_dir, BUILD_DIR)
+    sources = []
+    for directory, subdirectories, files in os.walk(static_dir):
+        if os.path.abspath(directory) == os.path.abspath(static_dir):
+            subdirectories[:] = [d for d in subdirectories if d != BUILD_DIR]
+        for name in files:
+            sources.append(os.path.relpath(os.path.join(directory, name), static_dir).replace(os.sep, '/'))
+
+    # Assets referencing other assets are built last, once those have their URLs
+    sources.sort(key=lambda path: (os.path.splitext(path)[1] in REWRITE_EXTENSIONS, path))
+
+    manifest = {}
+    for logical_path in sources:
+        source_path = os.path.join(static_dir, logical_path)
+        ext = os.path.splitext(logical_path)[1].lower()
+        with open(source_path, 'rb') as f:
+            content = f.read()
+
+        if ext in REWRITE_EXTENSIONS:
+            text = content.decode('utf-8')
+            for referenced, entry in manifest.items():
+                text = text.replace(f"{url_prefix}/{referenced}", f"{url_prefix}/{entry['file']}")
+            content = text.encode('utf-8')
+
+        built_path = f"{BUILD_DIR}/{fingerprinted_name(logical_path, content)}"
+        write_file(os.path.join(static_dir, built_path), content)
+        entry = {'file': built_path, 'encodings': []}
+
+        if ext in COMPRESSIBLE_EXTENSIONS:
+            for encoding, data in compress_variants(content).items():
+                write_file(os.path.join(static_dir, built_path + ENCODING_SUFFIXES[encoding]), data)
+                entry['encodings'].append(encoding)
+
+        if ext in WEBP_EXTENSIONS:
+            data = webp_variant(source_path)
+            if data is not None:
+                entry['webp'] = os.path.splitext(built_path)[0] + '.webp'
+                write_file(os.path.join(static_dir, entry['webp']), data)
+
+        manifest[logical_path] = entry
+
+    write_file(os.path.join(output_dir, MANIFEST_NAME), json.dumps(manifest, indent=2, sort_keys=True).encode('utf-8'))
+    return manifest
+
+
+def load_manifest(static_dir):
+    """Return the manifest of the last build, or None when assets were never built"""
+    try:
+        with open(os.path.join(static_dir, BUILD_DIR, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def init_static_assets(app):
+    """Serve built assets from app.static_folder when a manifest is present
+
+    url_for('static', filename=...) then yields the fingerprinted URL, and the
+    static view answers it with the best precompressed or WebP variant the
+    client accepts and an immutable cache lifetime. Without a build the
+    default Flask static handling stays in place.
+    """
+    manifest = load_manifest(app.static_folder)
+    if manifest is None:
+        logger.info("No built static assets found, serving /static as is")
+        return
+
+    built = {entry['file']: entry for entry in manifest.values()}
+    default_static = app.view_functions['static']
+    logger.info(f"Serving {len(built)} fingerprinted static assets")
+
+    @app.url_defaults
+    def fingerprint_static_urls(endpoint, values):
+        if endpoint == 'static' and values.get('filename') in manifest:
+            values['filename'] = manifest[values['filename']]['file']
+
+    def serve_static(filename):
+        entry = built.get(filename)
+        if entry is None:
+            return default_static(filename=filename)
+
+        path = filename
+        mimetype = mimetypes.guess_type(filename)[0]
+        encoding = None
+        vary = []
+        if 'webp' in entry:
+            vary.append('Accept')
+            # Only on explicit support; a bare */* does not mean WebP can be decoded
+            if 'image/webp' in request.headers.get('Accept', ''):
+                path, mimetype = entry['webp'], 'image/webp'
+        if entry['encodings']:
+            vary.append('Accept-Encoding')
+            # Prefer brotli; the manifest lists encodings in that order
+            encoding = next((e for e in entry['encodings'] if request.accept_encodings[e]), None)
+            if encoding:
+                path += ENCODING_SUFFIXES[encoding]
+
+        response = send_from_directory(app.static_folder, path, mimetype=mimetype)
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        if vary:
+            response.vary.update(vary)
+        response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+        return response
+
+    app.view_functions['static'] = serve_static
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+    parser = argparse.ArgumentParser(description="Fingerprint and precompress the static assets")
+    parser.add_argument('--static-dir', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static'))
+    args = parser.parse_args()
+    manifest = build_assets(args.static_dir)
+    logger.info(f"Built {len(manifest)} assets into {os.path.join(args.static_dir, BUILD_DIR)}")
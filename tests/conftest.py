@@ -0,0 +1,73 @@
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# app.py builds an app for DATABASE_URL on import; keep it off any real database
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'import.db')
+# No upstream calls from the location service, whatever .env says
+os.environ['ORS_API_KEY'] = ''
+
+import pytest  # noqa: E402
+import pytz  # noqa: E402
+
+AMSTERDAM = pytz.timezone('Europe/Amsterdam')
+# Four collector runs, ten minutes apart, for two offices
+SNAPSHOTS = [
+    (AMSTERDAM.localize(datetime(2025, 3, 4, 10, 0)) + timedelta(minutes=10 * i), [
+        {'id': 5, 'waiting': 4 + i, 'waittime': f"{12 + i} minuten"},
+        {'id': 6, 'waiting': 0, 'waittime': 'geen wachttijd'},
+    ])
+    for i in range(4)
+]
+
+# A disposable PostgreSQL database; tests that need one are skipped without it
+TEST_DATABASE_URL = os.getenv('TEST_DATABASE_URL')
+
+
+@pytest.fixture
+def sqlite_url(tmp_path):
+    return f"sqlite:///{tmp_path / 'wait_times.db'}"
+
+
+@pytest.fixture
+def postgres_url():
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL is not set")
+    return TEST_DATABASE_URL
+
+
+@pytest.fixture
+def make_client(monkeypatch):
+    """Build a Flask test client for the app on a given database URL"""
+    import app as app_module
+
+    def make(url, **settings):
+        monkeypatch.setattr(app_module, 'db_url', url)
+        for name, value in settings.items():
+            monkeypatch.setattr(app_module, name, value)
+        return app_module.create_app().test_client()
+
+    return make
+
+
+def seed(url, snapshots=SNAPSHOTS):
+    """Store loket names and snapshots in the database at url"""
+    from wait_time_data import open_wait_time_lib
+
+    wait_time = open_wait_time_lib(url)
+    try:
+        wait_time.ensure_partitions(since=snapshots[0][0])
+        wait_time.store_loket_names([(5, 'Centrum'), (6, 'Nieuw-West')])
+        wait_time.store_snapshots(snapshots)
+    finally:
+        wait_time.close()
+
+
+@pytest.fixture
+def seeded_sqlite_url(sqlite_url):
+    seed(sqlite_url)
+    return sqlite_url
@@ -0,0 +1,88 @@
+"""The SQLite and PostgreSQL backends answer the same queries alike
+
+The PostgreSQL backend runs only when TEST_DATABASE_URL points at a
+disposable database; its wait-time tables are emptied first.
+"""
+from datetime import datetime, timedelta
+
+import pytest
+import pytz
+
+from wait_time_data import open_wait_time_lib
+
+AMSTERDAM = pytz.timezone('Europe/Amsterdam')
+
+SNAPSHOTS = [
+    (AMSTERDAM.localize(datetime(2025, 3, 3, 9, 0)) + timedelta(minutes=10 * i), [
+        {'id': 5, 'waiting': i % 7, 'waittime': f"{(3 * i) % 50} minuten"},
+        {'id': 6, 'waiting': (2 * i) % 5, 'waittime': 'geen wachttijd' if i % 4 == 0 else f"{i % 20} minuten"},
+        {'id': 7, 'waiting': 1, 'waittime': 'meer dan een uur'},
+    ])
+    for i in range(60)
+]
+
+
+@pytest.fixture(params=['sqlite', 'postgresql'])
+def backend(request, sqlite_url):
+    if request.param == 'sqlite':
+        url = sqlite_url
+    else:
+        url = request.getfixturevalue('postgres_url')
+        wait_time = open_wait_time_lib(url)
+        wait_time.cursor.execute("""
+            TRUNCATE wait_times, wait_times_hourly, hourly_wait_stats, current_wait_times,
+                     wait_stats_totals, wait_stats_daily, loket_names, postcode_coordinates
+        """)
+        wait_time.db.commit()
+        wait_time.close()
+    wait_time = open_wait_time_lib(url)
+    wait_time.ensure_partitions(since=SNAPSHOTS[0][0])
+    wait_time.store_loket_names([(5, 'Centrum'), (6, 'Nieuw-West'), (7, 'Zuidoost')])
+    wait_time.store_snapshots(SNAPSHOTS)
+    yield wait_time
+    wait_time.close()
+
+
+def queries(wait_time):
+    return {
+        'current': sorted(wait_time.get_current_waiting()),
+        'mean': sorted(wait_time.get_mean_wait_times()),
+        'statistics': wait_time.get_wait_statistics(),
+        'monday': wait_time.get_hourly_averages(day_of_week=1),
+        'weekly': wait_time.get_weekly_hourly_averages(),
+    }
+
+
+def test_store_snapshots(backend):
+    assert len(backend.get_raw_data()) == 3 * len(SNAPSHOTS)
+    assert backend.get_last_update_time() == SNAPSHOTS[-1][0]
+    assert sorted(backend.get_current_waiting()) == [
+        (5, 'Centrum', 27, 3),
+        (6, 'Nieuw-West', 19, 3),
+        (7, 'Zuidoost', 70, 1),
+    ]
+
+
+def test_rollups_match_a_rebuild_from_raw_samples(backend):
+    incremental = queries(backend)
+    backend.rebuild_hourly_stats()
+    backend.rebuild_current_wait_times()
+    backend.rebuild_wait_statistics()
+    assert queries(backend) == incremental
+
+
+def test_statistics_of_a_constant_office(backend):
+    statistics = backend.get_wait_statistics()
+    office = next(row for row in statistics if row['stadsloket_id'] == 7)
+    assert office['all_time']['samples'] == len(SNAPSHOTS)
+    assert office['all_time']['mean_waittime'] == 70
+    assert office['all_time']['stddev_waittime'] == 0
+    assert office['all_time']['mean_waiting'] == 1
+
+
+def test_postcode_coordinates(backend):
+    backend.store_postcode_coordinates([('1011PN', 52.3676, 4.9041), ('9999ZZ', None, None)])
+    assert backend.get_postcode_coordinates('1011PN')[:2] == (52.3676, 4.9041)
+    assert backend.get_postcode_coordinates('9999ZZ')[:2] == (None, None)
+    assert backend.get_postcode_coordinates('1012AB') is None
+    assert sorted(backend.get_stored_postcode_coordinates()) == [('1011PN', 52.3676, 4.9041)]
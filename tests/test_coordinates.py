@@ -0,0 +1,20 @@
+import pytest
+
+
+@pytest.fixture
+def client(make_client, seeded_sqlite_url):
+    return make_client(seeded_sqlite_url)
+
+
+@pytest.mark.parametrize('path', [
+    '/api/combined-times?lat=nan&lon=4.9',
+    '/api/combined-times?lat=52.37&lon=inf',
+    '/api/combined-times?lat=-Infinity&lon=4.9&live=1',
+    '/api/combined-times?lat=abc&lon=4.9',
+    '/api/route?office_id=5&lat=nan&lon=4.9',
+    '/api/route?office_id=5&lat=52.37&lon=-inf',
+])
+def test_coordinates_that_are_not_finite_numbers_are_rejected(client, path):
+    response = client.get(path)
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
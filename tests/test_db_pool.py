@@ -0,0 +1,79 @@
+import threading
+
+import pytest
+from psycopg2.pool import PoolError
+
+from db_pool import create_pool
+
+
+@pytest.fixture
+def pool(postgres_url):
+    pool = create_pool(postgres_url, minconn=1, maxconn=2, checkout_timeout=5)
+    yield pool
+    pool.closeall()
+
+
+def test_checkout_waits_for_a_returned_connection(pool):
+    first = pool.getconn()
+    second = pool.getconn()
+    borrowed = []
+    waiter = threading.Thread(target=lambda: borrowed.append(pool.getconn()))
+    waiter.start()
+    waiter.join(0.2)
+    assert waiter.is_alive()
+
+    pool.putconn(first)
+    waiter.join(5)
+    assert borrowed == [first]
+    pool.putconn(second)
+    pool.putconn(first)
+
+
+def test_checkout_times_out_when_every_connection_stays_busy(pool):
+    held = [pool.getconn(), pool.getconn()]
+    with pytest.raises(PoolError):
+        pool.getconn(timeout=0.1)
+    for conn in held:
+        pool.putconn(conn)
+    pool.putconn(pool.getconn(timeout=0))
+
+
+def test_connections_above_minconn_stay_open_for_reuse(pool):
+    held = [pool.getconn(), pool.getconn()]
+    for conn in held:
+        pool.putconn(conn)
+    assert pool.usage() == (0, 2)
+    assert not any(conn.closed for conn in held)
+
+    again = [pool.getconn(), pool.getconn()]
+    assert {id(conn) for conn in again} == {id(conn) for conn in held}
+    for conn in again:
+        pool.putconn(conn)
+
+
+def test_broken_connections_are_replaced(pool):
+    conn = pool.getconn()
+    pool.putconn(conn)
+    conn.close()
+    pool.health_check_interval = 0
+    replacement = pool.getconn()
+    assert not replacement.closed
+    with replacement.cursor() as cursor:
+        cursor.execute("SHOW timezone")
+        assert cursor.fetchone()[0] == 'Europe/Amsterdam'
+    pool.putconn(replacement)
+
+
+def test_concurrent_requests_beyond_the_pool_size_wait_for_a_connection(postgres_url, make_client):
+    client = make_client(postgres_url, DB_POOL_MIN=1, DB_POOL_MAX=3)
+    statuses = []
+
+    def check():
+        statuses.append(client.get('/health').status_code)
+
+    threads = [threading.Thread(target=check) for _ in range(30)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(30)
+    assert statuses == [200] * 30
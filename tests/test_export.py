@@ -0,0 +1,64 @@
+import csv
+import io
+import json
+
+from conftest import SNAPSHOTS, seed
+
+
+def test_csv_export(make_client, seeded_sqlite_url):
+    response = make_client(seeded_sqlite_url).get('/api/export')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/csv'
+    assert response.headers['Content-Disposition'] == 'attachment; filename=wait_times.csv'
+
+    rows = list(csv.reader(io.StringIO(response.get_data(as_text=True))))
+    assert rows[0] == ['stadsloket_id', 'loket_name', 'waiting', 'waittime', 'timestamp']
+    assert len(rows) == 1 + 2 * len(SNAPSHOTS)
+    assert ['5', 'Centrum', '4', '12', '2025-03-04T10:00:00+01:00'] in rows
+
+
+def test_ndjson_export_filtered_by_office_and_time(make_client, seeded_sqlite_url):
+    response = make_client(seeded_sqlite_url).get(
+        '/api/export?format=ndjson&office=5&start=2025-03-04T10:10&end=2025-03-04T10:30')
+    assert response.mimetype == 'application/x-ndjson'
+    records = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [(r['stadsloket_id'], r['waittime'], r['timestamp']) for r in records] == [
+        (5, 13, '2025-03-04T10:10:00+01:00'),
+        (5, 14, '2025-03-04T10:20:00+01:00'),
+    ]
+
+
+def test_export_is_streamed_in_chunks(make_client, seeded_sqlite_url):
+    client = make_client(seeded_sqlite_url, EXPORT_CHUNK_ROWS=3)
+    response = client.get('/api/export?format=ndjson', buffered=False)
+    chunks = [chunk for chunk in response.response if chunk]
+    response.close()
+    assert [chunk.count(b'\n') for chunk in chunks] == [3, 3, 2]
+
+
+def test_invalid_parameters(make_client, seeded_sqlite_url):
+    client = make_client(seeded_sqlite_url)
+    assert client.get('/api/export?format=xml').status_code == 400
+    assert client.get('/api/export?office=centrum').status_code == 400
+    assert client.get('/api/export?start=yesterday').status_code == 400
+
+
+def test_streaming_export_returns_its_pooled_connection(make_client, postgres_url):
+    from wait_time_data import open_wait_time_lib
+
+    wait_time = open_wait_time_lib(postgres_url)
+    wait_time.cursor.execute("TRUNCATE wait_times, loket_names")
+    wait_time.db.commit()
+    wait_time.close()
+    seed(postgres_url)
+
+    client = make_client(postgres_url, DB_POOL_MIN=1, DB_POOL_MAX=1, DB_POOL_TIMEOUT=1,
+                         EXPORT_FETCH_SIZE=2, EXPORT_CHUNK_ROWS=2)
+    for _ in range(3):
+        response = client.get('/api/export')
+        assert response.get_data(as_text=True).count('\n') == 1 + 2 * len(SNAPSHOTS)
+    # A client that disconnects halfway also hands the connection back
+    response = client.get('/api/export', buffered=False)
+    next(iter(response.response))
+    response.close()
+    assert client.get('/health').status_code == 200
@@ -0,0 +1,66 @@
+import time
+from datetime import timedelta
+
+import pytest
+
+from app import INDEX_LANGUAGES
+from conftest import SNAPSHOTS, seed
+
+
+@pytest.fixture
+def renders(monkeypatch):
+    """Count the templates rendered by the app"""
+    import app as app_module
+    rendered = []
+    render_template = app_module.render_template
+
+    def counting_render_template(name, **context):
+        rendered.append((name, context.get('canonical_url'), context.get('lang')))
+        return render_template(name, **context)
+
+    monkeypatch.setattr(app_module, 'render_template', counting_render_template)
+    monkeypatch.setattr(app_module, 'TRUSTED_HOSTS', {'wachtwijzer.example'})
+    return rendered
+
+
+def test_trusted_hosts_are_rendered_once_in_every_language(make_client, seeded_sqlite_url, renders):
+    client = make_client(seeded_sqlite_url)
+    renders.clear()
+
+    first = client.get('/', base_url='https://wachtwijzer.example')
+    assert first.status_code == 200
+    assert 'ETag' in first.headers
+    assert sorted(lang for _, _, lang in renders) == sorted(INDEX_LANGUAGES)
+
+    other_language = client.get('/?lang=en', base_url='https://wachtwijzer.example')
+    assert other_language.status_code == 200
+    assert len(renders) == len(INDEX_LANGUAGES)
+    assert b'https://wachtwijzer.example/' in other_language.get_data()
+
+
+def test_other_hosts_get_one_uncached_page(make_client, seeded_sqlite_url, renders):
+    client = make_client(seeded_sqlite_url)
+    renders.clear()
+
+    for _ in range(2):
+        response = client.get('/?lang=en', base_url='http://forged.example')
+        assert response.status_code == 200
+        assert 'ETag' not in response.headers
+        assert b'http://forged.example/' in response.get_data()
+    assert renders == [('index.html', 'http://forged.example/', 'en')] * 2
+
+
+def test_new_snapshots_are_prerendered_for_trusted_hosts_only(make_client, seeded_sqlite_url, renders):
+    # The listener polls SQLite for new snapshots every RESPONSE_CACHE_TTL seconds
+    client = make_client(seeded_sqlite_url, RESPONSE_CACHE_TTL=0.01)
+    client.get('/', base_url='https://wachtwijzer.example')
+    client.get('/', base_url='http://forged.example')
+    renders.clear()
+
+    seed(seeded_sqlite_url, [(SNAPSHOTS[-1][0] + timedelta(minutes=10),
+                              [{'id': 5, 'waiting': 9, 'waittime': '40 minuten'}])])
+    deadline = time.monotonic() + 5
+    while len(renders) < len(INDEX_LANGUAGES) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert {canonical_url for _, canonical_url, _ in renders} == {'https://wachtwijzer.example/'}
+    assert {lang for _, _, lang in renders} == set(INDEX_LANGUAGES)
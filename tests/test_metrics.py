@@ -0,0 +1,92 @@
+import json
+import os
+import subprocess
+import sys
+
+from metrics import Counter, Gauge, Histogram, Registry
+
+
+def make_registry(directory):
+    registry = Registry(str(directory))
+    requests = registry.register(Counter('requests_total', 'Requests', ['route']))
+    connections = registry.register(Gauge('connections', 'Open connections'))
+    latency = registry.register(Histogram('latency_seconds', 'Latency', buckets=(0.1, 1)))
+    return registry, requests, connections, latency
+
+
+def exited_pid():
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    return process.pid
+
+
+def write_process(directory, pid, samples):
+    with open(os.path.join(directory, f"{pid}.json"), 'w') as f:
+        json.dump(samples, f)
+
+
+def test_single_process_exposition():
+    registry = Registry()
+    requests = registry.register(Counter('requests_total', 'Requests', ['route']))
+    requests.inc(route='/')
+    requests.inc(2, route='/')
+    assert registry.expose() == (
+        '# HELP requests_total Requests\n'
+        '# TYPE requests_total counter\n'
+        'requests_total{route="/"} 3\n'
+    )
+
+
+def test_processes_are_summed(tmp_path):
+    registry, requests, connections, latency = make_registry(tmp_path)
+    requests.inc(route='/')
+    connections.set(2)
+    latency.observe(0.05)
+    # Another worker that is still running (the test runner's parent process)
+    write_process(tmp_path, os.getppid(), {
+        'requests_total': [[['/'], 4], [['/health'], 1]],
+        'connections': [[[], 3]],
+        'latency_seconds': [[[], [[0, 1, 0], 0.5]]],
+    })
+
+    lines = registry.expose().splitlines()
+    assert 'requests_total{route="/"} 5' in lines
+    assert 'requests_total{route="/health"} 1' in lines
+    assert 'connections 5' in lines
+    assert 'latency_seconds_bucket{le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{le="1"} 2' in lines
+    assert 'latency_seconds_count 2' in lines
+    assert 'latency_seconds_sum 0.55' in lines
+
+
+def test_gauges_of_exited_processes_are_dropped(tmp_path):
+    registry, requests, connections, _ = make_registry(tmp_path)
+    connections.set(2)
+    write_process(tmp_path, exited_pid(), {
+        'requests_total': [[['/'], 4]],
+        'connections': [[[], 3]],
+    })
+
+    lines = registry.expose().splitlines()
+    assert 'requests_total{route="/"} 4' in lines
+    assert 'connections 2' in lines
+
+
+def test_each_process_writes_its_own_file(tmp_path):
+    registry, requests, _, _ = make_registry(tmp_path)
+    requests.inc(route='/')
+    registry.write()
+    with open(tmp_path / f"{os.getpid()}.json") as f:
+        assert json.load(f)['requests_total'] == [[['/'], 1]]
+
+
+def test_metrics_endpoint(make_client, seeded_sqlite_url):
+    client = make_client(seeded_sqlite_url, METRICS_TOKEN='secret')
+    client.get('/api/offices')
+
+    assert client.get('/metrics').status_code == 401
+    response = client.get('/metrics', headers={'Authorization': 'Bearer secret'})
+    assert response.status_code == 200
+    body = response.get_data(as_text=True)
+    assert 'wachtwijzer_http_requests_total{route="/api/offices",method="GET",status="200"}' in body
+    assert 'wachtwijzer_db_query_duration_seconds_count{method="get_last_update_time"}' in body
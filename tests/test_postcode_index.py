@@ -0,0 +1,52 @@
+import pytest
+
+from postcode_index import HEADER, PostcodeIndex, build_index, open_postcode_index
+
+ROWS = [
+    ('1011PN', 52.3676, 4.9041),
+    ('1012AB', 52.3731, 4.8926),
+    ('1102AA', 52.3123, 4.9721),
+    # Listed twice; the last coordinates win
+    ('1011PN', 52.3677, 4.9042),
+]
+
+
+@pytest.fixture
+def index_path(tmp_path):
+    path = str(tmp_path / 'postcodes.idx')
+    assert build_index(ROWS, path) == 3
+    return path
+
+
+def test_round_trip(index_path):
+    index = open_postcode_index(index_path)
+    try:
+        assert len(index) == 3
+        assert index.lookup('1011PN') == {'lat': 52.3677, 'lon': 4.9042}
+        assert index.lookup('1102AA') == {'lat': 52.3123, 'lon': 4.9721}
+        assert index.lookup('1011PP') is None
+        assert index.lookup('9999ZZ') is None
+        assert index.lookup('1000AA') is None
+    finally:
+        index.close()
+
+
+def test_missing_file(tmp_path):
+    assert open_postcode_index(str(tmp_path / 'missing.idx')) is None
+
+
+@pytest.mark.parametrize('size', [0, 5, HEADER.size, HEADER.size + 7])
+def test_truncated_file_is_unreadable(index_path, size):
+    with open(index_path, 'rb') as f:
+        data = f.read(size)
+    with open(index_path, 'wb') as f:
+        f.write(data)
+    assert open_postcode_index(index_path) is None
+
+
+def test_other_file_is_unreadable(index_path):
+    with open(index_path, 'r+b') as f:
+        f.write(b'XXXX')
+    with pytest.raises(ValueError):
+        PostcodeIndex(index_path)
+    assert open_postcode_index(index_path) is None
@@ -0,0 +1,112 @@
+import gzip
+import hashlib
+import time
+from datetime import timedelta
+
+import pytest
+
+from conftest import SNAPSHOTS, seed
+from response_cache import ResponseCache
+
+
+class Versions:
+    def __init__(self, version):
+        self.version = version
+        self.loads = 0
+
+    def __call__(self):
+        self.loads += 1
+        return self.version
+
+
+def test_entries_are_dropped_when_the_snapshot_changes():
+    versions = Versions('v1')
+    cache = ResponseCache(versions, check_interval=0)
+    version = cache.version()
+    etag = cache.set('key', version, b'body', 'text/plain')
+
+    assert etag == hashlib.sha1(b'body').hexdigest()
+    assert cache.get('key', cache.version()) == (etag, b'body', 'text/plain', None)
+    versions.version = 'v2'
+    assert cache.get('key', cache.version()) is None
+
+
+def test_versions_are_checked_once_per_interval():
+    versions = Versions('v1')
+    cache = ResponseCache(versions, check_interval=3600)
+    for _ in range(3):
+        cache.version()
+    assert versions.loads == 1
+
+
+def test_responses_rendered_for_an_older_snapshot_are_not_stored():
+    cache = ResponseCache(Versions('v2'), check_interval=3600)
+    cache.version()
+    cache.set('key', 'v1', b'body', 'text/plain')
+    assert cache.get('key', 'v2') is None
+
+
+def test_compressed_entries_keep_the_etag_of_the_body():
+    cache = ResponseCache(Versions('v1'))
+    cache.set('key', cache.version(), b'body' * 100, 'text/html', compress=True)
+    etag, body, _, gzipped = cache.get('key', 'v1')
+    assert etag == hashlib.sha1(body).hexdigest()
+    assert gzip.decompress(gzipped) == body
+
+
+@pytest.fixture
+def client(make_client, seeded_sqlite_url):
+    return make_client(seeded_sqlite_url)
+
+
+@pytest.mark.parametrize('path', ['/api/offices', '/mean_wait_times', '/hourly_data?day=2', '/api/wait-statistics'])
+def test_repeat_requests_get_304(client, path):
+    first = client.get(path)
+    assert first.status_code == 200
+    etag = first.headers['ETag']
+    assert etag == '"' + hashlib.sha1(first.get_data()).hexdigest() + '"'
+
+    repeat = client.get(path, headers={'If-None-Match': etag})
+    assert repeat.status_code == 304
+    assert repeat.get_data() == b''
+    assert repeat.headers['ETag'] == etag
+
+    other = client.get(path, headers={'If-None-Match': '"stale"'})
+    assert other.status_code == 200
+    assert other.get_data() == first.get_data()
+
+
+def test_a_new_snapshot_invalidates_the_etag(make_client, seeded_sqlite_url):
+    client = make_client(seeded_sqlite_url, RESPONSE_CACHE_TTL=0.01)
+    etag = client.get('/mean_wait_times').headers['ETag']
+
+    seed(seeded_sqlite_url, [(SNAPSHOTS[-1][0] + timedelta(minutes=10),
+                              [{'id': 5, 'waiting': 30, 'waittime': '95 minuten'}])])
+    time.sleep(0.05)
+    response = client.get('/mean_wait_times', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+
+def test_compressed_pages_are_sent_gzipped_to_clients_that_accept_it(client, monkeypatch):
+    import app as app_module
+    monkeypatch.setattr(app_module, 'TRUSTED_HOSTS', {'localhost'})
+    plain = client.get('/')
+    gzipped = client.get('/', headers={'Accept-Encoding': 'gzip'})
+    assert gzipped.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(gzipped.get_data()) == plain.get_data()
+    assert gzipped.headers['ETag'] != plain.headers['ETag']
+    assert 'Accept-Encoding' in gzipped.headers['Vary']
+
+    repeat = client.get('/', headers={'Accept-Encoding': 'gzip', 'If-None-Match': gzipped.headers['ETag']})
+    assert repeat.status_code == 304
+
+
+def test_a_version_pushed_by_the_listener_keeps_entries_of_the_same_snapshot():
+    cache = ResponseCache(Versions('v1'), check_interval=3600)
+    cache.set('key', cache.version(), b'body', 'text/plain')
+    cache.advance('v1')
+    assert cache.get('key', 'v1') is not None
+    cache.advance('v2')
+    assert cache.get('key', 'v2') is None
+    assert cache.version() == 'v2'
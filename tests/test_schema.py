@@ -0,0 +1,52 @@
+from datetime import datetime
+
+import pytest
+import pytz
+
+from wait_time_data import WaitTimeLib, open_wait_time_lib
+
+
+def column_names(wait_time, table):
+    wait_time.cursor.execute(
+        "SELECT column_name FROM information_schema.columns WHERE table_schema = current_schema() AND table_name = %s",
+        (table,))
+    return {name for name, in wait_time.cursor.fetchall()}
+
+
+@pytest.fixture
+def wait_time(postgres_url):
+    wait_time = open_wait_time_lib(postgres_url)
+    wait_time.upgrade_schema()
+    wait_time.ensure_partitions(since=pytz.utc.localize(datetime(2025, 3, 1)))
+    yield wait_time
+    wait_time.close()
+
+
+def test_start_up_does_not_alter_existing_tables(wait_time, postgres_url):
+    wait_time.cursor.execute("ALTER TABLE wait_times_hourly DROP COLUMN waittime_sq_sum")
+    wait_time.db.commit()
+
+    WaitTimeLib(postgres_url).close()
+    assert 'waittime_sq_sum' not in column_names(wait_time, 'wait_times_hourly')
+
+    wait_time.upgrade_schema()
+    assert 'waittime_sq_sum' in column_names(wait_time, 'wait_times_hourly')
+
+
+def test_upgrade_seeds_empty_rollups_from_history(wait_time):
+    wait_time.store_data([{'id': 5, 'waiting': 4, 'waittime': '12 minuten'}],
+                         snapshot_time=pytz.utc.localize(datetime(2025, 3, 4, 9, 0)))
+    wait_time.cursor.execute("TRUNCATE hourly_wait_stats, current_wait_times, wait_stats_totals")
+    wait_time.db.commit()
+
+    wait_time.upgrade_schema()
+    wait_time.cursor.execute("SELECT COUNT(*) FROM hourly_wait_stats")
+    assert wait_time.cursor.fetchone()[0] > 0
+    assert wait_time.get_current_waiting()
+
+
+def test_sqlite_upgrade_creates_the_tables(sqlite_url):
+    wait_time = open_wait_time_lib(sqlite_url, create_tables=False)
+    wait_time.upgrade_schema()
+    assert wait_time.get_current_waiting() == []
+    wait_time.close()
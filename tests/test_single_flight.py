@@ -0,0 +1,114 @@
+import threading
+from functools import lru_cache
+
+import single_flight
+from single_flight import CoalescedReads, SingleFlight, coalesced
+
+
+class CountingEvent(threading.Event):
+    """Event that lets a test wait until a number of threads are blocked on it"""
+
+    def __init__(self):
+        super().__init__()
+        self.waiters = threading.Semaphore(0)
+
+    def wait(self, timeout=None):
+        self.waiters.release()
+        return super().wait(timeout)
+
+
+def run_concurrently(monkeypatch, result, followers):
+    """Call flight.do() from a leader and followers sharing one key
+
+    The leader's computation finishes only once every follower waits for it,
+    so all of them are coalesced. Returns (results, errors, calls) per caller.
+    """
+    class Call(single_flight._Call):
+        def __init__(self):
+            super().__init__()
+            self.done = CountingEvent()
+
+    monkeypatch.setattr(single_flight, '_Call', Call)
+    flight = SingleFlight()
+    calls = []
+    leader_started = threading.Event()
+
+    def compute():
+        calls.append(1)
+        leader_started.set()
+        call = flight._calls['key']
+        for _ in range(followers):
+            assert call.done.waiters.acquire(timeout=5)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    results = [None] * (followers + 1)
+    errors = [None] * (followers + 1)
+
+    def caller(position):
+        try:
+            results[position] = flight.do('key', compute)
+        except Exception as e:
+            errors[position] = e
+
+    threads = [threading.Thread(target=caller, args=(0,))]
+    threads[0].start()
+    assert leader_started.wait(5)
+    threads += [threading.Thread(target=caller, args=(i,)) for i in range(1, followers + 1)]
+    for thread in threads[1:]:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    return results, errors, calls
+
+
+def test_followers_share_the_leaders_call_and_get_copies(monkeypatch):
+    results, errors, calls = run_concurrently(monkeypatch, {'rows': [1, 2]}, followers=3)
+
+    assert calls == [1]
+    assert errors == [None] * 4
+    assert all(result == {'rows': [1, 2]} for result in results)
+    assert len({id(result) for result in results}) == 4
+    results[1]['rows'].append(3)
+    assert results[0] == {'rows': [1, 2]}
+    assert results[2] == {'rows': [1, 2]}
+
+
+def test_followers_receive_the_leaders_exception(monkeypatch):
+    error = RuntimeError('upstream down')
+    results, errors, calls = run_concurrently(monkeypatch, error, followers=2)
+
+    assert calls == [1]
+    assert errors == [error] * 3
+
+
+def test_finished_calls_are_not_reused():
+    flight = SingleFlight()
+    assert flight.do('key', lambda: 1) == 1
+    assert flight.do('key', lambda: 2) == 2
+
+
+def test_coalesced_keeps_cache_info_of_the_wrapped_function():
+    @coalesced
+    @lru_cache(maxsize=8)
+    def square(x):
+        return x * x
+
+    assert square(3) == 9
+    assert square(3) == 9
+    assert square.cache_info().hits == 1
+
+
+def test_coalesced_reads_only_shares_get_methods():
+    class Backend:
+        def get_rows(self, day):
+            return [day]
+
+        def store_rows(self, rows):
+            return len(rows)
+
+    backend = Backend()
+    reads = CoalescedReads(backend, SingleFlight())
+    assert reads.get_rows(3) == [3]
+    assert reads.store_rows.__self__ is backend
@@ -0,0 +1,73 @@
+import json
+from datetime import timedelta
+
+import pytest
+
+from conftest import SNAPSHOTS, seed
+
+LATEST_VERSION = SNAPSHOTS[-1][0].isoformat()
+
+
+@pytest.fixture
+def client(make_client, seeded_sqlite_url):
+    # The listener polls SQLite for new snapshots every RESPONSE_CACHE_TTL seconds
+    return make_client(seeded_sqlite_url, RESPONSE_CACHE_TTL=0.01, STREAM_KEEPALIVE_INTERVAL=5)
+
+
+def open_stream(client, **headers):
+    response = client.get('/api/stream', headers=headers, buffered=False)
+    return response, iter(response.response)
+
+
+def parse_event(chunk):
+    fields = dict(line.split(': ', 1) for line in chunk.decode().strip().splitlines())
+    return fields['id'], json.loads(fields['data'])
+
+
+def test_current_wait_times(client):
+    response = client.get('/api/current')
+    assert response.status_code == 200
+    assert sorted(response.get_json(), key=lambda office: office['stadsloket_id']) == [
+        {'stadsloket_id': 5, 'loket_name': 'Centrum', 'wait_time': 15, 'people_waiting': 7},
+        {'stadsloket_id': 6, 'loket_name': 'Nieuw-West', 'wait_time': 0, 'people_waiting': 0},
+    ]
+    repeat = client.get('/api/current', headers={'If-None-Match': response.headers['ETag']})
+    assert repeat.status_code == 304
+
+
+def test_stream_sends_the_current_snapshot_then_new_ones(client, seeded_sqlite_url):
+    response, chunks = open_stream(client)
+    assert response.mimetype == 'text/event-stream'
+    assert next(chunks) == b'retry: 5000\n\n'
+    version, snapshot = parse_event(next(chunks))
+    assert version == LATEST_VERSION
+    assert snapshot == client.get('/api/current').get_json()
+
+    later = SNAPSHOTS[-1][0] + timedelta(minutes=10)
+    seed(seeded_sqlite_url, [(later, [{'id': 5, 'waiting': 9, 'waittime': '40 minuten'}])])
+    version, snapshot = parse_event(next(chunks))
+    assert version == later.isoformat()
+    assert {'stadsloket_id': 5, 'loket_name': 'Centrum', 'wait_time': 40, 'people_waiting': 9} in snapshot
+    response.close()
+
+
+def test_reconnecting_clients_skip_the_snapshot_they_have(make_client, seeded_sqlite_url):
+    client = make_client(seeded_sqlite_url, STREAM_KEEPALIVE_INTERVAL=0.01)
+    response, chunks = open_stream(client, **{'Last-Event-ID': LATEST_VERSION})
+    next(chunks)
+    assert next(chunks) == b': keep-alive\n\n'
+    response.close()
+
+
+def test_open_streams_are_capped(make_client, seeded_sqlite_url):
+    client = make_client(seeded_sqlite_url, STREAM_MAX_CLIENTS=1)
+    response, chunks = open_stream(client)
+    next(chunks)
+
+    refused = client.get('/api/stream')
+    assert refused.status_code == 503
+    # Closing the first stream frees its slot
+    response.close()
+    response, chunks = open_stream(client)
+    assert response.status_code == 200
+    response.close()
@@ -0,0 +1,97 @@
+from array import array
+
+import pytest
+
+from travel_time_grid import HEADER, NO_ROUTE, TravelTimeGrid, open_travel_time_grid, write_grid
+
+OFFICES = {
+    5: (52.3716, 4.8997, 'Amstel 1'),
+    6: (52.3587, 4.8680, 'Bos en Lommerplein 250'),
+}
+# South, west, lat_step, lon_step, rows, cols
+SHAPE = (52.30, 4.80, 0.01, 0.02, 2, 3)
+
+
+def grid_columns():
+    """Durations of 60 * (cell + office) seconds and distances of (cell + office) km"""
+    cells = SHAPE[4] * SHAPE[5]
+    durations = array('H', (60 * (cell + position + 1) for cell in range(cells) for position in range(2)))
+    distances = array('H', (100 * (cell + position + 1) for cell in range(cells) for position in range(2)))
+    return durations, distances
+
+
+@pytest.fixture
+def grid_path(tmp_path):
+    path = str(tmp_path / 'grid.bin')
+    durations, distances = grid_columns()
+    write_grid(path, OFFICES, SHAPE, durations, distances)
+    return path
+
+
+def test_round_trip(grid_path):
+    grid = open_travel_time_grid(grid_path, OFFICES)
+    try:
+        assert (grid.rows, grid.cols) == (2, 3)
+        # Row 1, column 2 is the last cell
+        assert grid.lookup(52.315, 4.85) == {
+            5: {'duration_minutes': 6, 'distance_km': 6.0},
+            6: {'duration_minutes': 7, 'distance_km': 7.0},
+        }
+        assert grid.lookup(52.301, 4.801)[5] == {'duration_minutes': 1, 'distance_km': 1.0}
+    finally:
+        grid.close()
+
+
+def test_locations_outside_the_grid(grid_path):
+    grid = TravelTimeGrid(grid_path)
+    try:
+        assert grid.lookup(52.29, 4.85) is None
+        assert grid.lookup(52.31, 4.87) is None
+    finally:
+        grid.close()
+
+
+@pytest.mark.parametrize('lat, lon', [
+    (float('nan'), 4.85),
+    (52.31, float('nan')),
+    (float('inf'), 4.85),
+    (52.31, float('-inf')),
+    (1e308, 4.85),
+])
+def test_non_finite_locations(grid_path, lat, lon):
+    grid = TravelTimeGrid(grid_path)
+    try:
+        assert grid.lookup(lat, lon) is None
+    finally:
+        grid.close()
+
+
+def test_cell_without_a_route(tmp_path):
+    path = str(tmp_path / 'grid.bin')
+    durations, distances = grid_columns()
+    durations[1] = NO_ROUTE
+    write_grid(path, OFFICES, SHAPE, durations, distances)
+    grid = TravelTimeGrid(path)
+    try:
+        assert grid.lookup(52.301, 4.801) is None
+        assert grid.lookup(52.301, 4.821) is not None
+    finally:
+        grid.close()
+
+
+def test_grid_for_other_offices_is_not_used(grid_path):
+    moved = {**OFFICES, 6: (52.36, 4.87, 'Elsewhere')}
+    assert open_travel_time_grid(grid_path, moved) is None
+
+
+def test_missing_file(tmp_path):
+    assert open_travel_time_grid(str(tmp_path / 'missing.bin'), OFFICES) is None
+
+
+@pytest.mark.parametrize('size', [0, 3, HEADER.size + 5, HEADER.size + 40 + 6, -2])
+def test_truncated_file_is_unreadable(grid_path, size):
+    with open(grid_path, 'rb') as f:
+        data = f.read()
+    with open(grid_path, 'wb') as f:
+        f.write(data[:size])
+    assert open_travel_time_grid(grid_path, OFFICES) is None
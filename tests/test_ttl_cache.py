@@ -0,0 +1,82 @@
+import ttl_cache
+from ttl_cache import TTLCache, approximate_size
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(ttl_cache.time, 'monotonic', clock)
+    cache = TTLCache(ttl=60)
+    cache.set('key', 'value')
+
+    clock.now += 59
+    assert cache.get('key') == (True, 'value')
+    clock.now += 2
+    assert cache.get('key') == (False, None)
+    assert cache.info().currsize == 0
+    assert cache.info().bytes == 0
+
+
+def test_least_recently_used_entries_are_evicted_beyond_max_bytes():
+    value = 'x' * 1000
+    entry_size = approximate_size('a') + approximate_size(value)
+    cache = TTLCache(ttl=60, max_bytes=2 * entry_size)
+    cache.set('a', value)
+    cache.set('b', value)
+    cache.get('a')
+    cache.set('c', value)
+
+    assert cache.get('b') == (False, None)
+    assert cache.get('a') == (True, value)
+    assert cache.get('c') == (True, value)
+    assert cache.info().bytes == 2 * entry_size
+
+
+def test_entries_beyond_max_entries_are_evicted():
+    cache = TTLCache(ttl=60, max_entries=2)
+    for key in 'abc':
+        cache.set(key, key)
+    assert cache.get('a') == (False, None)
+    assert cache.info().currsize == 2
+
+
+def test_value_larger_than_max_bytes_is_not_stored():
+    cache = TTLCache(ttl=60, max_bytes=100)
+    cache.set('key', 'x' * 1000)
+    assert cache.get('key') == (False, None)
+    assert cache.info().bytes == 0
+
+
+def test_replacing_an_entry_does_not_count_its_bytes_twice():
+    cache = TTLCache(ttl=60)
+    cache.set('key', 'value')
+    size = cache.info().bytes
+    cache.set('key', 'value')
+    assert cache.info().bytes == size
+
+
+def test_decorator_skips_results_rejected_by_should_cache():
+    calls = []
+
+    @ttl_cache.ttl_cache(60, should_cache=lambda result: result is not None)
+    def lookup(name, fail=False):
+        calls.append(name)
+        return None if fail else name.upper()
+
+    assert lookup('a') == 'A'
+    assert lookup('a') == 'A'
+    assert lookup('b', fail=True) is None
+    assert lookup('b', fail=True) is None
+    assert calls == ['a', 'b', 'b']
+
+    info = lookup.cache_info()
+    assert (info.hits, info.misses, info.currsize) == (1, 3, 1)
+    lookup.cache_clear()
+    assert lookup.cache_info().currsize == 0
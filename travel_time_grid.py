@@ -0,0 +1,257 @@
+"""Precomputed cycling times from every cell of a grid over Amsterdam to each office.
+
+The grid covers the municipality's bounding box in square cells (250 m by
+default). For each cell centre the build job asks OpenRouteService's matrix
+endpoint for the cycling duration and distance to every office, many cells
+per request, and writes them to a compact little-endian file:
+
+    magic 'TTGR' | version u16 | office count u16
+    south, west, lat_step, lon_step f64 | rows, cols u32
+    offices  (id u32, lat i32, lon i32 in 1e-7 degrees)[office count]
+    durations u16[rows * cols * office count]   seconds, 0xFFFF without route
+    distances u16[rows * cols * office count]   tens of metres, 0xFFFF without route
+
+The web workers memory-map it and answer a location with one index
+computation. Build it (this takes a few minutes within the free ORS
+matrix quota) and restart the workers:
+
+    python travel_time_grid.py --cell-size 250
+"""
+import argparse
+import logging
+import math
+import mmap
+import os
+import struct
+import sys
+import time
+from array import array
+
+from dotenv import load_dotenv
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'TTGR'
+VERSION = 1
+HEADER = struct.Struct('<4sHH')
+GRID = struct.Struct('<ddddII')
+OFFICE = struct.Struct('<Iii')
+NO_ROUTE = 0xFFFF
+COORDINATE_SCALE = 10_000_000
+# Distances are stored in units of this many metres
+DISTANCE_UNIT = 10
+METERS_PER_DEGREE_LAT = 111_320
+
+# South, west, north and east edge of the municipality of Amsterdam
+AMSTERDAM_BOUNDS = (52.278, 4.728, 52.431, 5.079)
+DEFAULT_CELL_SIZE = 250
+# Cells per matrix request; ORS allows 3500 routes per request on the free plan
+DEFAULT_BATCH_SIZE = 100
+# ORS allows 40 matrix requests per minute on the free plan
+DEFAULT_REQUEST_RATE = 0.6
+
+
+def little_endian(values):
+    if sys.byteorder != 'little':
+        values.byteswap()
+    return values.tobytes()
+
+
+def grid_shape(bounds, cell_size):
+    """(south, west, lat_step, lon_step, rows, cols) of cell_size metre cells covering bounds"""
+    south, west, north, east = bounds
+    lat_step = cell_size / METERS_PER_DEGREE_LAT
+    lon_step = cell_size / (METERS_PER_DEGREE_LAT * math.cos(math.radians((south + north) / 2)))
+    rows = math.ceil((north - south) / lat_step)
+    cols = math.ceil((east - west) / lon_step)
+    return south, west, lat_step, lon_step, rows, cols
+
+
+def compute_grid(offices, request_matrix, bounds=AMSTERDAM_BOUNDS, cell_size=DEFAULT_CELL_SIZE,
+                 batch_size=DEFAULT_BATCH_SIZE, rate=DEFAULT_REQUEST_RATE):
+    """Route every cell centre to every office
+
+    Args:
+        offices: office_id -> (lat, lon, ...) like AMSTERDAM_OFFICES
+        request_matrix: Callable taking a list of (lat, lon) origins and
+            returning, per origin, office_id -> (duration_seconds, distance_meters)
+            with None values for missing routes (location_service.request_cycling_matrix)
+
+    Returns:
+        tuple: (shape, durations, distances) ready for write_grid()
+    """
+    shape = grid_shape(bounds, cell_size)
+    south, west, lat_step, lon_step, rows, cols = shape
+    office_ids = list(offices)
+    durations = array('H', [NO_ROUTE]) * (rows * cols * len(office_ids))
+    distances = array('H', [NO_ROUTE]) * (rows * cols * len(office_ids))
+    cells = [(row, col) for row in range(rows) for col in range(cols)]
+    logger.info(f"Routing {len(cells)} cells ({rows} x {cols}) to {len(office_ids)} offices")
+
+    last_request = [0.0]
+
+    def throttled(origins):
+        time.sleep(max(0.0, last_request[0] + 1 / rate - time.monotonic()))
+        last_request[0] = time.monotonic()
+        return request_matrix(origins)
+
+    def store(cell, routes):
+        row, col = cell
+        base = (row * cols + col) * len(office_ids)
+        for position, office_id in enumerate(office_ids):
+            duration, distance = routes.get(office_id, (None, None))
+            if duration is not None and distance is not None:
+                durations[base + position] = min(round(duration), NO_ROUTE - 1)
+                distances[base + position] = min(round(distance / DISTANCE_UNIT), NO_ROUTE - 1)
+
+    unroutable = 0
+    for start in range(0, len(cells), batch_size):
+        batch = cells[start:start + batch_size]
+        origins = [(south + (row + 0.5) * lat_step, west + (col + 0.5) * lon_step) for row, col in batch]
+        try:
+            results = throttled(origins)
+        except Exception as e:
+            # One origin ORS cannot snap to (water, no roads) fails the whole
+            # request; retry the cells one by one and skip the failing ones
+            logger.warning(f"Batch at cell {start} failed ({e}), retrying its cells one by one")
+            results = []
+            for origin in origins:
+                try:
+                    results.append(throttled([origin])[0])
+                except Exception:
+                    results.append({})
+        for cell, routes in zip(batch, results):
+            unroutable += not routes
+            store(cell, routes)
+        logger.info(f"{min(start + batch_size, len(cells))}/{len(cells)} cells routed")
+
+    logger.info(f"{unroutable} cells without any route")
+    return shape, durations, distances
+
+
+def write_grid(path, offices, shape, durations, distances):
+    """Write a grid computed by compute_grid(); replaced atomically like the postcode index"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path + '.tmp', 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(offices)))
+        f.write(GRID.pack(*shape))
+        for office_id, (lat, lon, *_) in offices.items():
+            f.write(OFFICE.pack(office_id, round(lat * COORDINATE_SCALE), round(lon * COORDINATE_SCALE)))
+        f.write(little_endian(durations))
+        f.write(little_endian(distances))
+    os.replace(path + '.tmp', path)
+
+
+class TravelTimeGrid:
+    """Read-only, memory-mapped view of a grid file written by write_grid()"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, version, office_count = HEADER.unpack_from(self._mmap)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"{path} is not a version {VERSION} travel time grid")
+            self.south, self.west, self.lat_step, self.lon_step, self.rows, self.cols = \
+                GRID.unpack_from(self._mmap, HEADER.size)
+            offset = HEADER.size + GRID.size
+            self.offices = {}
+            for _ in range(office_count):
+                office_id, lat, lon = OFFICE.unpack_from(self._mmap, offset)
+                self.offices[office_id] = (lat / COORDINATE_SCALE, lon / COORDINATE_SCALE)
+                offset += OFFICE.size
+            size = self.rows * self.cols * office_count
+            if len(self._mmap) != offset + 4 * size:
+                raise ValueError(f"{path} is truncated")
+        except (ValueError, struct.error):
+            self._mmap.close()
+            raise
+        self._office_ids = list(self.offices)
+        self._durations = self._column(offset, size)
+        self._distances = self._column(offset + 2 * size, size)
+
+    def _column(self, start, size):
+        view = memoryview(self._mmap)[start:start + 2 * size]
+        if sys.byteorder == 'little':
+            return view.cast('H')
+        values = array('H', view)
+        values.byteswap()
+        return values
+
+    def matches(self, offices):
+        """Whether the grid was computed for these office ids and locations"""
+        return self.offices == {office_id: (round(lat * COORDINATE_SCALE) / COORDINATE_SCALE,
+                                            round(lon * COORDINATE_SCALE) / COORDINATE_SCALE)
+                                for office_id, (lat, lon, *_) in offices.items()}
+
+    def lookup(self, lat, lon):
+        """Travel info per office from the cell containing (lat, lon)
+
+        Returns:
+            dict: office_id -> {'duration_minutes', 'distance_km'}, or None when
+            the location is outside the grid or its cell lacks a route to an office
+        """
+        row = (lat - self.south) / self.lat_step
+        col = (lon - self.west) / self.lon_step
+        # Checked before flooring: NaN fails every comparison, and math.floor
+        # raises on the infinities that huge or infinite coordinates give
+        if not (0 <= row < self.rows and 0 <= col < self.cols):
+            return None
+        base = (math.floor(row) * self.cols + math.floor(col)) * len(self._office_ids)
+        result = {}
+        for position, office_id in enumerate(self._office_ids):
+            duration = self._durations[base + position]
+            distance = self._distances[base + position]
+            if duration == NO_ROUTE or distance == NO_ROUTE:
+                return None
+            result[office_id] = {
+                'duration_minutes': round(duration / 60),
+                'distance_km': round(distance * DISTANCE_UNIT / 1000, 1)
+            }
+        return result
+
+    def close(self):
+        for column in (self._durations, self._distances):
+            if isinstance(column, memoryview):
+                column.release()
+        self._mmap.close()
+
+
+def open_travel_time_grid(path, offices):
+    """Open the grid at path; None when it is missing, unreadable or made for other offices"""
+    if not os.path.exists(path):
+        logger.info(f"No travel time grid at {path}, routing every location live")
+        return None
+    try:
+        grid = TravelTimeGrid(path)
+    except (OSError, ValueError, struct.error) as e:
+        logger.error(f"Could not open travel time grid {path}: {e}")
+        return None
+    if not grid.matches(offices):
+        logger.error(f"Travel time grid {path} was computed for other office locations, rebuild it")
+        grid.close()
+        return None
+    logger.info(f"Loaded travel time grid of {grid.rows} x {grid.cols} cells from {path}")
+    return grid
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+    load_dotenv()
+    from location_service import AMSTERDAM_OFFICES, ORS_API_KEY, TRAVEL_TIME_GRID_PATH, request_cycling_matrix
+
+    parser = argparse.ArgumentParser(description="Precompute cycling times from a grid over Amsterdam to every office")
+    parser.add_argument('--cell-size', type=float, default=DEFAULT_CELL_SIZE, help="Cell edge in metres")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help="Cells per ORS matrix request")
+    parser.add_argument('--rate', type=float, default=DEFAULT_REQUEST_RATE, help="ORS requests per second")
+    parser.add_argument('--output', default=TRAVEL_TIME_GRID_PATH)
+    args = parser.parse_args()
+
+    if not ORS_API_KEY:
+        parser.error("ORS_API_KEY is not set")
+    shape, durations, distances = compute_grid(AMSTERDAM_OFFICES, request_cycling_matrix,
+                                               cell_size=args.cell_size, batch_size=args.batch_size,
+                                               rate=args.rate)
+    write_grid(args.output, AMSTERDAM_OFFICES, shape, durations, distances)
+    logger.info(f"Wrote {args.output} ({os.path.getsize(args.output)} bytes)")
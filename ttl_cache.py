@@ -0,0 +1,107 @@
+import functools
+import sys
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'maxsize', 'currsize', 'bytes', 'max_bytes'])
+
+
+def approximate_size(value):
+    """Rough memory footprint of a result built from dicts, lists, tuples and scalars"""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(approximate_size(k) + approximate_size(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple)):
+        size += sum(approximate_size(item) for item in value)
+    return size
+
+
+class TTLCache:
+    """Results keyed by call arguments, each valid for ttl seconds
+
+    Least recently used entries are evicted once there are more than
+    max_entries of them or their approximate size exceeds max_bytes, so a
+    few long route geometries cannot crowd out memory the way a plain
+    entry count would allow.
+    """
+
+    def __init__(self, ttl, max_entries=4096, max_bytes=16 * 1024 * 1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._bytes = 0
+        # key -> (expires_at, size, value), least recently used first
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return (True, value) for a live entry, else (False, None)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, entry[2]
+            if entry is not None:
+                self._remove(key)
+            self.misses += 1
+            return False, None
+
+    def set(self, key, value):
+        size = approximate_size(key) + approximate_size(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl, size, value)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def info(self):
+        with self._lock:
+            return CacheInfo(self.hits, self.misses, self.max_entries, len(self._entries),
+                             self._bytes, self.max_bytes)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self.hits = self.misses = 0
+
+
+def ttl_cache(ttl, max_entries=4096, max_bytes=16 * 1024 * 1024, should_cache=None):
+    """Decorator memoizing a function for ttl seconds, like functools.lru_cache with expiry
+
+    Arguments must be hashable. should_cache(result) may reject results that
+    must not be reused, such as failed upstream calls. The wrapper has
+    cache_info() and cache_clear() like lru_cache; cache_info() also reports
+    the approximate bytes held.
+    """
+    def decorator(func):
+        cache = TTLCache(ttl, max_entries, max_bytes)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = (args, tuple(sorted(kwargs.items())))
+            found, value = cache.get(key)
+            if found:
+                return value
+            value = func(*args, **kwargs)
+            if should_cache is None or should_cache(value):
+                cache.set(key, value)
+            return value
+
+        wrapper.cache_info = cache.info
+        wrapper.cache_clear = cache.clear
+        return wrapper
+
+    return decorator
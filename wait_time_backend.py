@@ -0,0 +1,243 @@
+import os
+import re
+from datetime import datetime
+
+import pytz
+import requests
+
+# Source of the live wait times; overridable to point at a stand-in, e.g. in benchmarks
+WAIT_TIMES_SITE_URL = os.getenv('WAIT_TIMES_SITE_URL', 'https://wachttijdenamsterdam.nl')
+
+
+def is_sqlite_url(config):
+    """Whether a connection string points at an embedded SQLite database"""
+    return isinstance(config, str) and config.startswith('sqlite:')
+
+
+class WaitTimeBackend:
+    """Storage-independent part of the wait time library
+
+    WaitTimeLib (PostgreSQL) and SQLiteWaitTimeLib (embedded file) share the
+    scraping, parsing and result formatting defined here, and implement the
+    storage methods below with their own SQL.
+    """
+
+    timezone = pytz.timezone('Europe/Amsterdam')
+
+    # ------------------------------------------------------------------
+    # Storage methods every backend implements
+    # ------------------------------------------------------------------
+
+    def create_table(self):
+        raise NotImplementedError
+
+    def upgrade_schema(self):
+        """Bring an existing database up to date; backends without migrations just create tables"""
+        self.create_table()
+
+    def ensure_partitions(self, months_ahead=2, since=None):
+        raise NotImplementedError
+
+    def compact_history(self, older_than_months):
+        raise NotImplementedError
+
+    def rebuild_hourly_stats(self):
+        raise NotImplementedError
+
+    def rebuild_current_wait_times(self):
+        raise NotImplementedError
+
+    def rebuild_wait_statistics(self):
+        raise NotImplementedError
+
+    def store_snapshots(self, snapshots, page_size=5000):
+        raise NotImplementedError
+
+    def store_loket_names(self, names):
+        raise NotImplementedError
+
+    def get_mean_wait_times(self):
+        raise NotImplementedError
+
+    def get_wait_statistics(self):
+        raise NotImplementedError
+
+    def iter_raw_data(self, stadsloket_id=None, start=None, end=None, fetch_size=2000):
+        raise NotImplementedError
+
+    def get_current_waiting(self):
+        raise NotImplementedError
+
+    def get_hourly_averages(self, day_of_week=None):
+        raise NotImplementedError
+
+    def get_weekly_hourly_averages(self):
+        raise NotImplementedError
+
+    def get_last_update_time(self):
+        raise NotImplementedError
+
+    def get_postcode_coordinates(self, postcode):
+        raise NotImplementedError
+
+    def get_geocoded_postcodes(self, negative_since=None):
+        raise NotImplementedError
+
+    def get_stored_postcode_coordinates(self):
+        raise NotImplementedError
+
+    def store_postcode_coordinates(self, rows):
+        raise NotImplementedError
+
+    def close(self):
+        raise NotImplementedError
+
+    # ------------------------------------------------------------------
+    # Shared behaviour
+    # ------------------------------------------------------------------
+
+    def fetch_data(self):
+        response = requests.get(f'{WAIT_TIMES_SITE_URL}/data/')
+        return response.json()
+
+    def parse_waittime(self, waittime_str):
+        if not waittime_str or waittime_str.lower().startswith('geen'):
+            return 0
+        if 'uur' in waittime_str.lower():
+            return 70
+        # Remove ' minuten'
+        numeric = ''.join([c for c in waittime_str if c.isdigit()])
+        if numeric.isdigit():
+            val = int(numeric)
+            return val if val <= 60 else 70
+        return 0
+
+    def store_data(self, data, snapshot_time=None):
+        """Store one snapshot of all offices, stamped with a single shared timestamp
+
+        Args:
+            data (list): Entries from fetch_data() with 'id', 'waiting' and 'waittime'
+            snapshot_time (datetime, optional): Defaults to now in Amsterdam time
+        """
+        if snapshot_time is None:
+            snapshot_time = datetime.now(self.timezone)
+        return self.store_snapshots([(snapshot_time, data)])
+
+    def snapshot_rows(self, snapshots):
+        """Flatten (snapshot_time, data) pairs into (id, waiting, minutes, timestamp) rows"""
+        return [
+            (entry['id'], entry['waiting'], self.parse_waittime(entry['waittime']), snapshot_time)
+            for snapshot_time, data in snapshots
+            for entry in data
+        ]
+
+    def fetch_loket_names(self):
+        # Retrieve the main page HTML
+        page_response = requests.get(WAIT_TIMES_SITE_URL)
+        page_html = page_response.text
+        # Simple regular expression to capture (stadsloket name) + (id from nfwrtXX)
+        # Each row has the pattern: <td data-title="Stadsloket">\s*(.*?)</td> ... id="nfwrtY"
+        matches = re.findall(r'<td data-title="Stadsloket">\s*(.*?)</td>.*?id="nfwrt(\d+)"',
+                             page_html, flags=re.DOTALL)
+        self.store_loket_names([(int(loket_id), name.strip()) for name, loket_id in matches])
+
+    def get_raw_data(self):
+        """Return every raw sample still in wait_times (compacted history lives in wait_times_hourly)"""
+        return list(self.iter_raw_data())
+
+    def format_wait_statistics(self, rows):
+        """Shape (id, name, window, count, sums...) rows into get_wait_statistics() dicts"""
+
+        def describe(count, total, squares):
+            if not count:
+                return None, None
+            mean = float(total) / float(count)
+            variance = max(float(squares) / float(count) - mean * mean, 0)
+            return round(mean, 1), round(variance ** 0.5, 1)
+
+        empty = {'samples': 0, 'mean_waiting': None, 'stddev_waiting': None,
+                 'mean_waittime': None, 'stddev_waittime': None}
+        results = {}
+        for (sid, name, window, count, waiting_sum, waiting_sq_sum,
+             waittime_sum, waittime_sq_sum) in rows:
+            office = results.setdefault(sid, {
+                'stadsloket_id': sid,
+                'loket_name': name or 'Unknown',
+                'all_time': dict(empty),
+                'last_30_days': dict(empty),
+                'last_7_days': dict(empty)
+            })
+            mean_waiting, stddev_waiting = describe(count, waiting_sum, waiting_sq_sum)
+            mean_waittime, stddev_waittime = describe(count, waittime_sum, waittime_sq_sum)
+            office[window] = {
+                'samples': int(count or 0),
+                'mean_waiting': mean_waiting,
+                'stddev_waiting': stddev_waiting,
+                'mean_waittime': mean_waittime,
+                'stddev_waittime': stddev_waittime
+            }
+        return sorted(results.values(), key=lambda office: office['stadsloket_id'])
+
+    def format_hourly_averages(self, rows, day_of_week):
+        """Shape (id, name, hour, average) rows into the get_hourly_averages() chart data"""
+        results = {}
+        # Extended hours range to cover all possible opening hours (8:00 to 20:00)
+        hours = list(range(8, 21))  # 8:00 to 20:00
+
+        for stadsloket_id, loket_name, hour, avg_waittime in rows:
+            hour = int(hour)  # Convert from Decimal to int
+            if loket_name not in results:
+                results[loket_name or f'Unknown-{stadsloket_id}'] = {
+                    'label': loket_name or f'Unknown-{stadsloket_id}',
+                    'data': [0] * len(hours)
+                }
+            try:
+                hour_index = hours.index(hour)
+                results[loket_name or f'Unknown-{stadsloket_id}']['data'][hour_index] = round(float(avg_waittime or 0), 1)
+            except (ValueError, IndexError):
+                pass
+
+        # Return formatted data for chart
+        return {
+            'labels': [f"{h}:00" for h in hours],
+            'datasets': list(results.values()),
+            'day_of_week': day_of_week
+        }
+
+    def format_weekly_hourly_averages(self, rows):
+        """Split (day_of_week, id, name, hour, average) rows into one chart per weekday"""
+        by_day = {day: [] for day in range(7)}
+        for day_of_week, stadsloket_id, loket_name, hour, avg_waittime in rows:
+            by_day[int(day_of_week)].append((stadsloket_id, loket_name, hour, avg_waittime))
+        return {day: self.format_hourly_averages(day_rows, day) for day, day_rows in by_day.items()}
+
+    def get_opening_hours(self, day_of_week):
+        """Get opening hours based on day of week
+
+        Args:
+            day_of_week (int): Day of week (0=Sunday, 1=Monday, ..., 6=Saturday)
+
+        Returns:
+            tuple: (opening_hour, closing_hour)
+        """
+        # Make sure day_of_week is an integer
+        day = int(day_of_week) if day_of_week is not None else 0
+
+        # Explicit mapping for clarity
+        if day == 0:  # Sunday
+            return (0, 0)  # Closed
+        elif day == 1:  # Monday
+            return (9, 17)
+        elif day == 2:  # Tuesday
+            return (9, 17)
+        elif day == 3:  # Wednesday
+            return (9, 17)
+        elif day == 4:  # Thursday - extended hours
+            return (9, 20)
+        elif day == 5:  # Friday
+            return (9, 17)
+        elif day == 6:  # Saturday
+            return (0, 0)  # Closed
+        else:
+            # Default fallback
+            return (9, 17)
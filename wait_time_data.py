@@ -1,14 +1,27 @@
-import requests
 import psycopg2
 from psycopg2 import sql
-from psycopg2.extras import DictCursor
-import re
-from datetime import datetime
-import pytz
+from psycopg2.extras import DictCursor, execute_values
+import uuid
 from urllib.parse import urlparse
 
+from db_pool import ReplicaSet
+from snapshot_stream import SNAPSHOT_CHANNEL
+from wait_time_backend import WaitTimeBackend, is_sqlite_url
+from wait_time_sqlite import SQLiteWaitTimeLib, sqlite_path
+
+# wait_times.waittime as minutes on databases that still store it as text,
+# before migrations/convert_waittime_to_smallint.py has run
+LEGACY_WAITTIME_SQL = "NULLIF(regexp_replace(waittime, '[^0-9]', '', 'g'), '')::integer::smallint"
+
+# Appended to the ingest statement; identical notifications within one
+# transaction are delivered once, however many pages a backfill takes
+NOTIFY_SNAPSHOT_SQL = f"SELECT pg_notify('{SNAPSHOT_CHANNEL}', '')"
+
 def create_database(config):
     """Connect to PostgreSQL database using dict config or connection string."""
+    if is_sqlite_url(config):
+        # Embedded database file, created on first connect
+        return {'path': sqlite_path(config)}
     if isinstance(config, dict):
         # Dictionary configuration
         required_keys = ['host', 'user', 'password', 'database']
@@ -32,9 +45,46 @@ def create_database(config):
     else:
         raise ValueError("Config must be a dictionary or connection string")
 
-class WaitTimeLib:
-    def __init__(self, config):
-        """Initialize database connection from config dict or connection string"""
+class WaitTimeLib(WaitTimeBackend):
+    """PostgreSQL backend, used by the web app and the collectors in production"""
+
+    def __init__(self, config=None, pool=None, create_tables=True, replicas=None):
+        """Initialize database connection from config dict or connection string
+
+        Args:
+            config: Connection string or dict, used to open a dedicated connection
+            pool (WaitTimePool, optional): Borrow a connection from this pool instead.
+                                           Pooled connections already have their
+                                           session timezone set, and are only
+                                           borrowed once a query needs the primary.
+            create_tables (bool): Run the schema DDL on start-up. Long-lived
+                                  callers set up the schema once and pass False.
+            replicas (optional): ReplicaSet, or one or more read-replica connection
+                                 strings. get_* queries go to a replica within the
+                                 lag bound; writes always use the primary.
+        """
+        self.pool = pool
+        # Replicas given as connection strings are only used by this instance
+        self._owns_replicas = isinstance(replicas, (str, list, tuple))
+        if self._owns_replicas:
+            replicas = ReplicaSet.from_urls(replicas, minconn=0, maxconn=1)
+        self.replicas = replicas
+        self._db = None
+        self._cursor = None
+        self._read_pool = None
+        self._read_db = None
+        self._read_cursor = None
+        self._replica_checked = False
+
+        if pool is not None:
+            if create_tables:
+                try:
+                    self.create_table()
+                except Exception:
+                    self.close()
+                    raise
+            return
+
         if isinstance(config, str):
             self.connection_string = config
             self.db = psycopg2.connect(config)
@@ -63,23 +113,368 @@ class WaitTimeLib:
         self.cursor = self.db.cursor()
         # Set PostgreSQL session timezone to Amsterdam
         self.cursor.execute("SET timezone = 'Europe/Amsterdam';")
-        
-        self.timezone = pytz.timezone('Europe/Amsterdam')
-        self.create_table()
+
+        if create_tables:
+            self.create_table()
+
+    @property
+    def db(self):
+        """Primary connection, borrowed from the pool on first use"""
+        if self._db is None and self.pool is not None:
+            self._db = self.pool.getconn()
+            self._db.autocommit = False
+        return self._db
+
+    @db.setter
+    def db(self, value):
+        self._db = value
+
+    @property
+    def cursor(self):
+        """Cursor on the primary connection"""
+        if self._cursor is None and self.db is not None:
+            self._cursor = self.db.cursor()
+        return self._cursor
+
+    @cursor.setter
+    def cursor(self, value):
+        self._cursor = value
+
+    @property
+    def read_db(self):
+        """Connection for read queries: a fresh-enough replica, otherwise the primary"""
+        if not self._replica_checked and self.replicas is not None:
+            self._replica_checked = True
+            self._read_pool, self._read_db = self.replicas.getconn()
+            if self._read_db is not None:
+                self._read_db.autocommit = False
+        return self._read_db if self._read_db is not None else self.db
+
+    @property
+    def read_cursor(self):
+        """Cursor for read queries, see read_db"""
+        if self.read_db is not self._read_db:
+            return self.cursor
+        if self._read_cursor is None:
+            self._read_cursor = self._read_db.cursor()
+        return self._read_cursor
         
     def create_table(self):
         self.cursor.execute("""
+        -- Raw samples, range-partitioned by month (see ensure_partitions()).
+        -- Widest columns first so rows need no alignment padding
         CREATE TABLE IF NOT EXISTS wait_times (
-            id SERIAL PRIMARY KEY,
+            timestamp TIMESTAMP WITH TIME ZONE NOT NULL,
+            id SERIAL,
             stadsloket_id INTEGER NOT NULL,
             waiting INTEGER,
-            waittime VARCHAR(255),
-            timestamp TIMESTAMP WITH TIME ZONE
+            waittime SMALLINT,
+            PRIMARY KEY (id, timestamp)
+        ) PARTITION BY RANGE (timestamp);
+        CREATE INDEX IF NOT EXISTS idx_stadsloket_id ON wait_times(stadsloket_id, timestamp);
+
+        -- Hourly aggregates of raw samples that compact_history() moved out of wait_times
+        CREATE TABLE IF NOT EXISTS wait_times_hourly (
+            hour_start TIMESTAMP WITH TIME ZONE NOT NULL,
+            stadsloket_id INTEGER NOT NULL,
+            sample_count INTEGER NOT NULL,
+            waiting_sum BIGINT NOT NULL,
+            waittime_sum BIGINT NOT NULL,
+            waittime_max SMALLINT,
+            waiting_sq_sum BIGINT,
+            waittime_sq_sum BIGINT,
+            PRIMARY KEY (stadsloket_id, hour_start)
         );
-        CREATE INDEX IF NOT EXISTS idx_stadsloket_id ON wait_times(stadsloket_id);
+
+        CREATE TABLE IF NOT EXISTS loket_names (
+            stadsloket_id INTEGER NOT NULL PRIMARY KEY,
+            loket_name VARCHAR(255)
+        );
+
+        -- Running per-office totals by Amsterdam weekday/hour, kept up to date by store_data()
+        CREATE TABLE IF NOT EXISTS hourly_wait_stats (
+            stadsloket_id INTEGER NOT NULL,
+            day_of_week SMALLINT NOT NULL,
+            hour SMALLINT NOT NULL,
+            waittime_sum BIGINT NOT NULL DEFAULT 0,
+            sample_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (stadsloket_id, day_of_week, hour)
+        );
+
+        -- Latest sample per office, upserted by store_data()
+        CREATE TABLE IF NOT EXISTS current_wait_times (
+            stadsloket_id INTEGER NOT NULL PRIMARY KEY,
+            waiting INTEGER,
+            waittime SMALLINT,
+            timestamp TIMESTAMP WITH TIME ZONE NOT NULL
+        );
+
+        -- Running per-office count, sums and sums of squares, kept up to date by store_data()
+        CREATE TABLE IF NOT EXISTS wait_stats_totals (
+            stadsloket_id INTEGER NOT NULL PRIMARY KEY,
+            sample_count BIGINT NOT NULL DEFAULT 0,
+            waiting_sum BIGINT NOT NULL DEFAULT 0,
+            waiting_sq_sum BIGINT NOT NULL DEFAULT 0,
+            waittime_sum BIGINT NOT NULL DEFAULT 0,
+            waittime_sq_sum BIGINT NOT NULL DEFAULT 0
+        );
+
+        -- The same statistics per office and Amsterdam calendar day, for rolling windows
+        CREATE TABLE IF NOT EXISTS wait_stats_daily (
+            stadsloket_id INTEGER NOT NULL,
+            day DATE NOT NULL,
+            sample_count INTEGER NOT NULL DEFAULT 0,
+            waiting_sum BIGINT NOT NULL DEFAULT 0,
+            waiting_sq_sum BIGINT NOT NULL DEFAULT 0,
+            waittime_sum BIGINT NOT NULL DEFAULT 0,
+            waittime_sq_sum BIGINT NOT NULL DEFAULT 0,
+            PRIMARY KEY (stadsloket_id, day)
+        );
+
+        -- Geocoded PC6 postcodes shared by all web workers; NULL coordinates
+        -- record a postcode Nominatim does not know
+        CREATE TABLE IF NOT EXISTS postcode_coordinates (
+            postcode CHAR(6) NOT NULL PRIMARY KEY,
+            lat DOUBLE PRECISION,
+            lon DOUBLE PRECISION,
+            looked_up_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+        );
+        """)
+        self.db.commit()
+
+        self.ensure_partitions()
+
+    def upgrade_schema(self):
+        """Create missing tables, add columns newer versions need and seed empty derived tables
+
+        Run by `maintenance.py migrate` when deploying, not on every start-up:
+        ALTER TABLE takes an ACCESS EXCLUSIVE lock that blocks dashboard reads.
+        """
+        self.create_table()
+        # Hours compacted before the variance statistics existed have NULL squares
+        self.cursor.execute("""
+            ALTER TABLE wait_times_hourly
+                ADD COLUMN IF NOT EXISTS waiting_sq_sum BIGINT,
+                ADD COLUMN IF NOT EXISTS waittime_sq_sum BIGINT
         """)
         self.db.commit()
 
+        # Seed derived tables the first time they are created on an existing database
+        self.cursor.execute("""
+            SELECT NOT EXISTS (SELECT 1 FROM hourly_wait_stats),
+                   NOT EXISTS (SELECT 1 FROM current_wait_times),
+                   NOT EXISTS (SELECT 1 FROM wait_stats_totals),
+                   EXISTS (SELECT 1 FROM wait_times)
+        """)
+        hourly_empty, current_empty, stats_empty, has_history = self.cursor.fetchone()
+        if has_history and hourly_empty:
+            self.rebuild_hourly_stats()
+        if has_history and current_empty:
+            self.rebuild_current_wait_times()
+        if has_history and stats_empty:
+            self.rebuild_wait_statistics()
+
+    def is_partitioned(self):
+        """Whether wait_times is the month-partitioned table (see migrations/partition_wait_times.py)"""
+        self.cursor.execute("""
+            SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'wait_times'::regclass)
+        """)
+        return self.cursor.fetchone()[0]
+
+    def ensure_partitions(self, months_ahead=2, since=None):
+        """Create monthly wait_times partitions from the current month up to months_ahead
+
+        Args:
+            months_ahead (int): Number of future months to prepare
+            since (datetime, optional): Also create partitions back to this month,
+                                        e.g. before a backfill of historical data
+
+        Returns:
+            list: Names of the partitions that were created
+        """
+        if not self.is_partitioned():
+            return []
+
+        # Month boundaries in Amsterdam local time (the session timezone)
+        self.cursor.execute("""
+            SELECT month_start, month_start + INTERVAL '1 month'
+            FROM generate_series(date_trunc('month', LEAST(COALESCE(%s, NOW()), NOW())),
+                                 date_trunc('month', NOW()) + %s * INTERVAL '1 month',
+                                 INTERVAL '1 month') AS month_start
+        """, (since, months_ahead))
+        created = []
+        for month_start, month_end in self.cursor.fetchall():
+            name = f"wait_times_{month_start:%Y_%m}"
+            # Only take the parent-table lock when something actually needs creating
+            self.cursor.execute("SELECT to_regclass(%s)", (name,))
+            if self.cursor.fetchone()[0] is not None:
+                continue
+            self.cursor.execute(
+                sql.SQL("CREATE TABLE IF NOT EXISTS {} PARTITION OF wait_times FOR VALUES FROM (%s) TO (%s)")
+                .format(sql.Identifier(name)),
+                (month_start, month_end))
+            created.append(name)
+        self.db.commit()
+        return created
+
+    def compact_history(self, older_than_months):
+        """Downsample raw partitions older than the retention window into wait_times_hourly
+
+        Each monthly partition that ends before the cutoff is aggregated per office
+        and hour, and dropped in the same transaction.
+
+        Args:
+            older_than_months (int): Raw samples are kept for this many whole months
+
+        Returns:
+            list: Names of the partitions that were compacted and dropped
+        """
+        if not self.is_partitioned():
+            raise RuntimeError("wait_times is not partitioned; run migrations/partition_wait_times.py first")
+
+        self.cursor.execute("""
+            SELECT child.relname
+            FROM pg_inherits
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE pg_inherits.inhparent = 'wait_times'::regclass
+              AND child.relname ~ '^wait_times_[0-9]{4}_[0-9]{2}$'
+              AND to_timestamp(substring(child.relname FROM 12), 'YYYY_MM') + INTERVAL '1 month'
+                  <= date_trunc('month', NOW()) - %s * INTERVAL '1 month'
+            ORDER BY child.relname
+        """, (older_than_months,))
+        partitions = [row[0] for row in self.cursor.fetchall()]
+
+        for name in partitions:
+            self.cursor.execute(sql.SQL("""
+                INSERT INTO wait_times_hourly
+                    (hour_start, stadsloket_id, sample_count, waiting_sum, waittime_sum, waittime_max,
+                     waiting_sq_sum, waittime_sq_sum)
+                SELECT date_trunc('hour', timestamp), stadsloket_id,
+                       COUNT(*), COALESCE(SUM(waiting), 0), COALESCE(SUM(waittime), 0), MAX(waittime),
+                       COALESCE(SUM(waiting::bigint * waiting), 0), COALESCE(SUM(waittime::bigint * waittime), 0)
+                FROM {}
+                GROUP BY 1, 2
+                ON CONFLICT (stadsloket_id, hour_start)
+                DO UPDATE SET sample_count = wait_times_hourly.sample_count + EXCLUDED.sample_count,
+                              waiting_sum = wait_times_hourly.waiting_sum + EXCLUDED.waiting_sum,
+                              waittime_sum = wait_times_hourly.waittime_sum + EXCLUDED.waittime_sum,
+                              waittime_max = GREATEST(wait_times_hourly.waittime_max, EXCLUDED.waittime_max),
+                              waiting_sq_sum = wait_times_hourly.waiting_sq_sum + EXCLUDED.waiting_sq_sum,
+                              waittime_sq_sum = wait_times_hourly.waittime_sq_sum + EXCLUDED.waittime_sq_sum
+            """).format(sql.Identifier(name)))
+            self.cursor.execute(sql.SQL("DROP TABLE {}").format(sql.Identifier(name)))
+            self.db.commit()
+        return partitions
+
+    def waittime_sql(self):
+        """SQL expression reading wait_times.waittime as SMALLINT minutes, whatever its column type"""
+        self.cursor.execute("""
+            SELECT data_type FROM information_schema.columns
+            WHERE table_schema = current_schema() AND table_name = 'wait_times' AND column_name = 'waittime'
+        """)
+        row = self.cursor.fetchone()
+        if row is None or row[0] == 'smallint':
+            return 'waittime'
+        return LEGACY_WAITTIME_SQL
+
+    def rebuild_hourly_stats(self):
+        """Recompute the hourly_wait_stats rollup from the full wait_times history
+
+        Returns:
+            int: Number of (stadsloket, day, hour) rows written
+        """
+        # Block concurrent store_data() rollup updates so no sample is counted twice or lost
+        self.cursor.execute("LOCK TABLE hourly_wait_stats IN EXCLUSIVE MODE")
+        self.cursor.execute("DELETE FROM hourly_wait_stats")
+        waittime = self.waittime_sql()
+        # Raw samples plus the downsampled history that compact_history() produced
+        self.cursor.execute(f"""
+            INSERT INTO hourly_wait_stats (stadsloket_id, day_of_week, hour, waittime_sum, sample_count)
+            SELECT
+                stadsloket_id,
+                EXTRACT(DOW FROM ts AT TIME ZONE 'Europe/Amsterdam'),
+                EXTRACT(HOUR FROM ts AT TIME ZONE 'Europe/Amsterdam'),
+                SUM(waittime_sum),
+                SUM(sample_count)
+            FROM (
+                SELECT stadsloket_id, timestamp AS ts, {waittime} AS waittime_sum, 1 AS sample_count
+                FROM wait_times
+                WHERE {waittime} IS NOT NULL AND timestamp IS NOT NULL
+                UNION ALL
+                SELECT stadsloket_id, hour_start, waittime_sum, sample_count
+                FROM wait_times_hourly
+            ) samples
+            GROUP BY 1, 2, 3
+        """)
+        rows = self.cursor.rowcount
+        self.db.commit()
+        return rows
+
+    def rebuild_current_wait_times(self):
+        """Recompute the current_wait_times snapshot from the latest wait_times row per office
+
+        Returns:
+            int: Number of offices in the snapshot
+        """
+        self.cursor.execute("LOCK TABLE current_wait_times IN EXCLUSIVE MODE")
+        waittime = self.waittime_sql()
+        self.cursor.execute("DELETE FROM current_wait_times")
+        self.cursor.execute(f"""
+            INSERT INTO current_wait_times (stadsloket_id, waiting, waittime, timestamp)
+            SELECT DISTINCT ON (stadsloket_id) stadsloket_id, waiting, {waittime}, timestamp
+            FROM wait_times
+            WHERE timestamp IS NOT NULL
+            ORDER BY stadsloket_id, timestamp DESC, id DESC
+        """)
+        rows = self.cursor.rowcount
+        self.db.commit()
+        return rows
+
+    def rebuild_wait_statistics(self):
+        """Recompute wait_stats_totals and wait_stats_daily from raw and compacted history
+
+        Hours compacted before sums of squares were recorded contribute their
+        hourly mean in place of the individual samples, which slightly
+        understates their variance.
+
+        Returns:
+            int: Number of daily buckets written
+        """
+        self.cursor.execute("LOCK TABLE wait_stats_totals, wait_stats_daily IN EXCLUSIVE MODE")
+        waittime = self.waittime_sql()
+        self.cursor.execute("DELETE FROM wait_stats_daily")
+        self.cursor.execute(f"""
+            INSERT INTO wait_stats_daily
+                (stadsloket_id, day, sample_count, waiting_sum, waiting_sq_sum, waittime_sum, waittime_sq_sum)
+            SELECT stadsloket_id, (ts AT TIME ZONE 'Europe/Amsterdam')::date,
+                   SUM(sample_count), SUM(waiting_sum), SUM(waiting_sq_sum), SUM(waittime_sum), SUM(waittime_sq_sum)
+            FROM (
+                SELECT stadsloket_id, timestamp AS ts, 1 AS sample_count,
+                       waiting AS waiting_sum, waiting::bigint * waiting AS waiting_sq_sum,
+                       {waittime} AS waittime_sum, ({waittime})::bigint * {waittime} AS waittime_sq_sum
+                FROM wait_times
+                WHERE waiting IS NOT NULL AND {waittime} IS NOT NULL
+                UNION ALL
+                SELECT stadsloket_id, hour_start, sample_count,
+                       waiting_sum, COALESCE(waiting_sq_sum, waiting_sum * waiting_sum / sample_count),
+                       waittime_sum, COALESCE(waittime_sq_sum, waittime_sum * waittime_sum / sample_count)
+                FROM wait_times_hourly
+            ) samples
+            GROUP BY 1, 2
+        """)
+        rows = self.cursor.rowcount
+        self.cursor.execute("DELETE FROM wait_stats_totals")
+        self.cursor.execute("""
+            INSERT INTO wait_stats_totals
+                (stadsloket_id, sample_count, waiting_sum, waiting_sq_sum, waittime_sum, waittime_sq_sum)
+            SELECT stadsloket_id, SUM(sample_count), SUM(waiting_sum), SUM(waiting_sq_sum),
+                   SUM(waittime_sum), SUM(waittime_sq_sum)
+            FROM wait_stats_daily
+            GROUP BY stadsloket_id
+        """)
+        self.db.commit()
+        return rows
+
     def create_loket_names_table(self):
         # PostgreSQL version of the table creation
         self.cursor.execute("""
@@ -92,97 +487,205 @@ class WaitTimeLib:
         # here since we don't have all the records in wait_times yet
         self.db.commit()
 
-    def fetch_data(self):
-        response = requests.get('https://wachttijdenamsterdam.nl/data/')
-        return response.json()
+    def store_snapshots(self, snapshots, page_size=5000):
+        """Bulk-insert snapshots and update the derived tables in one statement per page
+
+        The raw rows, the hourly rollup, the running statistics and the
+        latest-snapshot table are all written by a single multi-row INSERT with
+        data-modifying CTEs, so a regular collector run costs one round trip
+        plus the commit. The same statement NOTIFYs listening web workers,
+        which receive it once the commit lands.
+
+        Args:
+            snapshots (iterable): (snapshot_time, data) pairs, data as for store_data()
+            page_size (int): Rows per statement for large backfills
 
-    def parse_waittime(self, waittime_str):
-        if not waittime_str or waittime_str.lower().startswith('geen'):
+        Returns:
+            int: Number of rows stored
+        """
+        rows = self.snapshot_rows(snapshots)
+        if not rows:
             return 0
-        if 'uur' in waittime_str.lower():
-            return 70
-        # Remove ' minuten'
-        numeric = ''.join([c for c in waittime_str if c.isdigit()])
-        if numeric.isdigit():
-            val = int(numeric)
-            return val if val <= 60 else 70
-        return 0
-
-    def store_data(self, data):
-        for entry in data:
-            parsed_waittime = self.parse_waittime(entry['waittime'])
-            # Get current time in Amsterdam timezone with explicit timezone info
-            current_time = datetime.now(self.timezone)
-            self.cursor.execute("""
-            INSERT INTO wait_times (stadsloket_id, waiting, waittime, timestamp)
-            VALUES (%s, %s, %s, %s)
-            """, (entry['id'], entry['waiting'], parsed_waittime, current_time))
+
+        execute_values(self.cursor, """
+            WITH snapshot (stadsloket_id, waiting, waittime, timestamp) AS (VALUES %s),
+            raw AS (
+                INSERT INTO wait_times (stadsloket_id, waiting, waittime, timestamp)
+                SELECT stadsloket_id, waiting, waittime, timestamp FROM snapshot
+            ),
+            -- Fold the samples into the hourly rollup (PostgreSQL DOW, 0=Sunday)
+            hourly AS (
+                INSERT INTO hourly_wait_stats (stadsloket_id, day_of_week, hour, waittime_sum, sample_count)
+                SELECT stadsloket_id,
+                       EXTRACT(DOW FROM timestamp AT TIME ZONE 'Europe/Amsterdam'),
+                       EXTRACT(HOUR FROM timestamp AT TIME ZONE 'Europe/Amsterdam'),
+                       SUM(waittime), COUNT(*)
+                FROM snapshot
+                WHERE waittime IS NOT NULL
+                GROUP BY 1, 2, 3
+                ON CONFLICT (stadsloket_id, day_of_week, hour)
+                DO UPDATE SET waittime_sum = hourly_wait_stats.waittime_sum + EXCLUDED.waittime_sum,
+                              sample_count = hourly_wait_stats.sample_count + EXCLUDED.sample_count
+            ),
+            stats AS (
+                SELECT stadsloket_id, (timestamp AT TIME ZONE 'Europe/Amsterdam')::date AS day,
+                       waiting, waiting::bigint * waiting AS waiting_sq,
+                       waittime, waittime::bigint * waittime AS waittime_sq
+                FROM snapshot
+                WHERE waiting IS NOT NULL AND waittime IS NOT NULL
+            ),
+            -- Running count/sum/sum-of-squares per office, overall and per day
+            totals AS (
+                INSERT INTO wait_stats_totals
+                    (stadsloket_id, sample_count, waiting_sum, waiting_sq_sum, waittime_sum, waittime_sq_sum)
+                SELECT stadsloket_id, COUNT(*), SUM(waiting), SUM(waiting_sq), SUM(waittime), SUM(waittime_sq)
+                FROM stats
+                GROUP BY stadsloket_id
+                ON CONFLICT (stadsloket_id)
+                DO UPDATE SET sample_count = wait_stats_totals.sample_count + EXCLUDED.sample_count,
+                              waiting_sum = wait_stats_totals.waiting_sum + EXCLUDED.waiting_sum,
+                              waiting_sq_sum = wait_stats_totals.waiting_sq_sum + EXCLUDED.waiting_sq_sum,
+                              waittime_sum = wait_stats_totals.waittime_sum + EXCLUDED.waittime_sum,
+                              waittime_sq_sum = wait_stats_totals.waittime_sq_sum + EXCLUDED.waittime_sq_sum
+            ),
+            daily AS (
+                INSERT INTO wait_stats_daily
+                    (stadsloket_id, day, sample_count, waiting_sum, waiting_sq_sum, waittime_sum, waittime_sq_sum)
+                SELECT stadsloket_id, day, COUNT(*), SUM(waiting), SUM(waiting_sq), SUM(waittime), SUM(waittime_sq)
+                FROM stats
+                GROUP BY stadsloket_id, day
+                ON CONFLICT (stadsloket_id, day)
+                DO UPDATE SET sample_count = wait_stats_daily.sample_count + EXCLUDED.sample_count,
+                              waiting_sum = wait_stats_daily.waiting_sum + EXCLUDED.waiting_sum,
+                              waiting_sq_sum = wait_stats_daily.waiting_sq_sum + EXCLUDED.waiting_sq_sum,
+                              waittime_sum = wait_stats_daily.waittime_sum + EXCLUDED.waittime_sum,
+                              waittime_sq_sum = wait_stats_daily.waittime_sq_sum + EXCLUDED.waittime_sq_sum
+            )
+            -- Replace each office's row in the latest-snapshot table, never with an older sample
+            INSERT INTO current_wait_times (stadsloket_id, waiting, waittime, timestamp)
+            SELECT DISTINCT ON (stadsloket_id) stadsloket_id, waiting, waittime, timestamp
+            FROM snapshot
+            ORDER BY stadsloket_id, timestamp DESC
+            ON CONFLICT (stadsloket_id)
+            DO UPDATE SET waiting = EXCLUDED.waiting,
+                          waittime = EXCLUDED.waittime,
+                          timestamp = EXCLUDED.timestamp
+            WHERE current_wait_times.timestamp <= EXCLUDED.timestamp;
+        """ + NOTIFY_SNAPSHOT_SQL, rows, template="(%s::integer, %s::integer, %s::smallint, %s::timestamptz)",
+            page_size=page_size)
         self.db.commit()
+        return len(rows)
 
     def get_mean_wait_times(self):
-        self.cursor.execute("""
-            SELECT wt.stadsloket_id, ln.loket_name, AVG(wt.waiting) as mean_waiting
-            FROM wait_times wt
+        # Constant-time lookup in the running totals maintained by store_data()
+        self.read_cursor.execute("""
+            SELECT t.stadsloket_id, ln.loket_name,
+                   t.waiting_sum::float / NULLIF(t.sample_count, 0) as mean_waiting
+            FROM wait_stats_totals t
             LEFT JOIN loket_names ln
-            ON wt.stadsloket_id = ln.stadsloket_id
-            GROUP BY wt.stadsloket_id, ln.loket_name
+            ON t.stadsloket_id = ln.stadsloket_id
         """)
-        rows = self.cursor.fetchall()
+        rows = self.read_cursor.fetchall()
         results = []
         for stadsloket_id, loket_name, mean_waiting in rows:
             # Convert the decimal or None value to an integer
             results.append((stadsloket_id, loket_name or 'Unknown', int(mean_waiting or 0)))
         return results
 
-    def get_raw_data(self):
-        self.cursor.execute("""
+    def get_wait_statistics(self):
+        """Get mean and standard deviation of people waiting and wait time per stadsloket
+
+        Returns:
+            list: One dict per stadsloket with 'all_time', 'last_30_days' and
+                  'last_7_days' statistics (windows count Amsterdam calendar days,
+                  including today)
+        """
+        self.read_cursor.execute("""
+            SELECT t.stadsloket_id, ln.loket_name, 'all_time',
+                   t.sample_count, t.waiting_sum, t.waiting_sq_sum, t.waittime_sum, t.waittime_sq_sum
+            FROM wait_stats_totals t
+            LEFT JOIN loket_names ln ON t.stadsloket_id = ln.stadsloket_id
+            UNION ALL
+            SELECT d.stadsloket_id, ln.loket_name, w.window_name,
+                   SUM(d.sample_count), SUM(d.waiting_sum), SUM(d.waiting_sq_sum),
+                   SUM(d.waittime_sum), SUM(d.waittime_sq_sum)
+            FROM wait_stats_daily d
+            JOIN (VALUES ('last_30_days', 30), ('last_7_days', 7)) AS w(window_name, days)
+                ON d.day > CURRENT_DATE - w.days
+            LEFT JOIN loket_names ln ON d.stadsloket_id = ln.stadsloket_id
+            WHERE d.day > CURRENT_DATE - 30
+            GROUP BY d.stadsloket_id, ln.loket_name, w.window_name
+        """)
+
+        return self.format_wait_statistics(self.read_cursor.fetchall())
+
+    def iter_raw_data(self, stadsloket_id=None, start=None, end=None, fetch_size=2000):
+        """Stream raw samples through a server-side cursor, oldest first
+
+        Only fetch_size rows are held in memory at a time, regardless of the
+        size of the result.
+
+        Args:
+            stadsloket_id (int, optional): Only return samples for this office
+            start (datetime, optional): Inclusive lower bound on the timestamp
+            end (datetime, optional): Exclusive upper bound on the timestamp
+            fetch_size (int): Rows fetched from the server per round trip
+
+        Yields:
+            tuple: (stadsloket_id, loket_name, waiting, waittime, timestamp)
+        """
+        query = """
             SELECT wt.stadsloket_id, ln.loket_name, wt.waiting, wt.waittime, wt.timestamp
             FROM wait_times wt
             LEFT JOIN loket_names ln
             ON wt.stadsloket_id = ln.stadsloket_id
-        """)
-        rows = self.cursor.fetchall()
-        results = []
-        for sid, name, waiting, wtime, ts in rows:
-            results.append((sid, name or 'Unknown', waiting, wtime, ts))
-        return results
+            WHERE TRUE
+        """
+        params = []
+        if stadsloket_id is not None:
+            query += " AND wt.stadsloket_id = %s"
+            params.append(stadsloket_id)
+        if start is not None:
+            query += " AND wt.timestamp >= %s"
+            params.append(start)
+        if end is not None:
+            query += " AND wt.timestamp < %s"
+            params.append(end)
+        query += " ORDER BY wt.timestamp, wt.stadsloket_id"
+
+        # Named cursors live inside the current transaction
+        cursor = self.read_db.cursor(name=f"raw_data_{uuid.uuid4().hex}")
+        cursor.itersize = fetch_size
+        try:
+            cursor.execute(query, params)
+            for sid, name, waiting, wtime, ts in cursor:
+                yield (sid, name or 'Unknown', waiting, wtime, ts)
+        finally:
+            cursor.close()
+            self.read_db.rollback()
 
-    def fetch_loket_names(self):
-        # Retrieve the main page HTML
-        page_response = requests.get('https://wachttijdenamsterdam.nl')
-        page_html = page_response.text
-        # Simple regular expression to capture (stadsloket name) + (id from nfwrtXX)
-        # Each row has the pattern: <td data-title="Stadsloket">\s*(.*?)</td> ... id="nfwrtY"
-        matches = re.findall(r'<td data-title="Stadsloket">\s*(.*?)</td>.*?id="nfwrt(\d+)"',
-                             page_html, flags=re.DOTALL)
+    def store_loket_names(self, names):
+        """Insert or rename offices from (stadsloket_id, loket_name) pairs"""
         # Create table if needed
         self.create_loket_names_table()
         # Store results - PostgreSQL uses ON CONFLICT instead of ON DUPLICATE KEY
-        for (name, loket_id) in matches:
+        for loket_id, name in names:
             self.cursor.execute("""
             INSERT INTO loket_names (stadsloket_id, loket_name)
             VALUES (%s, %s)
             ON CONFLICT (stadsloket_id) 
             DO UPDATE SET loket_name = EXCLUDED.loket_name
-            """, (loket_id, name.strip()))
+            """, (loket_id, name))
         self.db.commit()
 
     def get_current_waiting(self):
-        # PostgreSQL syntax for getting latest records
-        self.cursor.execute("""
-            WITH latest_times AS (
-                SELECT stadsloket_id, MAX(timestamp) as max_timestamp
-                FROM wait_times
-                GROUP BY stadsloket_id
-            )
-            SELECT wt.stadsloket_id, ln.loket_name, wt.waittime, wt.waiting
-            FROM wait_times wt
-            JOIN latest_times lt 
-                ON wt.stadsloket_id = lt.stadsloket_id 
-                AND wt.timestamp = lt.max_timestamp
-            LEFT JOIN loket_names ln ON wt.stadsloket_id = ln.stadsloket_id
+        # One row per office, kept current by store_data()
+        self.read_cursor.execute("""
+            SELECT cw.stadsloket_id, ln.loket_name, cw.waittime, cw.waiting
+            FROM current_wait_times cw
+            LEFT JOIN loket_names ln ON cw.stadsloket_id = ln.stadsloket_id
         """)
-        return [(sid, name or 'Unknown', waittime, waiting) for sid, name, waittime, waiting in self.cursor.fetchall()]
+        return [(sid, name or 'Unknown', waittime, waiting) for sid, name, waittime, waiting in self.read_cursor.fetchall()]
 
     def get_hourly_averages(self, day_of_week=None):
         """Get average wait times in minutes by hour of day for each stadsloket
@@ -191,95 +694,103 @@ class WaitTimeLib:
             day_of_week (int, optional): Day of week (0=Sunday, 6=Saturday)
                                         If None, returns data for all days
         """
+        # Constant-size lookup in the rollup maintained by store_data()
         query = """
-            SELECT 
-                wt.stadsloket_id,
+            SELECT
+                hs.stadsloket_id,
                 ln.loket_name,
-                EXTRACT(HOUR FROM wt.timestamp AT TIME ZONE 'Europe/Amsterdam') as hour_of_day,
-                AVG(wt.waittime::float) as avg_waittime
-            FROM wait_times wt
-            LEFT JOIN loket_names ln ON wt.stadsloket_id = ln.stadsloket_id
-            WHERE EXTRACT(HOUR FROM wt.timestamp AT TIME ZONE 'Europe/Amsterdam') BETWEEN 8 AND 20
+                hs.hour AS hour_of_day,
+                SUM(hs.waittime_sum)::float / NULLIF(SUM(hs.sample_count), 0) AS avg_waittime
+            FROM hourly_wait_stats hs
+            LEFT JOIN loket_names ln ON hs.stadsloket_id = ln.stadsloket_id
+            WHERE hs.hour BETWEEN 8 AND 20
         """
         
         # Add day of week filter if specified
         if day_of_week is not None:
-            query += " AND EXTRACT(DOW FROM wt.timestamp AT TIME ZONE 'Europe/Amsterdam') = %s"
+            query += " AND hs.day_of_week = %s"
             params = (day_of_week,)
         else:
             params = ()
             
         query += """
-            GROUP BY wt.stadsloket_id, ln.loket_name, EXTRACT(HOUR FROM wt.timestamp AT TIME ZONE 'Europe/Amsterdam')
-            ORDER BY wt.stadsloket_id, EXTRACT(HOUR FROM wt.timestamp AT TIME ZONE 'Europe/Amsterdam')
+            GROUP BY hs.stadsloket_id, ln.loket_name, hs.hour
+            ORDER BY hs.stadsloket_id, hs.hour
         """
         
-        self.cursor.execute(query, params)
-        
-        results = {}
-        # Extended hours range to cover all possible opening hours (8:00 to 20:00)
-        hours = list(range(8, 21))  # 8:00 to 20:00
-        
-        for stadsloket_id, loket_name, hour, avg_waittime in self.cursor.fetchall():
-            hour = int(hour)  # Convert from Decimal to int
-            if loket_name not in results:
-                results[loket_name or f'Unknown-{stadsloket_id}'] = {
-                    'label': loket_name or f'Unknown-{stadsloket_id}',
-                    'data': [0] * len(hours)
-                }
-            try:
-                hour_index = hours.index(hour)
-                results[loket_name or f'Unknown-{stadsloket_id}']['data'][hour_index] = round(float(avg_waittime or 0), 1)
-            except (ValueError, IndexError):
-                pass
-        
-        # Return formatted data for chart
-        return {
-            'labels': [f"{h}:00" for h in hours],
-            'datasets': list(results.values()),
-            'day_of_week': day_of_week
-        }
+        self.read_cursor.execute(query, params)
+        return self.format_hourly_averages(self.read_cursor.fetchall(), day_of_week)
+
+    def get_weekly_hourly_averages(self):
+        """Hourly averages for every day of the week from a single pass over the rollup
 
-    def get_opening_hours(self, day_of_week):
-        """Get opening hours based on day of week
-        
-        Args:
-            day_of_week (int): Day of week (0=Sunday, 1=Monday, ..., 6=Saturday)
-        
         Returns:
-            tuple: (opening_hour, closing_hour)
+            dict: day_of_week (0=Sunday) -> the get_hourly_averages() chart data for that day
         """
-        # Make sure day_of_week is an integer
-        day = int(day_of_week) if day_of_week is not None else 0
-        
-        # Explicit mapping for clarity
-        if day == 0:  # Sunday
-            return (0, 0)  # Closed
-        elif day == 1:  # Monday
-            return (9, 17)
-        elif day == 2:  # Tuesday
-            return (9, 17)
-        elif day == 3:  # Wednesday
-            return (9, 17)
-        elif day == 4:  # Thursday - extended hours
-            return (9, 20)
-        elif day == 5:  # Friday
-            return (9, 17)
-        elif day == 6:  # Saturday
-            return (0, 0)  # Closed
-        else:
-            # Default fallback
-            return (9, 17)
+        self.read_cursor.execute("""
+            SELECT hs.day_of_week, hs.stadsloket_id, ln.loket_name, hs.hour,
+                   hs.waittime_sum::float / NULLIF(hs.sample_count, 0) AS avg_waittime
+            FROM hourly_wait_stats hs
+            LEFT JOIN loket_names ln ON hs.stadsloket_id = ln.stadsloket_id
+            WHERE hs.hour BETWEEN 8 AND 20
+            ORDER BY hs.stadsloket_id, hs.hour
+        """)
+        return self.format_weekly_hourly_averages(self.read_cursor.fetchall())
 
     def get_last_update_time(self):
         """Get the timestamp of the most recent data update"""
-        self.cursor.execute("""
+        self.read_cursor.execute("""
             SELECT MAX(timestamp)
-            FROM wait_times
+            FROM current_wait_times
         """)
-        result = self.cursor.fetchone()
+        result = self.read_cursor.fetchone()
         return result[0] if result and result[0] else None
 
+    def get_postcode_coordinates(self, postcode):
+        """Stored geocode of a normalized PC6 postcode
+
+        Returns:
+            tuple: (lat, lon, looked_up_at), with lat and lon None for a postcode
+            Nominatim does not know, or None when it was never looked up
+        """
+        self.read_cursor.execute("""
+            SELECT lat, lon, looked_up_at
+            FROM postcode_coordinates
+            WHERE postcode = %s
+        """, (postcode,))
+        return self.read_cursor.fetchone()
+
+    def get_geocoded_postcodes(self, negative_since=None):
+        """Postcodes with stored coordinates, plus unknown ones looked up after negative_since"""
+        self.read_cursor.execute("""
+            SELECT postcode
+            FROM postcode_coordinates
+            WHERE lat IS NOT NULL OR looked_up_at >= %s
+        """, (negative_since,))
+        return {postcode for postcode, in self.read_cursor.fetchall()}
+
+    def get_stored_postcode_coordinates(self):
+        """(postcode, lat, lon) of every postcode with stored coordinates, in postcode order"""
+        self.read_cursor.execute("""
+            SELECT postcode, lat, lon
+            FROM postcode_coordinates
+            WHERE lat IS NOT NULL
+            ORDER BY postcode
+        """)
+        return self.read_cursor.fetchall()
+
+    def store_postcode_coordinates(self, rows):
+        """Insert or refresh geocodes from (postcode, lat, lon) rows; None coordinates mark unknown postcodes"""
+        execute_values(self.cursor, """
+            INSERT INTO postcode_coordinates (postcode, lat, lon)
+            VALUES %s
+            ON CONFLICT (postcode)
+            DO UPDATE SET lat = EXCLUDED.lat,
+                          lon = EXCLUDED.lon,
+                          looked_up_at = NOW()
+        """, rows)
+        self.db.commit()
+
     def debug_timezone(self):
         """Debug timezone settings and timestamp display"""
         self.cursor.execute("SHOW timezone;")
@@ -300,7 +811,34 @@ class WaitTimeLib:
         }
 
     def close(self):
-        if hasattr(self, 'cursor') and self.cursor:
-            self.cursor.close()
-        if hasattr(self, 'db') and self.db:
-            self.db.close()
+        if self._read_cursor is not None:
+            self._read_cursor.close()
+            self._read_cursor = None
+        if self._read_db is not None:
+            self._read_pool.putconn(self._read_db)
+            self._read_db = None
+        if self._owns_replicas:
+            self.replicas.closeall()
+            self._owns_replicas = False
+        if self._cursor is not None:
+            self._cursor.close()
+            self._cursor = None
+        if self._db is not None:
+            if self.pool is not None:
+                # Hand the connection back; the pool rolls back any open transaction
+                self.pool.putconn(self._db)
+            else:
+                self._db.close()
+            self._db = None
+
+
+def open_wait_time_lib(config, create_tables=True, **kwargs):
+    """Open the backend that matches a connection string
+
+    sqlite:///path.db (or sqlite:///:memory:) opens the embedded SQLite backend;
+    anything else is handed to the PostgreSQL WaitTimeLib, together with its
+    pool/replicas keyword arguments.
+    """
+    if is_sqlite_url(config):
+        return SQLiteWaitTimeLib(config, create_tables=create_tables)
+    return WaitTimeLib(config, create_tables=create_tables, **kwargs)
@@ -0,0 +1,543 @@
+import sqlite3
+from datetime import datetime, timedelta
+from functools import lru_cache
+from urllib.parse import urlparse
+
+import pytz
+
+from wait_time_backend import WaitTimeBackend
+
+AMSTERDAM = pytz.timezone('Europe/Amsterdam')
+
+# Timestamps are stored as fixed-width UTC text, so they sort chronologically
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S.%f+00:00'
+
+
+def sqlite_path(url):
+    """File path of a sqlite:///path.db connection string"""
+    path = urlparse(url).path
+    return path[1:] if path.startswith('/') else path
+
+
+def to_db_timestamp(value):
+    return value.astimezone(pytz.utc).strftime(TIMESTAMP_FORMAT)
+
+
+@lru_cache(maxsize=4096)
+def from_db_timestamp(value):
+    """Aware Amsterdam datetime for a stored timestamp"""
+    return datetime.fromisoformat(value).astimezone(AMSTERDAM)
+
+
+# SQLite has no time zone support; these stand in for AT TIME ZONE 'Europe/Amsterdam'
+def amsterdam_dow(value):
+    # PostgreSQL DOW numbering, 0=Sunday
+    return (from_db_timestamp(value).weekday() + 1) % 7
+
+
+def amsterdam_hour(value):
+    return from_db_timestamp(value).hour
+
+
+def amsterdam_date(value):
+    return from_db_timestamp(value).date().isoformat()
+
+
+class SQLiteWaitTimeLib(WaitTimeBackend):
+    """Embedded SQLite backend with the same methods as WaitTimeLib
+
+    Runs the rollups and statistics queries against a local file in-process,
+    for analytics jobs, local development and benchmarks without a database
+    server. Raw samples are not partitioned; compact_history() downsamples
+    and deletes them by month instead.
+    """
+
+    def __init__(self, config, create_tables=True):
+        """Open a sqlite:///path.db connection string (sqlite:///:memory: for a scratch database)"""
+        self.connection_string = config
+        self.database = sqlite_path(config)
+        self.db = sqlite3.connect(self.database, timeout=30)
+        if self.database != ':memory:':
+            # Readers do not block the collector's writes
+            self.db.execute("PRAGMA journal_mode = WAL")
+        for name, func in (('amsterdam_dow', amsterdam_dow),
+                           ('amsterdam_hour', amsterdam_hour),
+                           ('amsterdam_date', amsterdam_date)):
+            self.db.create_function(name, 1, func, deterministic=True)
+        self.cursor = self.db.cursor()
+
+        if create_tables:
+            self.create_table()
+
+    def create_table(self):
+        self.cursor.executescript("""
+        CREATE TABLE IF NOT EXISTS wait_times (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp TEXT NOT NULL,
+            stadsloket_id INTEGER NOT NULL,
+            waiting INTEGER,
+            waittime INTEGER
+        );
+        CREATE INDEX IF NOT EXISTS idx_stadsloket_id ON wait_times(stadsloket_id, timestamp);
+        CREATE INDEX IF NOT EXISTS idx_wait_times_timestamp ON wait_times(timestamp);
+
+        CREATE TABLE IF NOT EXISTS wait_times_hourly (
+            hour_start TEXT NOT NULL,
+            stadsloket_id INTEGER NOT NULL,
+            sample_count INTEGER NOT NULL,
+            waiting_sum INTEGER NOT NULL,
+            waittime_sum INTEGER NOT NULL,
+            waittime_max INTEGER,
+            waiting_sq_sum INTEGER,
+            waittime_sq_sum INTEGER,
+            PRIMARY KEY (stadsloket_id, hour_start)
+        );
+
+        CREATE TABLE IF NOT EXISTS loket_names (
+            stadsloket_id INTEGER NOT NULL PRIMARY KEY,
+            loket_name TEXT
+        );
+
+        CREATE TABLE IF NOT EXISTS hourly_wait_stats (
+            stadsloket_id INTEGER NOT NULL,
+            day_of_week INTEGER NOT NULL,
+            hour INTEGER NOT NULL,
+            waittime_sum INTEGER NOT NULL DEFAULT 0,
+            sample_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (stadsloket_id, day_of_week, hour)
+        );
+
+        CREATE TABLE IF NOT EXISTS current_wait_times (
+            stadsloket_id INTEGER NOT NULL PRIMARY KEY,
+            waiting INTEGER,
+            waittime INTEGER,
+            timestamp TEXT NOT NULL
+        );
+
+        CREATE TABLE IF NOT EXISTS wait_stats_totals (
+            stadsloket_id INTEGER NOT NULL PRIMARY KEY,
+            sample_count INTEGER NOT NULL DEFAULT 0,
+            waiting_sum INTEGER NOT NULL DEFAULT 0,
+            waiting_sq_sum INTEGER NOT NULL DEFAULT 0,
+            waittime_sum INTEGER NOT NULL DEFAULT 0,
+            waittime_sq_sum INTEGER NOT NULL DEFAULT 0
+        );
+
+        CREATE TABLE IF NOT EXISTS wait_stats_daily (
+            stadsloket_id INTEGER NOT NULL,
+            day TEXT NOT NULL,
+            sample_count INTEGER NOT NULL DEFAULT 0,
+            waiting_sum INTEGER NOT NULL DEFAULT 0,
+            waiting_sq_sum INTEGER NOT NULL DEFAULT 0,
+            waittime_sum INTEGER NOT NULL DEFAULT 0,
+            waittime_sq_sum INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (stadsloket_id, day)
+        );
+
+        CREATE TABLE IF NOT EXISTS postcode_coordinates (
+            postcode TEXT NOT NULL PRIMARY KEY,
+            lat REAL,
+            lon REAL,
+            looked_up_at TEXT NOT NULL
+        );
+        """)
+
+    def is_partitioned(self):
+        return False
+
+    def ensure_partitions(self, months_ahead=2, since=None):
+        # Nothing to prepare, wait_times is a single table
+        return []
+
+    def compact_history(self, older_than_months):
+        """Downsample raw samples older than the retention window into wait_times_hourly
+
+        Args:
+            older_than_months (int): Raw samples are kept for this many whole months
+
+        Returns:
+            list: The Amsterdam months (YYYY-MM) that were compacted
+        """
+        month_start = datetime.now(self.timezone).date().replace(day=1)
+        for _ in range(older_than_months):
+            month_start = (month_start - timedelta(days=1)).replace(day=1)
+        cutoff = to_db_timestamp(self.timezone.localize(datetime.combine(month_start, datetime.min.time())))
+
+        self.cursor.execute("""
+            SELECT DISTINCT substr(amsterdam_date(timestamp), 1, 7)
+            FROM wait_times WHERE timestamp < ? ORDER BY 1
+        """, (cutoff,))
+        months = [row[0] for row in self.cursor.fetchall()]
+
+        # Amsterdam is a whole number of hours off UTC, so UTC hours are local hours
+        self.cursor.execute("""
+            INSERT INTO wait_times_hourly
+                (hour_start, stadsloket_id, sample_count, waiting_sum, waittime_sum, waittime_max,
+                 waiting_sq_sum, waittime_sq_sum)
+            SELECT substr(timestamp, 1, 13) || ':00:00.000000+00:00', stadsloket_id,
+                   COUNT(*), COALESCE(SUM(waiting), 0), COALESCE(SUM(waittime), 0), MAX(waittime),
+                   COALESCE(SUM(waiting * waiting), 0), COALESCE(SUM(waittime * waittime), 0)
+            FROM wait_times
+            WHERE timestamp < ?
+            GROUP BY 1, 2
+            ON CONFLICT (stadsloket_id, hour_start)
+            DO UPDATE SET sample_count = wait_times_hourly.sample_count + excluded.sample_count,
+                          waiting_sum = wait_times_hourly.waiting_sum + excluded.waiting_sum,
+                          waittime_sum = wait_times_hourly.waittime_sum + excluded.waittime_sum,
+                          waittime_max = MAX(wait_times_hourly.waittime_max, excluded.waittime_max),
+                          waiting_sq_sum = wait_times_hourly.waiting_sq_sum + excluded.waiting_sq_sum,
+                          waittime_sq_sum = wait_times_hourly.waittime_sq_sum + excluded.waittime_sq_sum
+        """, (cutoff,))
+        self.cursor.execute("DELETE FROM wait_times WHERE timestamp < ?", (cutoff,))
+        self.db.commit()
+        return months
+
+    def rebuild_hourly_stats(self):
+        """Recompute the hourly_wait_stats rollup from the full wait_times history
+
+        Returns:
+            int: Number of (stadsloket, day, hour) rows written
+        """
+        self.cursor.execute("DELETE FROM hourly_wait_stats")
+        self.cursor.execute("""
+            INSERT INTO hourly_wait_stats (stadsloket_id, day_of_week, hour, waittime_sum, sample_count)
+            SELECT stadsloket_id, amsterdam_dow(ts), amsterdam_hour(ts), SUM(waittime_sum), SUM(sample_count)
+            FROM (
+                SELECT stadsloket_id, timestamp AS ts, waittime AS waittime_sum, 1 AS sample_count
+                FROM wait_times
+                WHERE waittime IS NOT NULL
+                UNION ALL
+                SELECT stadsloket_id, hour_start, waittime_sum, sample_count
+                FROM wait_times_hourly
+            ) samples
+            GROUP BY 1, 2, 3
+        """)
+        rows = self.cursor.rowcount
+        self.db.commit()
+        return rows
+
+    def rebuild_current_wait_times(self):
+        """Recompute the current_wait_times snapshot from the latest wait_times row per office
+
+        Returns:
+            int: Number of offices in the snapshot
+        """
+        self.cursor.execute("DELETE FROM current_wait_times")
+        # SQLite takes the bare columns from the row that holds the MAX()
+        self.cursor.execute("""
+            INSERT INTO current_wait_times (stadsloket_id, waiting, waittime, timestamp)
+            SELECT stadsloket_id, waiting, waittime, MAX(timestamp)
+            FROM wait_times
+            GROUP BY stadsloket_id
+        """)
+        rows = self.cursor.rowcount
+        self.db.commit()
+        return rows
+
+    def rebuild_wait_statistics(self):
+        """Recompute wait_stats_totals and wait_stats_daily from raw and compacted history
+
+        Returns:
+            int: Number of daily buckets written
+        """
+        self.cursor.execute("DELETE FROM wait_stats_daily")
+        self.cursor.execute("""
+            INSERT INTO wait_stats_daily
+                (stadsloket_id, day, sample_count, waiting_sum, waiting_sq_sum, waittime_sum, waittime_sq_sum)
+            SELECT stadsloket_id, amsterdam_date(ts),
+                   SUM(sample_count), SUM(waiting_sum), SUM(waiting_sq_sum), SUM(waittime_sum), SUM(waittime_sq_sum)
+            FROM (
+                SELECT stadsloket_id, timestamp AS ts, 1 AS sample_count,
+                       waiting AS waiting_sum, waiting * waiting AS waiting_sq_sum,
+                       waittime AS waittime_sum, waittime * waittime AS waittime_sq_sum
+                FROM wait_times
+                WHERE waiting IS NOT NULL AND waittime IS NOT NULL
+                UNION ALL
+                SELECT stadsloket_id, hour_start, sample_count,
+                       waiting_sum, COALESCE(waiting_sq_sum, waiting_sum * waiting_sum / sample_count),
+                       waittime_sum, COALESCE(waittime_sq_sum, waittime_sum * waittime_sum / sample_count)
+                FROM wait_times_hourly
+            ) samples
+            GROUP BY 1, 2
+        """)
+        rows = self.cursor.rowcount
+        self.cursor.execute("DELETE FROM wait_stats_totals")
+        self.cursor.execute("""
+            INSERT INTO wait_stats_totals
+                (stadsloket_id, sample_count, waiting_sum, waiting_sq_sum, waittime_sum, waittime_sq_sum)
+            SELECT stadsloket_id, SUM(sample_count), SUM(waiting_sum), SUM(waiting_sq_sum),
+                   SUM(waittime_sum), SUM(waittime_sq_sum)
+            FROM wait_stats_daily
+            GROUP BY stadsloket_id
+        """)
+        self.db.commit()
+        return rows
+
+    def store_snapshots(self, snapshots, page_size=5000):
+        """Bulk-insert snapshots and update the derived tables in one transaction
+
+        The rows are staged in a temporary table, from which the raw table,
+        the rollups and the latest-snapshot table are filled with set-based
+        statements, mirroring the PostgreSQL backend.
+
+        Args:
+            snapshots (iterable): (snapshot_time, data) pairs, data as for store_data()
+            page_size (int): Accepted for compatibility with WaitTimeLib; unused
+
+        Returns:
+            int: Number of rows stored
+        """
+        rows = [(sid, waiting, waittime, to_db_timestamp(snapshot_time))
+                for sid, waiting, waittime, snapshot_time in self.snapshot_rows(snapshots)]
+        if not rows:
+            return 0
+
+        self.cursor.execute("""
+            CREATE TEMP TABLE IF NOT EXISTS snapshot (
+                stadsloket_id INTEGER, waiting INTEGER, waittime INTEGER, timestamp TEXT
+            )
+        """)
+        self.cursor.execute("DELETE FROM temp.snapshot")
+        self.cursor.executemany("INSERT INTO temp.snapshot VALUES (?, ?, ?, ?)", rows)
+        self.cursor.execute("""
+            INSERT INTO wait_times (stadsloket_id, waiting, waittime, timestamp)
+            SELECT stadsloket_id, waiting, waittime, timestamp FROM temp.snapshot
+        """)
+        self.cursor.execute("""
+            INSERT INTO hourly_wait_stats (stadsloket_id, day_of_week, hour, waittime_sum, sample_count)
+            SELECT stadsloket_id, amsterdam_dow(timestamp), amsterdam_hour(timestamp), SUM(waittime), COUNT(*)
+            FROM temp.snapshot
+            WHERE waittime IS NOT NULL
+            GROUP BY 1, 2, 3
+            ON CONFLICT (stadsloket_id, day_of_week, hour)
+            DO UPDATE SET waittime_sum = hourly_wait_stats.waittime_sum + excluded.waittime_sum,
+                          sample_count = hourly_wait_stats.sample_count + excluded.sample_count
+        """)
+        self.cursor.execute("""
+            INSERT INTO wait_stats_totals
+                (stadsloket_id, sample_count, waiting_sum, waiting_sq_sum, waittime_sum, waittime_sq_sum)
+            SELECT stadsloket_id, COUNT(*), SUM(waiting), SUM(waiting * waiting),
+                   SUM(waittime), SUM(waittime * waittime)
+            FROM temp.snapshot
+            WHERE waiting IS NOT NULL AND waittime IS NOT NULL
+            GROUP BY stadsloket_id
+            ON CONFLICT (stadsloket_id)
+            DO UPDATE SET sample_count = wait_stats_totals.sample_count + excluded.sample_count,
+                          waiting_sum = wait_stats_totals.waiting_sum + excluded.waiting_sum,
+                          waiting_sq_sum = wait_stats_totals.waiting_sq_sum + excluded.waiting_sq_sum,
+                          waittime_sum = wait_stats_totals.waittime_sum + excluded.waittime_sum,
+                          waittime_sq_sum = wait_stats_totals.waittime_sq_sum + excluded.waittime_sq_sum
+        """)
+        self.cursor.execute("""
+            INSERT INTO wait_stats_daily
+                (stadsloket_id, day, sample_count, waiting_sum, waiting_sq_sum, waittime_sum, waittime_sq_sum)
+            SELECT stadsloket_id, amsterdam_date(timestamp), COUNT(*), SUM(waiting), SUM(waiting * waiting),
+                   SUM(waittime), SUM(waittime * waittime)
+            FROM temp.snapshot
+            WHERE waiting IS NOT NULL AND waittime IS NOT NULL
+            GROUP BY 1, 2
+            ON CONFLICT (stadsloket_id, day)
+            DO UPDATE SET sample_count = wait_stats_daily.sample_count + excluded.sample_count,
+                          waiting_sum = wait_stats_daily.waiting_sum + excluded.waiting_sum,
+                          waiting_sq_sum = wait_stats_daily.waiting_sq_sum + excluded.waiting_sq_sum,
+                          waittime_sum = wait_stats_daily.waittime_sum + excluded.waittime_sum,
+                          waittime_sq_sum = wait_stats_daily.waittime_sq_sum + excluded.waittime_sq_sum
+        """)
+        self.cursor.execute("""
+            INSERT INTO current_wait_times (stadsloket_id, waiting, waittime, timestamp)
+            SELECT stadsloket_id, waiting, waittime, MAX(timestamp)
+            FROM temp.snapshot
+            GROUP BY stadsloket_id
+            ON CONFLICT (stadsloket_id)
+            DO UPDATE SET waiting = excluded.waiting,
+                          waittime = excluded.waittime,
+                          timestamp = excluded.timestamp
+            WHERE current_wait_times.timestamp <= excluded.timestamp
+        """)
+        self.db.commit()
+        return len(rows)
+
+    def create_loket_names_table(self):
+        self.cursor.execute("""
+        CREATE TABLE IF NOT EXISTS loket_names (
+            stadsloket_id INTEGER NOT NULL PRIMARY KEY,
+            loket_name TEXT
+        )
+        """)
+        self.db.commit()
+
+    def store_loket_names(self, names):
+        """Insert or rename offices from (stadsloket_id, loket_name) pairs"""
+        self.cursor.executemany("""
+            INSERT INTO loket_names (stadsloket_id, loket_name)
+            VALUES (?, ?)
+            ON CONFLICT (stadsloket_id)
+            DO UPDATE SET loket_name = excluded.loket_name
+        """, names)
+        self.db.commit()
+
+    def get_mean_wait_times(self):
+        self.cursor.execute("""
+            SELECT t.stadsloket_id, ln.loket_name,
+                   t.waiting_sum * 1.0 / NULLIF(t.sample_count, 0) AS mean_waiting
+            FROM wait_stats_totals t
+            LEFT JOIN loket_names ln ON t.stadsloket_id = ln.stadsloket_id
+        """)
+        return [(sid, name or 'Unknown', int(mean_waiting or 0))
+                for sid, name, mean_waiting in self.cursor.fetchall()]
+
+    def get_wait_statistics(self):
+        """Get mean and standard deviation of people waiting and wait time per stadsloket
+
+        Returns:
+            list: Same structure as WaitTimeLib.get_wait_statistics()
+        """
+        today = datetime.now(self.timezone).date().isoformat()
+        self.cursor.execute("""
+            SELECT t.stadsloket_id, ln.loket_name, 'all_time',
+                   t.sample_count, t.waiting_sum, t.waiting_sq_sum, t.waittime_sum, t.waittime_sq_sum
+            FROM wait_stats_totals t
+            LEFT JOIN loket_names ln ON t.stadsloket_id = ln.stadsloket_id
+            UNION ALL
+            SELECT d.stadsloket_id, ln.loket_name, w.window_name,
+                   SUM(d.sample_count), SUM(d.waiting_sum), SUM(d.waiting_sq_sum),
+                   SUM(d.waittime_sum), SUM(d.waittime_sq_sum)
+            FROM wait_stats_daily d
+            JOIN (SELECT 'last_30_days' AS window_name, 30 AS days
+                  UNION ALL SELECT 'last_7_days', 7) w
+                ON d.day > date(?, printf('-%d days', w.days))
+            LEFT JOIN loket_names ln ON d.stadsloket_id = ln.stadsloket_id
+            GROUP BY d.stadsloket_id, ln.loket_name, w.window_name
+        """, (today,))
+        return self.format_wait_statistics(self.cursor.fetchall())
+
+    def iter_raw_data(self, stadsloket_id=None, start=None, end=None, fetch_size=2000):
+        """Stream raw samples oldest first, fetch_size rows at a time
+
+        Yields:
+            tuple: (stadsloket_id, loket_name, waiting, waittime, timestamp)
+        """
+        query = """
+            SELECT wt.stadsloket_id, ln.loket_name, wt.waiting, wt.waittime, wt.timestamp
+            FROM wait_times wt
+            LEFT JOIN loket_names ln ON wt.stadsloket_id = ln.stadsloket_id
+            WHERE 1
+        """
+        params = []
+        if stadsloket_id is not None:
+            query += " AND wt.stadsloket_id = ?"
+            params.append(stadsloket_id)
+        if start is not None:
+            query += " AND wt.timestamp >= ?"
+            params.append(to_db_timestamp(start))
+        if end is not None:
+            query += " AND wt.timestamp < ?"
+            params.append(to_db_timestamp(end))
+        query += " ORDER BY wt.timestamp, wt.stadsloket_id"
+
+        cursor = self.db.cursor()
+        try:
+            cursor.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(fetch_size)
+                if not rows:
+                    break
+                for sid, name, waiting, wtime, ts in rows:
+                    yield (sid, name or 'Unknown', waiting, wtime, from_db_timestamp(ts))
+        finally:
+            cursor.close()
+
+    def get_current_waiting(self):
+        self.cursor.execute("""
+            SELECT cw.stadsloket_id, ln.loket_name, cw.waittime, cw.waiting
+            FROM current_wait_times cw
+            LEFT JOIN loket_names ln ON cw.stadsloket_id = ln.stadsloket_id
+        """)
+        return [(sid, name or 'Unknown', waittime, waiting) for sid, name, waittime, waiting in self.cursor.fetchall()]
+
+    def get_hourly_averages(self, day_of_week=None):
+        """Get average wait times in minutes by hour of day for each stadsloket
+
+        Args:
+            day_of_week (int, optional): Day of week (0=Sunday, 6=Saturday)
+                                        If None, returns data for all days
+        """
+        query = """
+            SELECT hs.stadsloket_id, ln.loket_name, hs.hour,
+                   SUM(hs.waittime_sum) * 1.0 / NULLIF(SUM(hs.sample_count), 0)
+            FROM hourly_wait_stats hs
+            LEFT JOIN loket_names ln ON hs.stadsloket_id = ln.stadsloket_id
+            WHERE hs.hour BETWEEN 8 AND 20
+        """
+        params = ()
+        if day_of_week is not None:
+            query += " AND hs.day_of_week = ?"
+            params = (day_of_week,)
+        query += """
+            GROUP BY hs.stadsloket_id, ln.loket_name, hs.hour
+            ORDER BY hs.stadsloket_id, hs.hour
+        """
+        self.cursor.execute(query, params)
+        return self.format_hourly_averages(self.cursor.fetchall(), day_of_week)
+
+    def get_weekly_hourly_averages(self):
+        """Hourly averages for every day of the week from a single pass over the rollup"""
+        self.cursor.execute("""
+            SELECT hs.day_of_week, hs.stadsloket_id, ln.loket_name, hs.hour,
+                   hs.waittime_sum * 1.0 / NULLIF(hs.sample_count, 0)
+            FROM hourly_wait_stats hs
+            LEFT JOIN loket_names ln ON hs.stadsloket_id = ln.stadsloket_id
+            WHERE hs.hour BETWEEN 8 AND 20
+            ORDER BY hs.stadsloket_id, hs.hour
+        """)
+        return self.format_weekly_hourly_averages(self.cursor.fetchall())
+
+    def get_last_update_time(self):
+        """Get the timestamp of the most recent data update"""
+        self.cursor.execute("SELECT MAX(timestamp) FROM current_wait_times")
+        result = self.cursor.fetchone()
+        return from_db_timestamp(result[0]) if result and result[0] else None
+
+    def get_postcode_coordinates(self, postcode):
+        self.cursor.execute("""
+            SELECT lat, lon, looked_up_at
+            FROM postcode_coordinates
+            WHERE postcode = ?
+        """, (postcode,))
+        row = self.cursor.fetchone()
+        return (row[0], row[1], from_db_timestamp(row[2])) if row else None
+
+    def get_geocoded_postcodes(self, negative_since=None):
+        self.cursor.execute("""
+            SELECT postcode
+            FROM postcode_coordinates
+            WHERE lat IS NOT NULL OR looked_up_at >= ?
+        """, (to_db_timestamp(negative_since) if negative_since else None,))
+        return {postcode for postcode, in self.cursor.fetchall()}
+
+    def get_stored_postcode_coordinates(self):
+        self.cursor.execute("""
+            SELECT postcode, lat, lon
+            FROM postcode_coordinates
+            WHERE lat IS NOT NULL
+            ORDER BY postcode
+        """)
+        return self.cursor.fetchall()
+
+    def store_postcode_coordinates(self, rows):
+        now = to_db_timestamp(datetime.now(pytz.utc))
+        self.cursor.executemany("""
+            INSERT INTO postcode_coordinates (postcode, lat, lon, looked_up_at)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT (postcode)
+            DO UPDATE SET lat = excluded.lat,
+                          lon = excluded.lon,
+                          looked_up_at = excluded.looked_up_at
+        """, [(postcode, lat, lon, now) for postcode, lat, lon in rows])
+        self.db.commit()
+
+    def close(self):
+        if self.db is not None:
+            self.cursor.close()
+            self.db.close()
+            self.db = None